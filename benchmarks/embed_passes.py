@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Bytes-written benchmark for embedding metadata, cover art and subtitles.
+
+Generates a synthetic MP4 of the requested size, then embeds a subtitle
+track, metadata and a cover image twice: once as three chained passes
+(the FFmpegEmbedSubtitle -> FFmpegMetadata -> EmbedThumbnail order yt-dlp
+uses, each rewriting the whole file) and once with the single combined
+pass of FusedEmbedPP. Reports bytes written and wall time for each.
+
+Usage: python benchmarks/embed_passes.py [SIZE_MB ...]
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ytd.embed import build_embed_options  # noqa: E402
+from ytd.ffmpeg_helper import get_ffmpeg_command  # noqa: E402
+
+METADATA = {'title': 'Benchmark video', 'artist': 'ytd', 'date': '20240121',
+            'purl': 'https://example.com/watch?v=benchmark'}
+
+
+def ffmpeg(*args) -> None:
+    subprocess.run([get_ffmpeg_command(), '-y', '-loglevel', 'error', *map(str, args)], check=True)
+
+
+def make_inputs(tmp: Path, size_mb: int):
+    """Synthetic video (~size_mb, one video + one audio stream), cover image and subtitles"""
+    video = tmp / 'video.mp4'
+    bitrate_mbit = 40
+    duration = max(1, size_mb * 8 // bitrate_mbit)
+    ffmpeg('-f', 'lavfi', '-i', 'testsrc2=size=1280x720:rate=30', '-f', 'lavfi', '-i', 'sine',
+           '-t', duration, '-c:v', 'mpeg4', '-c:a', 'aac',
+           *(arg for opt in ('-b:v', '-minrate', '-maxrate', '-bufsize') for arg in (opt, f'{bitrate_mbit}M')),
+           video)
+
+    cover = tmp / 'cover.jpg'
+    ffmpeg('-f', 'lavfi', '-i', 'testsrc2=size=640x360', '-frames:v', 1, cover)
+
+    subtitles = tmp / 'video.en.vtt'
+    cues = ''.join(f"00:00:{i:02d}.000 --> 00:00:{i:02d}.900\nLine {i}\n\n" for i in range(min(duration, 59)))
+    subtitles.write_text('WEBVTT\n\n' + cues, encoding='utf-8')
+    return video, cover, subtitles
+
+
+def rewrite(source: Path, inputs, opts) -> int:
+    """One postprocessing pass: write a new file and replace the original"""
+    temp = source.with_name('temp.' + source.name)
+    args = ['-i', source]
+    for path in inputs:
+        args += ['-i', path]
+    ffmpeg(*args, *opts, temp)
+    written = temp.stat().st_size
+    os.replace(temp, source)
+    return written
+
+
+def chained(video: Path, cover: Path, subtitles: Path) -> int:
+    written = rewrite(video, [subtitles], ['-map', '0', '-dn', '-map', '1:0', '-c', 'copy', '-c:s', 'mov_text',
+                                           '-metadata:s:s:0', 'language=eng'])
+    written += rewrite(video, [], ['-map', '0', '-dn', '-c', 'copy']
+                       + [arg for tag, value in METADATA.items() for arg in ('-metadata', f'{tag}={value}')])
+    written += rewrite(video, [cover], ['-map', '0', '-dn', '-map', '1', '-c', 'copy',
+                                        '-disposition:3', 'attached_pic'])
+    return written
+
+
+def fused(video: Path, cover: Path, subtitles: Path) -> int:
+    inputs, opts = build_embed_options('mp4', 2, METADATA, str(cover), [('en', str(subtitles))])
+    return rewrite(video, inputs, opts)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [256, 1024]
+
+    print(f"{'Video':>8} {'chained written':>16} {'time':>7} {'fused written':>14} {'time':>7}")
+    print("-" * 58)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for size_mb in sizes:
+            video, cover, subtitles = make_inputs(tmp, size_mb)
+            original = video.read_bytes()
+            results = []
+            for strategy in (chained, fused):
+                video.write_bytes(original)
+                started = time.monotonic()
+                written = strategy(video, cover, subtitles)
+                results.append((written, time.monotonic() - started))
+
+            (chain_bytes, chain_time), (fused_bytes, fused_time) = results
+            print(f"{len(original) / 1024 / 1024:>6.0f}MB {chain_bytes / 1024 / 1024:>14.0f}MB {chain_time:>6.1f}s "
+                  f"{fused_bytes / 1024 / 1024:>12.0f}MB {fused_time:>6.1f}s")
+            del original
+
+
+if __name__ == '__main__':
+    main()
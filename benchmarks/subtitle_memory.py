@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Peak memory benchmark for VTT to SRT conversion.
+
+Generates synthetic caption files of increasing size and converts each
+one in a fresh subprocess, reporting the child's peak RSS. The streaming
+(mmap) path should stay flat while the read-everything path grows with
+the file size.
+
+Usage: python benchmarks/subtitle_memory.py [SIZE_MB ...]
+"""
+
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from ytd.timestamps import format_timestamp  # noqa: E402
+
+CHILD = """
+import resource, sys
+from pathlib import Path
+from ytd.convert_subtitles import convert_file, vtt_to_srt
+
+src, dst, mode = Path(sys.argv[1]), Path(sys.argv[2]), sys.argv[3]
+if mode == 'stream':
+    convert_file(src, dst)
+else:
+    dst.write_text(vtt_to_srt(src.read_text(encoding='utf-8')), encoding='utf-8')
+print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def write_vtt(path: Path, size_mb: int) -> None:
+    """Write a synthetic VTT file of roughly size_mb megabytes"""
+    target = size_mb * 1024 * 1024
+    written = 0
+    start = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('WEBVTT\nKind: captions\nLanguage: en\n\n')
+        while written < target:
+            cue = (f"{format_timestamp(start, '.')} --> {format_timestamp(start + 2000, '.')} "
+                   f"align:start position:0%\nthe <c>quick</c> brown fox jumps over the lazy dog\n\n")
+            f.write(cue)
+            written += len(cue)
+            start += 2000
+
+
+def peak_rss_kb(src: Path, dst: Path, mode: str) -> int:
+    """Run one conversion in a child process and return its peak RSS in KB"""
+    root = str(Path(__file__).resolve().parent.parent)
+    result = subprocess.run(
+        [sys.executable, '-c', CHILD, str(src), str(dst), mode],
+        capture_output=True, text=True, check=True, cwd=root
+    )
+    rss = int(result.stdout.strip().splitlines()[-1])
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [10, 50, 100]
+
+    print(f"{'File size':>10} {'read() RSS':>12} {'stream RSS':>12}")
+    print("-" * 36)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size_mb in sizes:
+            src = Path(tmp) / f"captions_{size_mb}.vtt"
+            write_vtt(src, size_mb)
+            read_rss = peak_rss_kb(src, Path(tmp) / 'read.srt', 'read')
+            stream_rss = peak_rss_kb(src, Path(tmp) / 'stream.srt', 'stream')
+            print(f"{size_mb:>8}MB {read_rss / 1024:>10.1f}MB {stream_rss / 1024:>10.1f}MB")
+            src.unlink()
+
+
+if __name__ == '__main__':
+    main()
@@ -6,30 +6,7 @@ import sys
 from pathlib import Path
 import platform
 
-
-def find_video_subtitle_pairs(directory: Path) -> list:
-    """Find video files with matching subtitle files"""
-    pairs = []
-    
-    # Common video extensions
-    video_extensions = {'.mp4', '.mkv', '.avi', '.mov', '.webm'}
-    subtitle_extensions = {'.vtt', '.srt', '.ass', '.ssa'}
-    
-    for video_file in directory.iterdir():
-        if video_file.suffix.lower() in video_extensions:
-            # Look for matching subtitle files
-            base_name = video_file.stem
-            subtitles = []
-            
-            for sub_file in directory.iterdir():
-                if sub_file.suffix.lower() in subtitle_extensions:
-                    if sub_file.stem.startswith(base_name):
-                        subtitles.append(sub_file)
-            
-            if subtitles:
-                pairs.append((video_file, subtitles))
-    
-    return pairs
+from ytd.pairing import find_video_subtitle_pairs
 
 
 def play_with_vlc(video_path: Path, subtitle_path: Path = None):
@@ -109,8 +86,7 @@ def main():
     for i, (video, subs) in enumerate(pairs, 1):
         print(f"{i}. {video.name}")
         for sub in subs:
-            lang_code = sub.stem.replace(video.stem, '').strip('.')
-            print(f"   - {sub.name} ({lang_code})")
+            print(f"   - {sub.path.name} ({sub.lang or 'default'})")
     
     print("\nHow to play:")
     print("1. VLC will auto-load subtitles with matching names")
@@ -121,7 +97,7 @@ def main():
     if pairs:
         video, subs = pairs[0]
         print(f"\nExample VLC command:")
-        print(f"vlc \"{video}\" --sub-file \"{subs[0]}\"")
+        print(f"vlc \"{video}\" --sub-file \"{subs[0].path}\"")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+"""Shared fixtures: local HTTP servers for the networking tests"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class QuietHandler(BaseHTTPRequestHandler):
+    """Request handler that doesn't log every request to stderr"""
+
+    def log_message(self, *args):
+        pass
+
+
+class KeepAliveHandler(QuietHandler):
+    """Keep-alive handler that counts the connections the server accepts"""
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True  # Headers and body are written separately
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+
+@pytest.fixture
+def http_server():
+    """
+    Start local servers: http_server(handler, **attributes) -> server.
+
+    Each server has a lock, a connection count, a requests list and its
+    base url, plus the given attributes for the handler to read. All are
+    shut down after the test.
+    """
+    servers = []
+
+    def start(handler, **attributes):
+        httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        httpd.lock = threading.Lock()
+        httpd.connections = 0
+        httpd.requests = []
+        httpd.url = f'http://127.0.0.1:{httpd.server_address[1]}'
+        for name, value in attributes.items():
+            setattr(httpd, name, value)
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        servers.append(httpd)
+        return httpd
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
@@ -0,0 +1,38 @@
+"""Tests for codec-aware audio extraction"""
+
+import logging
+from ytd.audio import audio_format_selector, extraction_path, normalize_acodec
+from ytd.downloader import YouTubeDownloader
+
+
+class TestAudioSelection:
+    """Test format preference and copy/transcode decisions"""
+
+    def test_format_selector(self):
+        """Test matching codecs are preferred with a plain fallback"""
+        assert audio_format_selector('opus') == 'bestaudio[acodec=opus]/bestaudio/best'
+        assert audio_format_selector('m4a') == 'bestaudio[acodec^=mp4a]/bestaudio/best'
+        assert audio_format_selector('wav') == 'bestaudio/best'
+
+    def test_extraction_path(self):
+        """Test which sources can be remuxed without re-encoding"""
+        assert normalize_acodec('mp4a.40.2') == 'aac'
+        assert extraction_path('mp4a.40.2', 'm4a') == 'copy'
+        assert extraction_path('opus', 'opus') == 'copy'
+        assert extraction_path('opus', 'mp3') == 'transcode'
+        assert extraction_path('none', 'mp3') == 'transcode'
+        assert extraction_path(None, 'opus') == 'transcode'
+
+    def test_downloader_options(self, tmp_path, caplog):
+        """Test audio-only options and the reported extraction path"""
+        downloader = YouTubeDownloader({'output': str(tmp_path), 'audio_only': True, 'audio_format': 'opus'})
+        opts = downloader._get_ydl_opts()
+        assert opts['format'] == 'bestaudio[acodec=opus]/bestaudio/best'
+        assert opts['postprocessors'][0]['preferredcodec'] == 'opus'
+
+        with caplog.at_level(logging.INFO):
+            hook = opts['postprocessor_hooks'][0]
+            hook({'status': 'started', 'postprocessor': 'ExtractAudio', 'info_dict': {'acodec': 'opus'}})
+            hook({'status': 'started', 'postprocessor': 'ExtractAudio', 'info_dict': {'acodec': 'mp4a.40.2'}})
+        assert 'stream copy (opus → opus' in caplog.text
+        assert 'transcoding aac → opus' in caplog.text
@@ -0,0 +1,85 @@
+"""Tests for the download catalog"""
+
+import hashlib
+
+import yt_dlp
+from ytd.catalog import Catalog, CatalogRecorder, catalog_entry
+from ytd.cli import library_main
+
+
+def finished_info(path, video_id='abc123', channel='Some Channel', upload_date='20240101'):
+    return {
+        'id': video_id, 'title': f'Video {video_id}', 'ext': 'mp4', 'format_id': '18',
+        'extractor_key': 'Youtube', 'channel': channel, 'upload_date': upload_date,
+        'duration': 60, 'filepath': str(path),
+        'webpage_url': f'https://www.youtube.com/watch?v={video_id}',
+    }
+
+
+class TestCatalog:
+    """Test recording and querying downloads"""
+
+    def test_entry(self, tmp_path):
+        """Test a row carries size, checksum and subtitle languages"""
+        video = tmp_path / 'video.mp4'
+        video.write_bytes(b'video')
+        subs = tmp_path / 'video.en.vtt'
+        subs.write_text('WEBVTT\n')
+        info = finished_info(video)
+        info['requested_subtitles'] = {'en': {'filepath': str(subs)}, 'de': {'filepath': str(tmp_path / 'gone')}}
+
+        entry = catalog_entry(info, download_bytes=5)
+        assert entry['size'] == 5
+        assert entry['subtitle_langs'] == 'en'
+        # Files are only read again to hash them when asked to
+        assert entry['sha256'] is None
+        assert catalog_entry(info, checksum=True)['sha256'] == hashlib.sha256(b'video').hexdigest()
+
+    def test_query(self, tmp_path):
+        """Test filters by id, channel and date range, newest first"""
+        with Catalog(tmp_path / 'catalog.sqlite') as catalog:
+            for i, (channel, date) in enumerate([('A', '20240101'), ('A', '20240301'), ('B', '20240201')]):
+                video = tmp_path / f'{i}.mp4'
+                video.write_bytes(b'x' * i)
+                catalog.add(catalog_entry(finished_info(video, f'id{i}', channel, date)))
+
+            assert [e['video_id'] for e in catalog.query(channel='A')] == ['id1', 'id0']
+            assert [e['video_id'] for e in catalog.query(since='20240115', until='20240215')] == ['id2']
+            assert catalog.query(video_id='id0')[0]['channel'] == 'A'
+            assert catalog.summary()['files'] == 3
+
+            # Downloading to the same path again replaces the row
+            catalog.add(catalog_entry(finished_info(tmp_path / '0.mp4', 'id0', 'C', '20240101')))
+            assert catalog.summary()['files'] == 3
+            assert catalog.query(channel='C')[0]['video_id'] == 'id0'
+
+            (tmp_path / '1.mp4').unlink()
+            assert catalog.remove_missing() == 1
+
+    def test_recorded_after_download(self, tmp_path):
+        """Test the postprocessor records files once yt-dlp has moved them into place"""
+        video = tmp_path / 'Video abc123.mp4'
+        video.write_bytes(b'already here')
+        info = finished_info(video)
+        del info['filepath']
+        info['url'] = 'http://127.0.0.1:9/unreachable.mp4'
+
+        with Catalog(tmp_path / 'catalog.sqlite') as catalog:
+            with yt_dlp.YoutubeDL({'outtmpl': str(tmp_path / '%(title)s.%(ext)s'), 'quiet': True}) as ydl:
+                CatalogRecorder(catalog, checksum=False).attach(ydl)
+                ydl.process_ie_result(info, download=True)
+
+            entry, = catalog.query()
+            assert entry['path'] == str(video)
+            assert entry['sha256'] is None
+
+    def test_ls_command(self, tmp_path, capsys):
+        """Test ytd ls lists catalog entries"""
+        video = tmp_path / 'video.mp4'
+        video.write_bytes(b'video')
+        with Catalog(tmp_path / '.ytd-catalog.sqlite') as catalog:
+            catalog.add(catalog_entry(finished_info(video)))
+
+        assert library_main(['ls', str(tmp_path), '--channel', 'Some Channel']) == 0
+        out = capsys.readouterr().out
+        assert 'abc123' in out and 'Video abc123' in out
@@ -84,4 +84,19 @@ class TestCLI:
         
         with patch('sys.argv', ['ytd', 'https://youtube.com/watch?v=test']):
             result = main()
-            assert result == 1
\ No newline at end of file
+            assert result == 1
+
+    def test_main_search_without_index(self, tmp_path):
+        """Test library commands are dispatched before URL handling"""
+        with patch('sys.argv', ['ytd', 'search', 'hello', '-d', str(tmp_path)]):
+            result = main()
+            assert result == 1
+
+    def test_playlist_items_validated(self):
+        """Test --playlist-items is parsed into an interval set"""
+        parser = create_parser()
+        args = parser.parse_args(['https://youtube.com/playlist?list=x', '--playlist-items', '1-3,50-'])
+        assert str(args.playlist_items) == '1:3,50:'
+
+        with pytest.raises(SystemExit):
+            parser.parse_args(['https://youtube.com/playlist?list=x', '--playlist-items', '5-3'])
@@ -0,0 +1,159 @@
+"""Tests for disk space admission control"""
+
+import fcntl
+import json
+import os
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+import yt_dlp
+from yt_dlp.utils import PostProcessingError
+from ytd.pipeline import PipelinedYoutubeDL
+from ytd.diskspace import (DiskAdmission, DiskSpaceLedger, InsufficientSpaceError,
+                           estimate_download_bytes)
+
+MB = 1024 * 1024
+
+
+def ledger_with_free(tmp_path, free):
+    ledger = DiskSpaceLedger(tmp_path, min_free=0, poll_interval=0.01)
+    patch.object(ledger, 'free_bytes', return_value=free).start()
+    return ledger
+
+
+def other_process(ledger, owner, nbytes):
+    """Reservation of another running process; closing the returned lock file ends it"""
+    ledger.store.mkdir(exist_ok=True)
+    (ledger.store / f'{owner}-1.json').write_text(json.dumps({'owner': owner, 'bytes': nbytes}))
+    lock = open(ledger.store / f'{owner}.lock', 'a')
+    fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    return lock
+
+
+class TestDiskSpace:
+    """Test reservations, queueing and release"""
+
+    def teardown_method(self):
+        patch.stopall()
+
+    def test_reserve_and_release(self, tmp_path):
+        """Test reservations count against the space left for others"""
+        ledger = ledger_with_free(tmp_path, 100 * MB)
+        first = ledger.reserve(60 * MB)
+        assert ledger.available() == 40 * MB
+
+        first.update(50 * MB)  # Written bytes are already gone from free space
+        first.release()
+        assert ledger.available() == 100 * MB
+
+    def test_never_fits(self, tmp_path):
+        """Test a download larger than the volume fails instead of waiting forever"""
+        ledger = ledger_with_free(tmp_path, 10 * MB)
+        with pytest.raises(InsufficientSpaceError):
+            ledger.reserve(20 * MB)
+        assert list((tmp_path / '.ytd-reservations').glob('*.json')) == []
+
+    def test_queue_until_released(self, tmp_path):
+        """Test a second download waits for the first to release its space"""
+        ledger = ledger_with_free(tmp_path, 100 * MB)
+        first = ledger.reserve(80 * MB)
+        admitted = []
+
+        thread = threading.Thread(target=lambda: admitted.append(ledger.reserve(50 * MB, wait_for_own=True)))
+        thread.start()
+        time.sleep(0.1)
+        assert admitted == []
+
+        first.release()
+        thread.join(5)
+        assert len(admitted) == 1
+
+    def test_stale_reservation_ignored(self, tmp_path):
+        """Test claims left by dead processes are cleaned up"""
+        ledger = ledger_with_free(tmp_path, 100 * MB)
+        other_process(ledger, 'crashed', 90 * MB).close()
+        ledger.store.joinpath('gone.json').write_text(json.dumps({'owner': 'gone', 'bytes': 90 * MB}))
+        assert ledger.available() == 100 * MB
+        assert sorted(path.name for path in ledger.store.iterdir()) == []
+
+    def test_same_pid_in_other_container(self, tmp_path):
+        """Test a live process with this process's PID (another container) is waited for, not dropped"""
+        ledger = ledger_with_free(tmp_path, 100 * MB)
+        lock = other_process(ledger, f'other-host-{os.getpid()}-0', 80 * MB)
+        with pytest.raises(InsufficientSpaceError, match='Timed out'):
+            ledger.reserve(50 * MB, timeout=0.05)
+        assert ledger.available() == 20 * MB
+
+        lock.close()
+        assert ledger.reserve(50 * MB)
+        assert not (ledger.store / f'other-host-{os.getpid()}-0.lock').exists()
+
+    def test_admission_lifecycle(self, tmp_path):
+        """Test the yt-dlp hooks reserve, track progress and release"""
+        ledger = ledger_with_free(tmp_path, 1000 * MB)
+        admission = DiskAdmission(ledger, rewrite=False)
+        info = {'id': 'abc', 'requested_formats': [{'filesize': 100 * MB}, {'filesize_approx': 10 * MB}]}
+        assert estimate_download_bytes(info) == 110 * MB
+
+        admission.admit(info)
+        # Merges need room for both the inputs and the merged copy
+        assert ledger.outstanding() == 220 * MB
+
+        admission.progress_hook({'status': 'downloading', 'info_dict': info,
+                                 'filename': 'a.f137.mp4', 'downloaded_bytes': 20 * MB})
+        assert admission.reservations['abc'].used == 20 * MB
+
+        admission.release(info)
+        assert ledger.outstanding() == 0
+        assert admission.reservations == {}
+
+    def test_own_reservations_not_waited_for(self, tmp_path):
+        """Test space held by this process fails fast, while other processes' claims are waited for"""
+        ledger = ledger_with_free(tmp_path, 100 * MB)
+        ledger.reserve(80 * MB)
+        with pytest.raises(InsufficientSpaceError):
+            ledger.reserve(50 * MB)
+
+        lock = other_process(ledger, 'other', 10 * MB)
+        with pytest.raises(InsufficientSpaceError, match='Timed out'):
+            ledger.reserve(15 * MB, timeout=0.05)
+        lock.close()
+
+    def test_retry_replaces_reservation(self, tmp_path):
+        """Test admitting a video again drops the reservation of the earlier attempt"""
+        ledger = ledger_with_free(tmp_path, 100 * MB)
+        admission = DiskAdmission(ledger, rewrite=False)
+        admission.admit({'id': 'abc', 'filesize': 60 * MB})
+        admission.admit({'id': 'abc', 'filesize': 60 * MB})
+        assert ledger.outstanding() == 60 * MB
+        assert len(list(ledger.store.glob('*.json'))) == 1
+
+    def test_failed_download_released(self, tmp_path):
+        """Test a download that fails after admission frees its space for the next entry"""
+        ledger = ledger_with_free(tmp_path, 1500)
+        ledger.min_free = 0
+        ydl = yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True, 'ignoreerrors': True,
+                                'outtmpl': str(tmp_path / '%(id)s.%(ext)s'), 'retries': 0})
+        DiskAdmission(ledger, rewrite=False).attach(ydl)
+        for video_id in ('a', 'b'):
+            # Nothing listens on port 9: the download fails after the space is reserved
+            ydl.process_ie_result({'id': video_id, 'title': video_id, 'extractor': 'test', 'extractor_key': 'Test',
+                                   'formats': [{'url': f'http://127.0.0.1:9/{video_id}.mp4', 'ext': 'mp4',
+                                                'filesize': 1000}]}, download=True)
+            assert ledger.outstanding() == 0
+
+    def test_pipelined_job_releases(self, tmp_path):
+        """Test a reservation handed to a postprocessing worker is released when the job ends"""
+        ledger = ledger_with_free(tmp_path, 100 * MB)
+        ydl = PipelinedYoutubeDL({'quiet': True}, output_dir=tmp_path, min_free_bytes=0)
+        admission = DiskAdmission(ledger, rewrite=False)
+        admission.attach(ydl)
+        info = {'id': 'abc', 'filesize': 60 * MB}
+        admission.admit(info)
+        with patch.object(yt_dlp.YoutubeDL, 'post_process', side_effect=PostProcessingError('failed')):
+            ydl.post_process('abc.mp4', info)
+            ydl.wait()
+        assert ledger.outstanding() == 0
+        ydl.close()
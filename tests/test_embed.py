@@ -0,0 +1,89 @@
+"""Tests for the combined embed postprocessor"""
+
+from unittest.mock import patch
+
+from ytd.downloader import YouTubeDownloader
+from ytd.embed import FusedEmbedPP, build_embed_options, metadata_tags
+
+
+INFO = {
+    'title': 'Talk', 'upload_date': '20240121', 'uploader': 'Channel',
+    'webpage_url': 'https://youtube.com/watch?v=abcdefghijk', 'categories': ['Education', 'Science'],
+}
+
+
+class TestEmbed:
+    """Test one ffmpeg pass covers metadata, cover art and subtitles"""
+
+    def test_metadata_tags(self):
+        """Test info fields map to container tags"""
+        tags = metadata_tags(INFO)
+        assert tags['title'] == 'Talk'
+        assert tags['artist'] == 'Channel'
+        assert tags['genre'] == 'Education, Science'
+        assert tags['purl'] == tags['comment'] == INFO['webpage_url']
+        assert 'description' not in tags
+
+    def test_mp4_options(self):
+        """Test cover art follows the original streams and subtitles use mov_text"""
+        inputs, opts = build_embed_options('mp4', 2, {'title': 'Talk'}, 'cover.jpg',
+                                           [('en', 'v.en.vtt'), ('pt-BR', 'v.pt-BR.vtt')])
+        assert inputs == ['cover.jpg', 'v.en.vtt', 'v.pt-BR.vtt']
+        assert opts[:5] == ['-map', '0', '-dn', '-c', 'copy']
+        assert ' '.join(opts).count('-map') == 4
+        assert opts[opts.index('-disposition:2') + 1] == 'attached_pic'
+        assert opts[opts.index('-c:s') + 1] == 'mov_text'
+        assert 'language=por' in opts and 'title=Portuguese (BR)' in opts
+        assert 'title=Talk' in opts
+
+    def test_container_rules(self):
+        """Test Matroska attaches the cover and WebM skips it"""
+        inputs, opts = build_embed_options('mkv', 2, thumbnail='cover.jpg', subtitles=[('en', 'v.en.vtt')])
+        assert inputs == ['v.en.vtt']
+        assert opts[opts.index('-attach') + 1] == 'cover.jpg'
+        assert opts[opts.index('-c:s') + 1] == 'srt'
+
+        inputs, opts = build_embed_options('webm', 2, thumbnail='cover.jpg', subtitles=[('en', 'v.en.vtt')])
+        assert inputs == ['v.en.vtt']
+        assert opts[opts.index('-c:s') + 1] == 'webvtt'
+
+    def test_single_pass(self, tmp_path):
+        """Test the postprocessor rewrites the file once and deletes the cover"""
+        video = tmp_path / 'Talk.mp4'
+        video.write_bytes(b'video')
+        cover = tmp_path / 'Talk.jpg'
+        cover.write_bytes(b'jpg')
+        subs = tmp_path / 'Talk.en.vtt'
+        subs.write_text('WEBVTT\n')
+        info = dict(INFO, filepath=str(video), ext='mp4',
+                    thumbnails=[{'filepath': str(cover)}],
+                    requested_subtitles={'en': {'ext': 'vtt', 'filepath': str(subs)}})
+
+        calls = []
+
+        def fake_run(self, inputs, out_path, opts):
+            calls.append((inputs, opts))
+            with open(out_path, 'wb') as f:
+                f.write(b'embedded')
+
+        with patch.object(FusedEmbedPP, 'run_ffmpeg_multiple_files', fake_run), \
+                patch.object(FusedEmbedPP, 'get_metadata_object', return_value={'streams': [
+                    {'codec_type': 'video'}, {'codec_type': 'audio'}, {'codec_type': 'data'}]}), \
+                patch.object(FusedEmbedPP, 'to_screen'):
+            files_to_delete, _ = FusedEmbedPP().run(info)
+
+        assert len(calls) == 1
+        assert calls[0][0] == [str(video), str(cover), str(subs)]
+        assert '-disposition:2' in calls[0][1]
+        assert video.read_bytes() == b'embedded'
+        assert files_to_delete == [str(cover)]
+
+    def test_downloader_uses_fused_pp(self, tmp_path):
+        """Test --thumbnail no longer chains three rewriting postprocessors"""
+        downloader = YouTubeDownloader({'output': str(tmp_path), 'thumbnail': True})
+        opts = downloader._get_ydl_opts()
+        assert not opts.get('writethumbnail') and not opts.get('postprocessors')
+
+        with downloader._create_ydl(opts) as ydl:
+            # The prepared cover art is put in place just before the embed pass
+            assert [pp.pp_key() for pp in ydl._pps['post_process']] == ['ThumbnailReady', 'FusedEmbed']
@@ -0,0 +1,51 @@
+"""Tests for ffmpeg discovery"""
+
+from unittest.mock import patch
+from ytd import ffmpeg_helper
+from ytd.ffmpeg_helper import FFmpegInstallation, get_ffmpeg_command, invalidate_ffmpeg_cache
+
+
+ENCODERS_OUTPUT = """Encoders:
+ V..... = Video
+ ------
+ V....D libx264              libx264 H.264 / AVC / MPEG-4 AVC
+ A....D libmp3lame           libmp3lame MP3 (MPEG audio layer 3)
+ S..... mov_text             3GPP Timed Text subtitle
+"""
+
+
+class TestFFmpegDiscovery:
+    """Test memoized ffmpeg resolution"""
+
+    def setup_method(self):
+        invalidate_ffmpeg_cache()
+
+    def teardown_method(self):
+        invalidate_ffmpeg_cache()
+
+    def test_resolution_is_cached(self):
+        """Test PATH is only searched once until invalidated"""
+        with patch('ytd.ffmpeg_helper.shutil.which', return_value='/usr/bin/ffmpeg') as which:
+            for _ in range(10):
+                assert get_ffmpeg_command() == '/usr/bin/ffmpeg'
+            calls = which.call_count
+
+            invalidate_ffmpeg_cache()
+            get_ffmpeg_command()
+            assert which.call_count == calls * 2
+
+    def test_capabilities_probed_once(self):
+        """Test encoders are parsed from a single ffmpeg run"""
+        installation = FFmpegInstallation('ffmpeg', 'ffprobe', True)
+        with patch.object(FFmpegInstallation, '_run', return_value=ENCODERS_OUTPUT) as run:
+            assert installation.has_encoder('libmp3lame')
+            assert installation.has_encoder('mov_text')
+            assert not installation.has_encoder('libfdk_aac')
+            assert run.call_count == 1
+
+    def test_ensure_ffmpeg_uses_cache(self):
+        """Test ensure_ffmpeg doesn't prompt when ffmpeg is already resolved"""
+        with patch('ytd.ffmpeg_helper.shutil.which', return_value='/usr/bin/ffmpeg'), \
+                patch.object(ffmpeg_helper.FFmpegHelper, 'ensure_ffmpeg') as ensure:
+            assert ffmpeg_helper.ensure_ffmpeg() is True
+            ensure.assert_not_called()
@@ -0,0 +1,88 @@
+"""Tests for the format planner"""
+
+from unittest.mock import Mock
+
+import yt_dlp
+from ytd.downloader import YouTubeDownloader
+from ytd.formats import Constraints, explain_plan, make_format_selector, plan_formats
+
+
+def fmt(format_id, ext, vcodec='none', acodec='none', height=None, tbr=None, filesize=None, abr=None):
+    return {'format_id': format_id, 'ext': ext, 'vcodec': vcodec, 'acodec': acodec, 'height': height,
+            'tbr': tbr, 'abr': abr, 'filesize': filesize, 'protocol': 'https',
+            'url': f'https://example.com/{format_id}'}
+
+
+MB = 1024 * 1024
+FORMATS = [
+    fmt('18', 'mp4', 'avc1.42001E', 'mp4a.40.2', 360, 500, 20 * MB),
+    fmt('140', 'm4a', acodec='mp4a.40.2', tbr=128, abr=128, filesize=5 * MB),
+    fmt('251', 'webm', acodec='opus', tbr=130, abr=130, filesize=5 * MB),
+    fmt('136', 'mp4', 'avc1.4d401f', height=720, tbr=1500, filesize=60 * MB),
+    fmt('247', 'webm', 'vp9', height=720, tbr=1200, filesize=45 * MB),
+    fmt('137', 'mp4', 'avc1.640028', height=1080, tbr=4000, filesize=160 * MB),
+    fmt('248', 'webm', 'vp9', height=1080, tbr=2600, filesize=110 * MB),
+]
+
+
+class TestFormatPlanner:
+    """Test scoring against size, bitrate and time limits"""
+
+    def test_best_without_limits(self):
+        """Test the highest resolution wins, then the smaller download"""
+        plan = plan_formats(FORMATS)
+        assert plan.choice.format_id == '248+251'
+        assert plan.choice.ext == 'webm'
+
+    def test_size_limit(self):
+        """Test oversized candidates are rejected with a reason"""
+        plan = plan_formats(FORMATS, Constraints(max_bytes=100 * MB))
+        assert plan.choice.format_id == '247+251'
+        assert any('size' in reason for _, reason in plan.rejected)
+
+    def test_container_avoids_remux(self):
+        """Test codecs that fit the wanted container are preferred"""
+        plan = plan_formats(FORMATS, Constraints(container='mp4'))
+        assert plan.choice.format_id == '137+140'
+
+    def test_download_time(self):
+        """Test the time estimate uses the link speed"""
+        plan = plan_formats(FORMATS, Constraints(max_seconds=30, link_speed=2 * MB))
+        assert plan.choice.size <= 60 * MB
+        assert plan.choice.height == 720
+
+    def test_bitrate_and_audio_only(self):
+        """Test bitrate caps and audio-only planning"""
+        assert plan_formats(FORMATS, Constraints(max_bitrate=1000)).choice.format_id == '18'
+        plan = plan_formats(FORMATS, Constraints(prefer_codecs=('aac',)), audio_only=True)
+        assert plan.choice.format_id == '140'
+
+    def test_nothing_fits(self):
+        """Test an impossible limit is explained"""
+        plan = plan_formats(FORMATS, Constraints(max_bytes=1 * MB))
+        assert plan.choice is None
+        assert 'nothing fits' in explain_plan(plan)
+
+    def test_yt_dlp_selector(self):
+        """Test the selector plugs into yt-dlp's format processing"""
+        selector = make_format_selector(lambda: Constraints(max_height=720, container='mp4'))
+        info = {'id': 'abcdefghijk', 'title': 'Test', 'extractor': 'generic', 'extractor_key': 'Generic',
+                'webpage_url': 'https://example.com', 'duration': 100, 'formats': [dict(f) for f in FORMATS]}
+        with yt_dlp.YoutubeDL({'format': selector, 'quiet': True, 'simulate': True}) as ydl:
+            result = ydl.process_ie_result(info, download=False)
+        assert result['format_id'] == '136+140'
+        assert [f['format_id'] for f in result['requested_formats']] == ['136', '140']
+        # Merged selections carry the stream fields output templates and the catalog use
+        assert (result['height'], result['vcodec'], result['acodec']) == (720, 'avc1.4d401f', 'mp4a.40.2')
+        assert result['tbr'] == 1500 + 128
+        assert result['filesize_approx'] == 65 * MB
+
+    def test_format_spec_override_warned(self, tmp_path):
+        """Test an explicit -f replaced by the planner is reported"""
+        logger = Mock()
+        YouTubeDownloader({'output': str(tmp_path), 'format': '22', 'max_height': 720}, logger)._get_ydl_opts()
+        assert '-f 22 is ignored' in logger.warning.call_args.args[0]
+
+        logger = Mock()
+        YouTubeDownloader({'output': str(tmp_path), 'format': 'best', 'max_height': 720}, logger)._get_ydl_opts()
+        logger.warning.assert_not_called()
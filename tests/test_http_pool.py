@@ -0,0 +1,98 @@
+"""Tests for the pooled keep-alive HTTP client"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from tests.conftest import KeepAliveHandler
+from ytd.http_pool import HTTPError, HTTPPool
+
+BODY = b'x' * 1024
+
+
+class FilesHandler(KeepAliveHandler):
+    """Serves files, errors, redirects and dropped connections"""
+
+    def do_GET(self):
+        if self.path == '/missing':
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if self.path == '/moved':
+            self.send_response(302)
+            self.send_header('Location', '/file')
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = BODY * 1024 if self.path == '/large' else BODY
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        if self.path == '/hangup':
+            # Drop the connection without announcing it, like an idle timeout
+            self.close_connection = True
+
+
+@pytest.fixture
+def server(http_server):
+    return http_server(FilesHandler)
+
+
+class TestHTTPPool:
+    """Test connection reuse, pool limits and recovery"""
+
+    def test_sequential_requests_share_a_connection(self, server):
+        """Test requests to one host reuse a single kept-alive connection"""
+        with HTTPPool() as pool:
+            for _ in range(5):
+                assert pool.get(f'{server.url}/file') == BODY
+        assert server.connections == 1
+
+    def test_concurrent_requests_bounded_by_workers(self, server):
+        """Test concurrent workers each keep one connection instead of one per request"""
+        with HTTPPool(pool_size=4) as pool, ThreadPoolExecutor(max_workers=4) as executor:
+            bodies = list(executor.map(lambda _: pool.get(f'{server.url}/file'), range(40)))
+        assert bodies == [BODY] * 40
+        assert server.connections <= 4
+
+    def test_pool_size_caps_idle_connections(self, server):
+        """Test only pool_size connections are kept once released"""
+        with HTTPPool(pool_size=1) as pool:
+            responses = [pool.request('GET', f'{server.url}/file') for _ in range(3)]
+            for response in responses:
+                with response:
+                    response.read()
+            assert server.connections == 3
+
+            pool.get(f'{server.url}/file')
+            assert server.connections == 3  # The kept connection was reused
+            responses = [pool.request('GET', f'{server.url}/file') for _ in range(2)]
+            for response in responses:
+                response.close()
+            assert server.connections == 4
+
+    def test_unfinished_response_not_reused(self, server):
+        """Test a response closed before its end closes its connection"""
+        with HTTPPool() as pool:
+            with pool.request('GET', f'{server.url}/large') as response:
+                response.read(100)
+            assert pool.get(f'{server.url}/file') == BODY
+        assert server.connections == 2
+
+    def test_dropped_connection_retried(self, server):
+        """Test a kept-alive connection closed by the server is replaced transparently"""
+        with HTTPPool() as pool:
+            assert pool.get(f'{server.url}/hangup') == BODY
+            assert pool.get(f'{server.url}/file') == BODY
+        assert server.connections == 2
+
+    def test_errors_and_redirects(self, server):
+        """Test error statuses raise HTTPError and redirects are followed, on the same connection"""
+        with HTTPPool() as pool:
+            with pytest.raises(HTTPError) as error:
+                pool.get(f'{server.url}/missing')
+            assert error.value.code == 404 and str(error.value) == 'HTTP Error 404: Not Found'
+            with pool.request('GET', f'{server.url}/moved') as response:
+                assert response.url == f'{server.url}/file' and response.read() == BODY
+        assert server.connections == 1
@@ -0,0 +1,97 @@
+"""Tests for subtitle merging"""
+
+import threading
+import time
+from pathlib import Path
+from unittest.mock import patch
+from ytd.merge_subtitles import batch_merge, build_merge_command
+
+
+def fake_ffmpeg(cmd):
+    """Pretend to mux by writing the output file after a short delay"""
+    time.sleep(0.05)
+    Path(cmd[-1]).write_bytes(b'merged')
+    return True, ''
+
+
+class TestBatchMerge:
+    """Test batch merging"""
+
+    def make_library(self, directory, count):
+        for i in range(count):
+            (directory / f"video{i}.mp4").write_bytes(b'video')
+            (directory / f"video{i}.en.vtt").write_text('WEBVTT\n', encoding='utf-8')
+
+    def test_build_merge_command_auto_codec(self, tmp_path):
+        """Test subtitle codec auto-detection from the output container"""
+        cmd = build_merge_command(tmp_path / 'a.mkv', tmp_path / 'a.srt', tmp_path / 'out.mkv',
+                                  subtitle_codec='auto')
+        assert cmd[cmd.index('-c:s') + 1] == 'srt'
+        assert cmd[-1] == str(tmp_path / 'out.mkv')
+
+    def test_parallel_jobs(self, tmp_path, capsys):
+        """Test merges run concurrently and are reported in order"""
+        self.make_library(tmp_path, 6)
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def tracking_ffmpeg(cmd):
+            with lock:
+                running.append(cmd)
+                peak.append(len(running))
+            try:
+                return fake_ffmpeg(cmd)
+            finally:
+                with lock:
+                    running.remove(cmd)
+
+        with patch('ytd.merge_subtitles.run_ffmpeg', side_effect=tracking_ffmpeg):
+            batch_merge(tmp_path, jobs=3)
+
+        assert max(peak) == 3
+        assert len(list(tmp_path.glob('*_merged.mp4'))) == 6
+
+        output = capsys.readouterr().out
+        assert 'Successfully merged 6 of 6' in output
+        positions = [output.index(f"[{i}/6]") for i in range(1, 7)]
+        assert positions == sorted(positions)
+
+    def test_existing_output_skipped(self, tmp_path, capsys):
+        """Test existing outputs are not overwritten without force"""
+        self.make_library(tmp_path, 1)
+        (tmp_path / 'video0_merged.mp4').write_bytes(b'old')
+
+        with patch('ytd.merge_subtitles.run_ffmpeg', side_effect=fake_ffmpeg) as run:
+            batch_merge(tmp_path)
+
+        run.assert_not_called()
+        assert 'Successfully merged 0 of 1' in capsys.readouterr().out
+
+    def test_multi_language_command(self, tmp_path):
+        """Test several subtitle files are muxed in one ffmpeg invocation"""
+        video = tmp_path / 'Talk.mp4'
+        cmd = build_merge_command(video, [tmp_path / 'Talk.en.srt', tmp_path / 'Talk.pt-BR.vtt',
+                                          tmp_path / 'Talk.live_chat.vtt'],
+                                  tmp_path / 'out.mp4')
+
+        assert cmd.count('-i') == 4
+        assert cmd[cmd.index('0:a?') + 1:].count('-map') == 3
+        assert 'language=eng' in cmd and 'title=English' in cmd
+        assert 'language=por' in cmd and 'title=Portuguese (BR)' in cmd
+        assert 'title=live_chat' in cmd
+        assert cmd[cmd.index('-disposition:s:0') + 1] == 'default'
+        assert cmd[cmd.index('-disposition:s:1') + 1] == '0'
+
+    def test_batch_all_subs(self, tmp_path):
+        """Test batch mode passes one track per language with all_subs"""
+        self.make_library(tmp_path, 1)
+        (tmp_path / 'video0.en.srt').write_text('', encoding='utf-8')
+        (tmp_path / 'video0.hr.vtt').write_text('', encoding='utf-8')
+
+        with patch('ytd.merge_subtitles.run_ffmpeg', side_effect=fake_ffmpeg) as run:
+            batch_merge(tmp_path, all_subs=True)
+
+        cmd = run.call_args[0][0]
+        inputs = [cmd[i + 1] for i, arg in enumerate(cmd) if arg == '-i']
+        assert [Path(p).name for p in inputs] == ['video0.mp4', 'video0.en.srt', 'video0.hr.vtt']
@@ -0,0 +1,46 @@
+"""Tests for video/subtitle pairing"""
+
+from ytd.pairing import pair_videos, find_video_subtitle_pairs, SubtitleFile
+from ytd.merge_subtitles import pick_subtitle
+
+
+class TestPairing:
+    """Test pairing videos with subtitle files"""
+
+    def touch(self, directory, *names):
+        for name in names:
+            (directory / name).write_bytes(b'')
+
+    def test_pairs_with_language_tags(self, tmp_path):
+        """Test subtitles are matched by name prefix with language tags"""
+        self.touch(tmp_path, 'Talk.mp4', 'Talk.en.vtt', 'Talk.en-US.srt', 'Talk.vtt',
+                   'Talker.en.vtt', 'notes.txt')
+
+        pairs = pair_videos(tmp_path)
+        assert len(pairs) == 1
+        video, subs = pairs[0]
+        assert video.name == 'Talk.mp4'
+        assert sorted((sub.path.name, sub.lang) for sub in subs) == [
+            ('Talk.en-US.srt', 'en-US'), ('Talk.en.vtt', 'en'), ('Talk.vtt', None)]
+
+    def test_longest_video_name_wins(self, tmp_path):
+        """Test a subtitle is assigned to the most specific video"""
+        self.touch(tmp_path, 'a.mp4', 'a.b.mp4', 'a.b.en.srt', 'a.fr.srt')
+
+        pairs = dict(pair_videos(tmp_path))
+        assert [sub.path.name for sub in pairs[tmp_path / 'a.b.mp4']] == ['a.b.en.srt']
+        assert [sub.path.name for sub in pairs[tmp_path / 'a.mp4']] == ['a.fr.srt']
+
+    def test_pattern_and_unpaired(self, tmp_path):
+        """Test the video pattern filter and skipping unpaired videos"""
+        self.touch(tmp_path, 'one.mkv', 'two.mkv', 'one.en.vtt', 'three.mp4', 'three.vtt')
+
+        assert [video.name for video, _ in pair_videos(tmp_path, '*.mkv')] == ['one.mkv', 'two.mkv']
+        assert [video.name for video, _ in find_video_subtitle_pairs(tmp_path, '*.mkv')] == ['one.mkv']
+
+    def test_pick_subtitle(self, tmp_path):
+        """Test batch merge prefers tagged SRT files"""
+        subs = [SubtitleFile(tmp_path / 'v.vtt', None), SubtitleFile(tmp_path / 'v.en.vtt', 'en'),
+                SubtitleFile(tmp_path / 'v.en.srt', 'en'), SubtitleFile(tmp_path / 'v.en.ass', 'en')]
+        assert pick_subtitle(subs).path.name == 'v.en.srt'
+        assert pick_subtitle(subs[3:]) is None
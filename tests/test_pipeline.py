@@ -0,0 +1,111 @@
+"""Tests for pipelined postprocessing"""
+
+import functools
+import threading
+import time
+from http.server import SimpleHTTPRequestHandler
+from unittest.mock import patch
+
+import yt_dlp
+from ytd.pipeline import PipelinedYoutubeDL
+
+
+class TestPipeline:
+    """Test postprocessing runs off the download thread with back-pressure"""
+
+    def make_ydl(self, tmp_path, **kwargs):
+        return PipelinedYoutubeDL({'quiet': True}, output_dir=tmp_path, min_free_bytes=0, **kwargs)
+
+    def test_post_process_returns_immediately(self, tmp_path):
+        """Test downloads continue while postprocessing is in flight"""
+        release = threading.Event()
+        done = []
+
+        def slow_post_process(self, filename, info, files_to_move=None):
+            release.wait(5)
+            done.append(filename)
+            return info
+
+        with patch.object(yt_dlp.YoutubeDL, 'post_process', slow_post_process):
+            ydl = self.make_ydl(tmp_path, workers=2, max_pending=4)
+            for i in range(3):
+                info = {'id': str(i)}
+                assert ydl.post_process(f"file{i}", info) is info
+            assert done == []
+
+            release.set()
+            assert ydl.wait() == []
+            ydl.close()
+        assert sorted(done) == ['file0', 'file1', 'file2']
+
+    def test_back_pressure(self, tmp_path):
+        """Test at most max_pending jobs are ever outstanding"""
+        lock = threading.Lock()
+        running = [0, 0]  # current, peak
+
+        def slow_post_process(self, filename, info, files_to_move=None):
+            with lock:
+                running[0] += 1
+                running[1] = max(running[1], running[0])
+            time.sleep(0.02)
+            with lock:
+                running[0] -= 1
+            return info
+
+        with patch.object(yt_dlp.YoutubeDL, 'post_process', slow_post_process):
+            ydl = self.make_ydl(tmp_path, workers=4, max_pending=2)
+            for i in range(8):
+                ydl.post_process(f"file{i}", {})
+                assert ydl._pending <= 2
+            ydl.close()
+        assert running[1] <= 2
+
+    def test_failures_collected(self, tmp_path):
+        """Test postprocessing errors are reported after the run"""
+        def failing(self, filename, info, files_to_move=None):
+            raise yt_dlp.utils.PostProcessingError('ffmpeg exited with code 1')
+
+        with patch.object(yt_dlp.YoutubeDL, 'post_process', failing):
+            ydl = self.make_ydl(tmp_path)
+            ydl.post_process('broken.mp4', {})
+            assert ydl.wait() == [('broken.mp4', 'ffmpeg exited with code 1')]
+            ydl.close()
+
+    def test_unexpected_errors_collected(self, tmp_path):
+        """Test an error other than a postprocessing failure is reported rather than lost in the pool"""
+        def crashing(self, filename, info, files_to_move=None):
+            raise KeyError('filepath')
+
+        with patch.object(yt_dlp.YoutubeDL, 'post_process', crashing):
+            ydl = self.make_ydl(tmp_path)
+            ydl.post_process('broken.mp4', {})
+            assert ydl.wait() == [('broken.mp4', "'filepath'")]
+            ydl.close()
+
+    def test_archive_written_after_postprocessing(self, tmp_path, http_server):
+        """Test only videos whose postprocessing succeeded are recorded in the download archive"""
+        (tmp_path / 'media').mkdir()
+        (tmp_path / 'media' / 'v.mp4').write_bytes(b'media')
+        server = http_server(functools.partial(SimpleHTTPRequestHandler, directory=str(tmp_path / 'media')))
+        archive = tmp_path / 'archive.txt'
+        real_post_process = yt_dlp.YoutubeDL.post_process
+
+        def fail_bad(self, filename, info, files_to_move=None):
+            if info['id'] == 'bad':
+                raise yt_dlp.utils.PostProcessingError('merge failed')
+            return real_post_process(self, filename, info, files_to_move)
+
+        ydl = PipelinedYoutubeDL({'quiet': True, 'download_archive': str(archive),
+                                  'outtmpl': str(tmp_path / '%(id)s.%(ext)s')}, output_dir=tmp_path, min_free_bytes=0)
+        try:
+            with patch.object(yt_dlp.YoutubeDL, 'post_process', fail_bad):
+                infos = [ydl.process_ie_result({
+                    'id': video_id, 'title': video_id, 'extractor': 'test', 'extractor_key': 'Test',
+                    'formats': [{'url': f'{server.url}/v.mp4', 'ext': 'mp4'}],
+                }, download=True) for video_id in ('good', 'bad')]
+                ydl.wait()
+        finally:
+            ydl.close()
+        assert archive.read_text().splitlines() == ['test good']
+        # The final path reaches the caller's info once the job is done
+        assert infos[0]['requested_downloads'][0]['filepath'] == str(tmp_path / 'good.mp4')
@@ -0,0 +1,98 @@
+"""Tests for streaming playlist enumeration"""
+
+import threading
+import time
+
+import pytest
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+from ytd.playlist_stream import read_ahead, stream_playlist
+from ytd.utils import PlaylistItems
+
+
+class SlowPlaylistIE(InfoExtractor):
+    """Playlist whose entries arrive one slow page at a time"""
+    _VALID_URL = r'slowplaylist:(?P<id>\d+)'
+    IE_NAME = 'slowplaylist'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.paged = []
+
+    def _entries(self, count):
+        for i in range(count):
+            time.sleep(0.05)
+            self.paged.append(i)
+            yield {'id': f'v{i}', 'title': f'Video {i}', 'url': 'http://127.0.0.1:9/v.mp4', 'ext': 'mp4'}
+
+    def _real_extract(self, url):
+        count = int(self._match_id(url))
+        return self.playlist_result(self._entries(count), 'slow', 'Slow playlist')
+
+
+class TestReadAhead:
+    """Test the background pager"""
+
+    def test_order_and_errors(self):
+        """Test entries keep their order and paging errors reach the consumer"""
+        def entries():
+            yield 1
+            yield 2
+            raise ValueError('page 2 failed')
+
+        stream = read_ahead(entries(), size=1)
+        assert next(stream) == 1
+        assert next(stream) == 2
+        with pytest.raises(ValueError):
+            next(stream)
+
+    def test_close_stops_producer(self):
+        """Test abandoning the iterator stops paging"""
+        produced = []
+
+        def entries():
+            for i in range(1000):
+                produced.append(i)
+                yield i
+
+        stream = read_ahead(entries(), size=2)
+        assert next(stream) == 0
+        stream.close()
+        time.sleep(0.3)
+        assert len(produced) < 10
+        assert not any(t.name == 'ytd-playlist-pager' and t.is_alive() for t in threading.enumerate())
+
+
+class TestStreamPlaylist:
+    """Test downloads start before the playlist is fully enumerated"""
+
+    def test_first_entry_before_last_page(self):
+        """Test the first entry is processed while later pages are still loading"""
+        started = []
+        ie = SlowPlaylistIE()
+
+        def match_filter(info, incomplete):
+            if 'playlist_index' in info:  # Called for the playlist itself too
+                started.append((info['id'], len(ie.paged)))
+            return None
+
+        params = {'simulate': True, 'quiet': True, 'match_filter': match_filter}
+        with yt_dlp.YoutubeDL(params, auto_init=False) as ydl:
+            ydl.add_info_extractor(ie)
+            result = stream_playlist(ydl, 'slowplaylist:20')
+
+        assert len(result['entries']) == 20
+        first_id, pages_loaded = started[0]
+        assert first_id == 'v0'
+        assert pages_loaded < 20
+
+    def test_items_limit_paging(self):
+        """Test entries past the last requested item are never paged"""
+        ie = SlowPlaylistIE()
+        params = {'simulate': True, 'quiet': True, 'playlist_items': '2:3'}
+        with yt_dlp.YoutubeDL(params, auto_init=False) as ydl:
+            ydl.add_info_extractor(ie)
+            result = stream_playlist(ydl, 'slowplaylist:20', items=PlaylistItems.parse('2-3'))
+
+        assert [entry['id'] for entry in result['entries']] == ['v1', 'v2']
+        assert ie.paged == [0, 1, 2]
@@ -0,0 +1,135 @@
+"""Tests for concurrent playlist metadata prefetch"""
+
+import threading
+import time
+
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+from ytd.playlist_stream import stream_playlist
+from ytd.prefetch import HostRateLimiter, InfoCache, MetadataPrefetcher
+
+EXTRACT_SECONDS = 0.1
+
+
+class SlowVideoIE(InfoExtractor):
+    """Video pages that take a while to extract"""
+    _VALID_URL = r'https?://videos\.test/(?P<id>\w+)'
+    IE_NAME = 'slowvideo'
+    extracted = []
+    lock = threading.Lock()
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        time.sleep(EXTRACT_SECONDS)
+        with self.lock:
+            self.extracted.append(video_id)
+        return {
+            'id': video_id, 'title': f'Video {video_id}',
+            'formats': [{'format_id': '18', 'url': f'http://127.0.0.1:9/{video_id}.mp4', 'ext': 'mp4'}],
+        }
+
+
+class FlatPlaylistIE(InfoExtractor):
+    """Playlist of url entries pointing at SlowVideoIE pages"""
+    _VALID_URL = r'flatplaylist:(?P<id>\d+)'
+    IE_NAME = 'flatplaylist'
+
+    def _real_extract(self, url):
+        count = int(self._match_id(url))
+        entries = (self.url_result(f'https://videos.test/v{i}', SlowVideoIE.ie_key(), f'v{i}')
+                   for i in range(count))
+        return self.playlist_result(entries, 'flat', 'Flat playlist')
+
+
+def make_ydl(params):
+    ydl = yt_dlp.YoutubeDL({'quiet': True, **params}, auto_init=False)
+    ydl.add_info_extractor(SlowVideoIE())
+    ydl.add_info_extractor(FlatPlaylistIE())
+    return ydl
+
+
+def flat_entries(count):
+    return [{'_type': 'url', 'url': f'https://videos.test/v{i}', 'ie_key': 'SlowVideo', 'id': f'v{i}'}
+            for i in range(count)]
+
+
+class TestPrefetch:
+    """Test concurrent resolution, rate limiting and caching"""
+
+    def setup_method(self):
+        SlowVideoIE.extracted.clear()
+
+    def test_concurrent_and_ordered(self):
+        """Test entries resolve concurrently and keep playlist order"""
+        with MetadataPrefetcher(jobs=4, host_interval=0, ydl_factory=make_ydl) as prefetcher:
+            started = time.monotonic()
+            infos = prefetcher.prefetch(flat_entries(8))
+            elapsed = time.monotonic() - started
+
+        assert [info['id'] for info in infos] == [f'v{i}' for i in range(8)]
+        assert all(info.get('formats') for info in infos)
+        assert elapsed < 8 * EXTRACT_SECONDS * 0.6
+
+    def test_cache_reused(self):
+        """Test an entry already in the cache is not extracted again"""
+        cache = InfoCache()
+        with MetadataPrefetcher(jobs=2, host_interval=0, cache=cache, ydl_factory=make_ydl) as prefetcher:
+            prefetcher.prefetch(flat_entries(3))
+            prefetcher.prefetch(flat_entries(3))
+        assert len(SlowVideoIE.extracted) == 3
+        assert len(cache) == 3
+
+    def test_failed_entry_passed_through(self):
+        """Test entries that can't be extracted are left for yt-dlp to report"""
+        entry = {'_type': 'url', 'url': 'https://unknown.test/x', 'id': 'x'}
+        with MetadataPrefetcher(jobs=1, host_interval=0, ydl_factory=make_ydl) as prefetcher:
+            assert prefetcher.resolve(entry) is entry
+
+    def test_host_rate_limit(self):
+        """Test requests to one host are spaced while other hosts are not delayed"""
+        limiter = HostRateLimiter(interval=0.05)
+        started = time.monotonic()
+        for _ in range(4):
+            limiter.wait('videos.test')
+        assert time.monotonic() - started >= 0.15
+
+        started = time.monotonic()
+        limiter.wait('other.test')
+        assert time.monotonic() - started < 0.05
+
+    def test_playlist_download_uses_prefetched_entries(self):
+        """Test the playlist is downloaded from entries extracted ahead by the pool"""
+        seen = []
+
+        def match_filter(info, incomplete):
+            if 'playlist_index' in info and not incomplete:
+                seen.append(info['id'])
+            return None
+
+        with make_ydl({'simulate': True, 'match_filter': match_filter}) as ydl, \
+                MetadataPrefetcher(jobs=4, host_interval=0, ydl_factory=make_ydl) as prefetcher:
+            started = time.monotonic()
+            stream_playlist(ydl, 'flatplaylist:8', prefetcher=prefetcher)
+            elapsed = time.monotonic() - started
+
+        assert seen == [f'v{i}' for i in range(8)]
+        assert sorted(SlowVideoIE.extracted) == sorted(seen)  # Nothing extracted twice
+        assert elapsed < 8 * EXTRACT_SECONDS * 0.6
+
+    def test_streamed_entries_leave_cache(self):
+        """Test a streamed playlist only keeps the read-ahead window in the cache"""
+        cache = InfoCache()
+        sizes = []
+
+        def match_filter(info, incomplete):
+            if 'playlist_index' in info and not incomplete:
+                sizes.append(len(cache))
+            return None
+
+        with make_ydl({'simulate': True, 'match_filter': match_filter}) as ydl, \
+                MetadataPrefetcher(jobs=2, host_interval=0, cache=cache, ydl_factory=make_ydl) as prefetcher:
+            stream_playlist(ydl, 'flatplaylist:20', prefetcher=prefetcher)
+
+        assert len(sizes) == 20
+        assert max(sizes) <= 4  # jobs * 2 entries resolved ahead
+        assert len(cache) == 0
@@ -0,0 +1,62 @@
+"""Tests for the ffprobe result cache"""
+
+from unittest.mock import patch
+from ytd.probe import ProbeCache
+from ytd.merge_subtitles import select_subtitle_codec
+
+
+class TestProbeCache:
+    """Test probe caching by file identity"""
+
+    def test_cache_hit_and_invalidation(self, tmp_path):
+        """Test unchanged files are probed once and changed files again"""
+        video = tmp_path / 'video.mp4'
+        video.write_bytes(b'a')
+
+        cache = ProbeCache()
+        with patch('ytd.probe.run_ffprobe', return_value={'streams': []}) as run:
+            assert cache.probe(video) == {'streams': []}
+            cache.probe(video)
+            assert run.call_count == 1
+
+            video.write_bytes(b'changed')
+            cache.probe(video)
+            assert run.call_count == 2
+
+    def test_disk_store(self, tmp_path):
+        """Test results persist across cache instances"""
+        video = tmp_path / 'video.mkv'
+        video.write_bytes(b'a')
+        store = tmp_path / 'probe.json'
+
+        with patch('ytd.probe.run_ffprobe', return_value={'format': {'format_name': 'matroska,webm'}}):
+            cache = ProbeCache(store)
+            cache.probe(video)
+            cache.save()
+
+        with patch('ytd.probe.run_ffprobe') as run:
+            assert ProbeCache(store).probe(video)['format']['format_name'] == 'matroska,webm'
+            run.assert_not_called()
+
+    def test_probe_many(self, tmp_path):
+        """Test batch probing only runs ffprobe for misses"""
+        paths = []
+        for i in range(5):
+            paths.append(tmp_path / f"v{i}.mp4")
+            paths[-1].write_bytes(b'x')
+
+        cache = ProbeCache()
+        with patch('ytd.probe.run_ffprobe', side_effect=lambda p: {'name': p.name}) as run:
+            cache.probe(paths[0])
+            results = cache.probe_many(paths, jobs=3)
+
+        assert run.call_count == 5
+        assert [results[p]['name'] for p in paths] == [p.name for p in paths]
+
+    def test_select_subtitle_codec(self, tmp_path):
+        """Test codec selection by extension, falling back to the probed container"""
+        assert select_subtitle_codec(tmp_path / 'a.webm') == 'webvtt'
+        assert select_subtitle_codec(tmp_path / 'a.mkv') == 'srt'
+        info = {'format': {'format_name': 'matroska,webm'}}
+        assert select_subtitle_codec(tmp_path / 'a.video', info) == 'srt'
+        assert select_subtitle_codec(tmp_path / 'a.video') == 'mov_text'
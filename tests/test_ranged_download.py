@@ -0,0 +1,116 @@
+"""Tests for resumable ranged downloads against a local HTTP server"""
+
+import hashlib
+import os
+import re
+import pytest
+from tests.conftest import QuietHandler
+from ytd.ranged_download import download_file, DownloadError
+
+
+PAYLOAD = os.urandom(3 * 1024 * 1024 + 123)
+
+
+class RangeHandler(QuietHandler):
+    """Serves PAYLOAD with Range support and optional injected faults"""
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(PAYLOAD)))
+        if self.server.ranges:
+            self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+
+    def do_GET(self):
+        server = self.server
+        start, end = 0, len(PAYLOAD) - 1
+        match = re.match(r'bytes=(\d+)-(\d*)', self.headers.get('Range', ''))
+
+        with server.lock:
+            server.requests.append(self.headers.get('Range'))
+            fail_after = server.faults.pop(0) if server.faults else None
+
+        if match and server.ranges:
+            start = int(match.group(1))
+            end = int(match.group(2)) if match.group(2) else end
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{len(PAYLOAD)}")
+        else:
+            self.send_response(200)
+        body = PAYLOAD[start:end + 1]
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        if fail_after is not None:
+            # Send part of the body, then drop the connection
+            self.wfile.write(body[:fail_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server(http_server):
+    return http_server(RangeHandler, ranges=True, faults=[])
+
+
+def url_for(server):
+    return f"{server.url}/ffmpeg.tar.xz"
+
+
+class TestRangedDownload:
+    """Test resume, segmentation and checksum verification"""
+
+    def test_resume_after_dropped_connection(self, server, tmp_path):
+        """Test a dropped connection resumes from the bytes already written"""
+        server.faults = [500000]
+        dest = download_file(url_for(server), tmp_path / 'out')
+
+        assert dest.read_bytes() == PAYLOAD
+        assert server.requests == [None, 'bytes=500000-']
+
+    def test_resume_existing_partial_file(self, server, tmp_path):
+        """Test a partial file from an earlier run is continued, not restarted"""
+        dest = tmp_path / 'out'
+        dest.write_bytes(PAYLOAD[:1000])
+
+        download_file(url_for(server), dest)
+        assert dest.read_bytes() == PAYLOAD
+        assert server.requests == ['bytes=1000-']
+
+    def test_restart_without_range_support(self, server, tmp_path):
+        """Test servers ignoring Range get a full re-download"""
+        server.ranges = False
+        dest = tmp_path / 'out'
+        dest.write_bytes(b'stale')
+
+        download_file(url_for(server), dest, segments=4)
+        assert dest.read_bytes() == PAYLOAD
+
+    def test_segmented_download_with_fault(self, server, tmp_path):
+        """Test parallel segments, with one segment failing and retrying"""
+        server.faults = [1000]
+        progress = []
+        checksum = 'sha256:' + hashlib.sha256(PAYLOAD).hexdigest()
+
+        dest = download_file(url_for(server), tmp_path / 'out', segments=3, checksum=checksum,
+                             progress_callback=lambda done, total: progress.append(done))
+
+        assert dest.read_bytes() == PAYLOAD
+        assert len(server.requests) == 4
+        assert progress[-1] == len(PAYLOAD)
+        assert not (tmp_path / 'out.parts').exists()
+
+    def test_checksum_mismatch(self, server, tmp_path):
+        """Test a corrupted download is rejected and removed"""
+        with pytest.raises(DownloadError):
+            download_file(url_for(server), tmp_path / 'out', checksum='md5:' + '0' * 32)
+        assert not (tmp_path / 'out').exists()
+
+    def test_gives_up_after_retries(self, server, tmp_path):
+        """Test persistent failures raise and keep the partial file"""
+        server.faults = [100] * 10
+        with pytest.raises(DownloadError):
+            download_file(url_for(server), tmp_path / 'out', retries=2)
+        assert (tmp_path / 'out').stat().st_size == 300
@@ -0,0 +1,135 @@
+"""Tests for the retry scheduler"""
+
+import logging
+
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.utils import ExtractorError
+from ytd.playlist_stream import stream_playlist
+from ytd.retry import (ErrorCapture, FailedItem, FailureTracker, HostCooldowns, RetryPolicy,
+                       RetryScheduler, classify_error)
+
+
+class FlakyVideoIE(InfoExtractor):
+    """Videos that fail a set number of times before extracting"""
+    _VALID_URL = r'https?://flaky\.test/(?P<id>\w+)'
+    IE_NAME = 'flakyvideo'
+    failures = {}
+    attempts = {}
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        self.attempts[video_id] = self.attempts.get(video_id, 0) + 1
+        message = self.failures.get(video_id)
+        if message and self.attempts[video_id] <= 1:
+            raise ExtractorError(message, expected=True)
+        return {'id': video_id, 'title': video_id, 'url': 'http://127.0.0.1:9/v.mp4', 'ext': 'mp4'}
+
+
+class FlakyPlaylistIE(InfoExtractor):
+    _VALID_URL = r'flakyplaylist:(?P<id>\d+)'
+    IE_NAME = 'flakyplaylist'
+
+    def _real_extract(self, url):
+        entries = (self.url_result(f'https://flaky.test/v{i}', FlakyVideoIE.ie_key(), f'v{i}')
+                   for i in range(int(self._match_id(url))))
+        return self.playlist_result(entries, 'flaky', 'Flaky playlist')
+
+
+class TestClassification:
+    """Test error classes and the retry policy"""
+
+    def test_classify(self):
+        """Test yt-dlp error messages map to failure classes"""
+        assert classify_error('ERROR: [youtube] x: Unable to download webpage: HTTP Error 429: Too Many Requests') \
+            == 'rate_limited'
+        assert classify_error("ERROR: [youtube] x: Sign in to confirm you're not a bot") == 'throttled'
+        assert classify_error('ERROR: unable to download video data: HTTP Error 403: Forbidden') == 'forbidden'
+        assert classify_error('ERROR: [Errno 104] Connection reset by peer') == 'network'
+        assert classify_error('ERROR: [youtube] x: Video unavailable') == 'unavailable'
+        assert classify_error('ERROR: [youtube] x: Unable to extract player response') == 'extractor'
+        assert classify_error('ERROR: something odd') == 'other'
+
+    def test_policy(self):
+        """Test retry limits per class and exponential backoff"""
+        policy = RetryPolicy(retries=3, backoff=10, max_delay=60)
+        assert policy.should_retry('network', 3)
+        assert not policy.should_retry('network', 4)
+        assert not policy.should_retry('extractor', 2)
+        assert not policy.should_retry('unavailable', 1)
+        assert 5 <= policy.delay(1) < 15
+        assert 10 <= policy.delay(2) < 30
+        assert policy.delay(10) < 90  # Capped before jitter
+
+    def test_cooldown(self):
+        """Test a rate-limited host is paused, longer on repeated strikes"""
+        cooldowns = HostCooldowns(cooldown=10)
+        first = cooldowns.penalize('www.youtube.com')
+        second = cooldowns.penalize('www.youtube.com')
+        assert 5 <= first < 15 and 10 <= second < 30
+        assert cooldowns.remaining('www.youtube.com') > 0
+        assert cooldowns.remaining('vimeo.com') == 0
+
+        slept = []
+        cooldowns.wait('www.youtube.com', sleep=slept.append)
+        assert slept and slept[0] > 0
+
+
+class TestScheduler:
+    """Test failed items are retried until they succeed or run out of retries"""
+
+    def test_retry_until_success(self):
+        """Test retriable failures are re-run and permanent ones are not"""
+        slept = []
+        scheduler = RetryScheduler(RetryPolicy(retries=3, backoff=1), HostCooldowns(), sleep=slept.append)
+        flaky = FailedItem('https://www.youtube.com/watch?v=a', ['HTTP Error 503'])
+        gone = FailedItem('https://www.youtube.com/watch?v=b', ['Video unavailable'])
+        outcomes = {flaky.item: [['Connection reset'], []]}
+
+        recovered, given_up = scheduler.run([flaky, gone], lambda failure: outcomes[failure.item].pop(0))
+        assert recovered == [flaky] and flaky.attempts == 3
+        assert given_up == [gone] and gone.attempts == 1
+        assert len(slept) == 2
+
+    def test_rate_limit_waits_for_host(self):
+        """Test a 429 during a retry pauses further attempts against that host"""
+        cooldowns = HostCooldowns(cooldown=30)
+        slept = []
+        scheduler = RetryScheduler(RetryPolicy(retries=2, backoff=0), cooldowns, sleep=slept.append)
+        failure = FailedItem('https://www.youtube.com/watch?v=a', ['Connection reset'])
+        outcomes = [['HTTP Error 429: Too Many Requests'], []]
+
+        recovered, _ = scheduler.run([failure], lambda _: outcomes.pop(0))
+        assert recovered == [failure]
+        assert any(wait >= 15 for wait in slept)
+
+    def test_playlist_entries_retried(self):
+        """Test failed playlist entries are found and retried with their playlist index"""
+        FlakyVideoIE.failures = {'v1': 'HTTP Error 429: Too Many Requests', 'v2': 'Video unavailable'}
+        FlakyVideoIE.attempts = {}
+        logger = logging.getLogger('test_retry')
+        capture = ErrorCapture(logger)
+        cooldowns = HostCooldowns(cooldown=0)
+        tracker = FailureTracker(capture, cooldowns, logger, sleep=lambda _: None)
+
+        ydl = yt_dlp.YoutubeDL({'simulate': True, 'quiet': True, 'ignoreerrors': True, 'logger': capture},
+                               auto_init=False)
+        ydl.add_info_extractor(FlakyVideoIE())
+        ydl.add_info_extractor(FlakyPlaylistIE())
+        with ydl:
+            stream_playlist(ydl, 'flakyplaylist:4', wrap_entries=tracker.track)
+            assert [(f.item['id'], f.error_class) for f in tracker.failed] == \
+                [('v1', 'rate_limited'), ('v2', 'unavailable')]
+            assert tracker.failed[0].extra_info['playlist_index'] == 2
+
+            def process(failure):
+                capture.take()
+                ydl.process_ie_result(dict(failure.item), download=True, extra_info=failure.extra_info)
+                return capture.take()
+
+            scheduler = RetryScheduler(RetryPolicy(backoff=0), cooldowns, logger, sleep=lambda _: None)
+            recovered, given_up = scheduler.run(tracker.failed, process)
+
+        assert [f.item['id'] for f in recovered] == ['v1']
+        assert [f.item['id'] for f in given_up] == ['v2']
+        assert FlakyVideoIE.attempts == {'v0': 1, 'v1': 2, 'v2': 1, 'v3': 1}
@@ -0,0 +1,73 @@
+"""Tests for the content-addressed media store"""
+
+import os
+
+import yt_dlp
+from ytd.store import MediaStore
+
+
+def video_info(video_id='abc123', title='Some title'):
+    return {
+        'id': video_id, 'title': title, 'ext': 'mp4', 'format_id': '18',
+        'extractor': 'youtube', 'extractor_key': 'Youtube',
+        'url': 'http://127.0.0.1:9/unreachable.mp4',
+        'webpage_url': f'https://www.youtube.com/watch?v={video_id}',
+    }
+
+
+class TestMediaStore:
+    """Test ingesting, deduplicating and linking downloads"""
+
+    def test_ingest_and_lookup(self, tmp_path):
+        """Test a finished download is stored once and its output becomes a view"""
+        store = MediaStore(tmp_path / 'store')
+        video = tmp_path / 'out' / 'video.mp4'
+        video.parent.mkdir()
+        video.write_bytes(b'video bytes')
+
+        obj, duplicate = store.ingest(video, 'Youtube', 'abc123', '18')
+        assert not duplicate
+        assert os.path.samefile(video, obj)
+        assert store.lookup('Youtube', 'abc123', '18') == obj
+        assert store.lookup('Youtube', 'abc123', '22') is None
+        assert store.lookup('Youtube', 'abc123', '18', 'mp3') is None
+
+    def test_identical_content_shared(self, tmp_path):
+        """Test identical bytes under different keys keep one object"""
+        store = MediaStore(tmp_path / 'store')
+        first, second = tmp_path / 'a.mp4', tmp_path / 'b.mp4'
+        first.write_bytes(b'same')
+        second.write_bytes(b'same')
+
+        obj, _ = store.ingest(first, 'Youtube', 'one', '18')
+        obj2, duplicate = store.ingest(second, 'Youtube', 'two', '18')
+        assert duplicate and obj2 == obj
+        assert os.path.samefile(second, obj)
+        assert len(list((tmp_path / 'store' / 'objects').rglob('*.mp4'))) == 1
+
+    def test_symlink_views(self, tmp_path):
+        """Test symlink mode links views to the stored object"""
+        store = MediaStore(tmp_path / 'store', link_mode='symlink')
+        obj = tmp_path / 'object.mp4'
+        obj.write_bytes(b'data')
+        view = tmp_path / 'playlist' / 'video.mp4'
+
+        assert store.link(obj, view) == 'symlink'
+        assert view.is_symlink() and view.read_bytes() == b'data'
+
+    def test_stored_download_skipped(self, tmp_path):
+        """Test yt-dlp links a stored video to its new name instead of downloading it"""
+        store = MediaStore(tmp_path / 'store')
+        existing = tmp_path / 'first.mp4'
+        existing.write_bytes(b'stored video')
+        obj, _ = store.ingest(existing, 'Youtube', 'abc123', '18')
+
+        opts = {'outtmpl': str(tmp_path / 'playlist' / '%(title)s.%(ext)s'), 'quiet': True}
+        with yt_dlp.YoutubeDL(opts) as ydl:
+            store.attach(ydl)
+            ydl.process_ie_result(video_info(title='Renamed'), download=True)
+
+        # The URL is unreachable, so the file can only have come from the store
+        view = tmp_path / 'playlist' / 'Renamed.mp4'
+        assert os.path.samefile(view, obj)
+        assert len(list((tmp_path / 'store' / 'objects').rglob('*.mp4'))) == 1
@@ -0,0 +1,196 @@
+"""Tests for extracting archive members from a non-seekable stream"""
+
+import hashlib
+import io
+import os
+import tarfile
+import zipfile
+from unittest.mock import patch
+
+from ytd.ffmpeg_helper import FFmpegHelper, invalidate_ffmpeg_cache
+from ytd.stream_extract import StreamReader, extract_members
+
+
+FFMPEG = os.urandom(300000)
+FFPROBE = os.urandom(1000) * 50
+README = b'readme ' * 1000
+
+
+class OneWayStream(io.RawIOBase):
+    """Forward-only stream, like an HTTP response body"""
+
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+        self.headers = {'Content-Length': str(len(data))}
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        return self.data.read(min(size, 7000) if size and size > 0 else size)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+def make_tar(mode='w:xz'):
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode=mode) as tar:
+        for name, data in [('build/readme.txt', README), ('build/bin/ffmpeg', FFMPEG),
+                           ('build/bin/ffprobe', FFPROBE)]:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+def make_zip(seekable=True, binary_compression=zipfile.ZIP_STORED):
+    """Zip archive; written to a non-seekable sink it uses data descriptors"""
+    buffer = io.BytesIO()
+    sink = buffer if seekable else OneWayStream(b'')
+    if not seekable:
+        sink.write = buffer.write
+        sink.writable = lambda: True
+        sink.seekable = lambda: False
+        sink.flush = lambda: None
+    with zipfile.ZipFile(sink, 'w') as archive:
+        archive.writestr('ffmpeg-win64/README.txt', README, compress_type=zipfile.ZIP_DEFLATED)
+        archive.writestr('ffmpeg-win64/bin/ffmpeg.exe', FFMPEG, compress_type=binary_compression)
+        archive.writestr('ffmpeg-win64/bin/ffprobe.exe', FFPROBE, compress_type=zipfile.ZIP_DEFLATED)
+    return buffer.getvalue()
+
+
+class TestStreamExtract:
+    """Test member extraction from tar and zip streams"""
+
+    def extract(self, data, tmp_path, names, **kwargs):
+        wanted = {name: tmp_path / name for name in names}
+        reader = StreamReader(OneWayStream(data), 'sha256')
+        extracted = extract_members(reader, wanted, **kwargs)
+        return reader, extracted
+
+    def test_tar_xz(self, tmp_path):
+        """Test only the wanted members of a compressed tar are written"""
+        data = make_tar()
+        reader, extracted = self.extract(data, tmp_path, ['ffmpeg', 'ffprobe'])
+        reader.drain()
+
+        assert (tmp_path / 'ffmpeg').read_bytes() == FFMPEG
+        assert (tmp_path / 'ffprobe').read_bytes() == FFPROBE
+        assert sorted(extracted) == ['ffmpeg', 'ffprobe']
+        assert not (tmp_path / 'readme.txt').exists()
+        assert reader.hexdigest() == hashlib.sha256(data).hexdigest()
+
+    def test_zip(self, tmp_path):
+        """Test stored and deflated zip entries"""
+        data = make_zip()
+        reader, extracted = self.extract(data, tmp_path, ['ffmpeg.exe', 'ffprobe.exe'])
+        reader.drain()
+
+        assert (tmp_path / 'ffmpeg.exe').read_bytes() == FFMPEG
+        assert (tmp_path / 'ffprobe.exe').read_bytes() == FFPROBE
+        assert reader.hexdigest() == hashlib.sha256(data).hexdigest()
+
+    def test_zip_with_data_descriptors(self, tmp_path):
+        """Test entries whose sizes only follow the data"""
+        data = make_zip(seekable=False, binary_compression=zipfile.ZIP_DEFLATED)
+        assert zipfile.ZipFile(io.BytesIO(data)).infolist()[0].flag_bits & 0x08
+
+        _, extracted = self.extract(data, tmp_path, ['ffprobe.exe'])
+        assert (tmp_path / 'ffprobe.exe').read_bytes() == FFPROBE
+
+    def test_stop_early(self, tmp_path):
+        """Test the stream is not read past the last wanted member"""
+        data = make_tar('w:gz')
+        reader, _ = self.extract(data, tmp_path, ['ffmpeg'], stop_early=True)
+        assert (tmp_path / 'ffmpeg').read_bytes() == FFMPEG
+        assert reader.bytes_read < len(data)
+
+
+class TestStreamingInstall:
+    """Test installing ffmpeg without saving the archive"""
+
+    def install(self, tmp_path, data, checksum, request=None):
+        invalidate_ffmpeg_cache()
+        helper = FFmpegHelper()
+        helper.system = 'Linux'
+        helper.app_dir = tmp_path
+        helper.ffmpeg_dir = tmp_path / 'ffmpeg'
+        helper.ffmpeg_path = helper.ffmpeg_dir / 'ffmpeg'
+
+        with patch('ytd.ffmpeg_helper.default_pool') as pool, \
+                patch.object(FFmpegHelper, '_fetch_checksum', return_value=checksum):
+            if request:
+                pool.return_value.request.side_effect = request
+            else:
+                pool.return_value.request.return_value = OneWayStream(data)
+            ok = helper.download_ffmpeg(progress_callback=lambda *args: None)
+        invalidate_ffmpeg_cache()
+        return ok, helper.ffmpeg_dir
+
+    def test_install(self, tmp_path):
+        """Test both binaries are installed and no archive is left behind"""
+        data = make_tar()
+        ok, ffmpeg_dir = self.install(tmp_path, data, 'md5:' + hashlib.md5(data).hexdigest())
+
+        assert ok
+        assert sorted(p.name for p in ffmpeg_dir.iterdir()) == ['ffmpeg', 'ffprobe']
+        assert (ffmpeg_dir / 'ffmpeg').read_bytes() == FFMPEG
+        assert os.access(ffmpeg_dir / 'ffmpeg', os.X_OK)
+
+    def test_checksum_mismatch(self, tmp_path):
+        """Test nothing is installed when the archive fails verification"""
+        ok, ffmpeg_dir = self.install(tmp_path, make_tar(), 'md5:' + '0' * 32)
+
+        assert not ok
+        assert list(ffmpeg_dir.iterdir()) == []
+
+    def dropped_then_ranged(self, data, drop_at=100000, status=206):
+        """Requests to a server whose first response breaks off at drop_at"""
+        stream = OneWayStream(data)
+        read = stream.read
+        offsets = []
+
+        def dropping_read(size=-1):
+            if stream.data.tell() >= drop_at:
+                raise ConnectionResetError('Connection reset by peer')
+            return read(size)
+
+        def request(method, url, headers=None):
+            if not headers:
+                return stream
+            offset = int(headers['Range'][len('bytes='):-1])
+            offsets.append(offset)
+            ranged = OneWayStream(data[offset:] if status == 206 else data)
+            ranged.status = status
+            ranged.headers['Content-Range'] = f'bytes {offset}-{len(data) - 1}/{len(data)}'
+            return ranged
+
+        stream.read = dropping_read
+        return request, offsets
+
+    def test_interrupted_stream_resumed(self, tmp_path):
+        """Test a dropped connection is continued with a Range request, without writing the archive"""
+        data = make_tar()
+        request, offsets = self.dropped_then_ranged(data)
+        with patch('ytd.ffmpeg_helper.download_file') as download_file:
+            ok, ffmpeg_dir = self.install(tmp_path, data, 'md5:' + hashlib.md5(data).hexdigest(), request)
+
+        assert ok
+        assert len(offsets) == 1 and offsets[0] >= 100000
+        download_file.assert_not_called()
+        assert sorted(p.name for p in ffmpeg_dir.iterdir()) == ['ffmpeg', 'ffprobe']
+        assert (ffmpeg_dir / 'ffmpeg').read_bytes() == FFMPEG
+
+    def test_resume_refused(self, tmp_path):
+        """Test a server that ignores Range fails the install rather than splicing in the wrong bytes"""
+        data = make_tar()
+        request, offsets = self.dropped_then_ranged(data, status=200)
+        ok, ffmpeg_dir = self.install(tmp_path, data, None, request)
+
+        assert not ok
+        assert len(offsets) == 1
+        assert list(ffmpeg_dir.iterdir()) == []
@@ -0,0 +1,127 @@
+"""Tests for fetching subtitles after the media under per-host rate limits"""
+
+import pytest
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+from tests.conftest import QuietHandler
+from ytd.retry import HostCooldowns, RetryPolicy
+from ytd.subtitle_fetch import SubtitleFetcher, TokenBucket
+
+VTT = 'WEBVTT\n\n00:00:00.000 --> 00:00:01.000\nHello\n'
+
+
+class MediaHandler(QuietHandler):
+    """Serves tiny media files and subtitles, rate limiting subtitles on request"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            limited = self.path.endswith('.vtt') and server.rate_limit > 0
+            if limited:
+                server.rate_limit -= 1
+        if limited:
+            self.send_response(429)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = VTT.encode() if self.path.endswith('.vtt') else b'media bytes'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server(http_server):
+    return http_server(MediaHandler, rate_limit=0)
+
+
+class SubtitledVideoIE(InfoExtractor):
+    """Videos with English and German subtitles served by the test server"""
+    _VALID_URL = r'subtitled:(?P<id>\d+)'
+    IE_NAME = 'subtitled'
+    base = None
+    extractions = 0
+
+    def _real_extract(self, url):
+        count = int(self._match_id(url))
+        SubtitledVideoIE.extractions += 1
+        entries = [{
+            'id': f'v{i}', 'title': f'video {i}', 'url': f'{self.base}/v{i}.mp4', 'ext': 'mp4',
+            'subtitles': {lang: [{'url': f'{self.base}/v{i}.{lang}.vtt', 'ext': 'vtt'}] for lang in ('en', 'de')},
+        } for i in range(count)]
+        return self.playlist_result(entries, 'subtitled', 'Subtitled videos')
+
+
+def download(server, tmp_path, fetcher, count=2, **params):
+    SubtitledVideoIE.base = server.url
+    SubtitledVideoIE.extractions = 0
+    params = {
+        'quiet': True, 'no_warnings': True, 'outtmpl': str(tmp_path / '%(title)s.%(ext)s'),
+        'writesubtitles': True, 'subtitleslangs': ['all'], **params,
+    }
+    ydl = yt_dlp.YoutubeDL(params, auto_init=False)
+    ydl.add_info_extractor(SubtitledVideoIE())
+    fetcher.attach(ydl)
+    with ydl:
+        ydl.download([f'subtitled:{count}'])
+
+
+class TestTokenBucket:
+    """Test burst and spacing of subtitle requests"""
+
+    def test_burst_then_spacing(self):
+        """Test burst requests pass at once and later ones wait an interval each"""
+        now = [0.0]
+        bucket = TokenBucket(interval=2, burst=2, clock=lambda: now[0])
+        assert [bucket.take() for _ in range(4)] == [0, 0, 2, 4]
+
+        now[0] = 10.0  # Refilled, but never beyond the burst
+        assert [bucket.take() for _ in range(3)] == [0, 0, 2]
+
+
+class TestSubtitleFetcher:
+    """Test media and subtitles come from one extraction, subtitles last"""
+
+    def test_subtitles_after_media(self, server, tmp_path):
+        """Test each video's subtitles are fetched after its media and land next to it"""
+        slept = []
+        fetcher = SubtitleFetcher(interval=1, burst=2, sleep=slept.append)
+        download(server, tmp_path, fetcher)
+
+        assert SubtitledVideoIE.extractions == 1
+        kinds = ['sub' if path.endswith('.vtt') else 'media' for path in server.requests]
+        assert kinds == ['media', 'sub', 'sub'] * 2
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            'video 0.de.vtt', 'video 0.en.vtt', 'video 0.mp4',
+            'video 1.de.vtt', 'video 1.en.vtt', 'video 1.mp4']
+        assert len([s for s in slept if s > 0]) == 2  # Two requests beyond the burst of two
+
+    def test_archived_after_subtitles(self, server, tmp_path):
+        """Test a video whose subtitles gave up stays out of the archive and the next run completes it"""
+        archive = tmp_path / 'archive.txt'
+        server.rate_limit = 100
+        fetcher = SubtitleFetcher(interval=0, policy=RetryPolicy(retries=1, backoff=0),
+                                  cooldowns=HostCooldowns(cooldown=0), sleep=lambda seconds: None)
+        download(server, tmp_path, fetcher, count=1, download_archive=str(archive), ignoreerrors=True)
+        assert (tmp_path / 'video 0.mp4').exists()
+        assert not archive.exists() or archive.read_text() == ''
+
+        server.rate_limit = 0
+        download(server, tmp_path, fetcher, count=1, download_archive=str(archive))
+        assert (tmp_path / 'video 0.en.vtt').read_text() == VTT
+        assert archive.read_text().split() == ['subtitledvideo', 'v0']
+        assert [path for path in server.requests if path.endswith('.mp4')] == ['/v0.mp4']  # Media kept
+
+    def test_rate_limited_subtitle_retried(self, server, tmp_path):
+        """Test a 429 cools the host down and the subtitle is fetched on retry"""
+        server.rate_limit = 1
+        slept = []
+        fetcher = SubtitleFetcher(interval=0, policy=RetryPolicy(backoff=0),
+                                  cooldowns=HostCooldowns(cooldown=30), sleep=slept.append)
+        download(server, tmp_path, fetcher, count=1)
+
+        assert (tmp_path / 'video 0.de.vtt').read_text() == VTT
+        assert (tmp_path / 'video 0.en.vtt').read_text() == VTT
+        assert any(s >= 15 for s in slept)
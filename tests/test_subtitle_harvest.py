@@ -0,0 +1,135 @@
+"""Tests for bulk subtitle harvesting"""
+
+import threading
+
+import pytest
+import yt_dlp
+from yt_dlp.extractor.common import InfoExtractor
+from tests.conftest import KeepAliveHandler
+from ytd.retry import RetryPolicy
+from ytd.subtitle_harvest import SubtitleHarvester, to_url
+
+VTT = 'WEBVTT\n\n00:00:01.000 --> 00:00:02.500\n<c>Hello</c> there\n'
+
+
+class CaptionHandler(KeepAliveHandler):
+    """Serves caption tracks, rate limiting them on request"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            limited = server.rate_limit > 0
+            if limited:
+                server.rate_limit -= 1
+        status, body = (429, b'') if limited else (200, VTT.encode())
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server(http_server):
+    return http_server(CaptionHandler, rate_limit=0)
+
+
+class CaptionVideoIE(InfoExtractor):
+    """Video pages with English and German captions on the test server"""
+    _VALID_URL = r'https?://captions\.test/(?P<id>\w+)'
+    IE_NAME = 'captionvideo'
+    _RETURN_TYPE = 'video'
+    base = None
+    extracted = []
+    threads = set()
+
+    def _real_extract(self, url):
+        video_id = self._match_id(url)
+        self.extracted.append(video_id)
+        self.threads.add(threading.current_thread().name)
+        return {
+            'id': video_id, 'title': f'Video {video_id}',
+            'formats': [{'url': f'{self.base}/{video_id}.mp4', 'ext': 'mp4'}],
+            'subtitles': {'en': [{'url': f'{self.base}/{video_id}.en.vtt', 'ext': 'vtt'}]},
+            'automatic_captions': {lang: [{'url': f'{self.base}/{video_id}.{lang}.vtt', 'ext': 'vtt'}]
+                                   for lang in ('en', 'de')},
+        }
+
+
+class CaptionPlaylistIE(InfoExtractor):
+    _VALID_URL = r'captionplaylist:(?P<id>\d+)'
+    IE_NAME = 'captionplaylist'
+
+    def _real_extract(self, url):
+        entries = [self.url_result(f'https://captions.test/v{i}', CaptionVideoIE.ie_key(), f'v{i}')
+                   for i in range(int(self._match_id(url)))]
+        return self.playlist_result(entries, 'captions', 'Captioned videos')
+
+
+def make_ydl(params):
+    ydl = yt_dlp.YoutubeDL(params, auto_init=False)
+    ydl.add_info_extractor(CaptionVideoIE())
+    ydl.add_info_extractor(CaptionPlaylistIE())
+    return ydl
+
+
+def harvester(server, tmp_path, **kwargs):
+    CaptionVideoIE.base = server.url
+    return SubtitleHarvester(tmp_path / 'subs', langs=['en', 'de'], interval=0, ydl_factory=make_ydl,
+                             sleep=lambda _: None, **kwargs)
+
+
+class TestSubtitleHarvester:
+    """Test bulk harvesting over pooled connections"""
+
+    def setup_method(self):
+        CaptionVideoIE.extracted = []
+        CaptionVideoIE.threads = set()
+
+    def test_to_url(self):
+        """Test bare video ids become watch URLs and URLs pass through"""
+        assert to_url('dQw4w9WgXcQ') == 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+        assert to_url('https://youtu.be/dQw4w9WgXcQ') == 'https://youtu.be/dQw4w9WgXcQ'
+
+    def test_playlist_converted_over_kept_alive_connections(self, server, tmp_path):
+        """Test every track is fetched once, written as SRT, over one connection per worker"""
+        stats = harvester(server, tmp_path, convert='srt', jobs=2).harvest(['captionplaylist:6'])
+
+        assert stats['videos'] == 6 and stats['tracks'] == 12 and stats['failed'] == 0
+        names = sorted(p.name for p in (tmp_path / 'subs').iterdir())
+        assert names == sorted(f'Video v{i}.{lang}.srt' for i in range(6) for lang in ('en', 'de'))
+        assert (tmp_path / 'subs' / 'Video v0.en.srt').read_text() == \
+            '1\n00:00:01,000 --> 00:00:02,500\nHello there\n'
+        assert len(server.requests) == 12
+        assert server.connections <= 2
+
+    def test_archive_skips_before_extraction(self, server, tmp_path):
+        """Test videos already in the archive are not extracted again"""
+        archive = tmp_path / 'harvested.txt'
+        harvester(server, tmp_path, archive=archive).harvest(['captionplaylist:3'])
+        assert sorted(archive.read_text().splitlines()) == [f'captionvideo v{i}' for i in range(3)]
+
+        stats = harvester(server, tmp_path, archive=archive).harvest(['captionplaylist:4'])
+        assert stats['skipped'] == 3 and stats['videos'] == 1
+        assert CaptionVideoIE.extracted[3:] == ['v3']
+
+    def test_rate_limited_track_retried(self, server, tmp_path):
+        """Test a 429 response is retried after the host's cool-down"""
+        server.rate_limit = 1
+        stats = harvester(server, tmp_path, jobs=1, policy=RetryPolicy(backoff=0)).harvest(
+            ['https://captions.test/v0'])
+        assert stats['tracks'] == 2 and stats['failed'] == 0
+        assert (tmp_path / 'subs' / 'Video v0.de.vtt').read_text() == VTT
+
+    def test_video_list_skipped_and_extracted_on_workers(self, server, tmp_path):
+        """Test listed videos are checked against the archive unextracted, then extracted concurrently"""
+        archive = tmp_path / 'harvested.txt'
+        archive.write_text('captionvideo v0\n')
+        h = harvester(server, tmp_path, archive=archive, jobs=2)
+        stats = h.harvest([f'https://captions.test/v{i}' for i in range(4)])
+
+        assert stats['skipped'] == 1 and stats['videos'] == 3 and stats['tracks'] == 6
+        assert sorted(CaptionVideoIE.extracted) == ['v1', 'v2', 'v3']
+        assert all(name.startswith('ytd-prefetch') for name in CaptionVideoIE.threads)
+        # Info dicts are dropped once their tracks are written
+        assert len(h.cache) == 0
@@ -0,0 +1,74 @@
+"""Tests for the subtitle search index"""
+
+from pathlib import Path
+from ytd.subtitle_index import SubtitleIndex, describe_subtitle_file
+
+
+VTT = """WEBVTT
+
+00:00:01.000 --> 00:00:02.000
+the quick brown fox
+
+00:01:00.000 --> 00:01:02.000
+jumps over the lazy dog
+"""
+
+
+class TestSubtitleIndex:
+    """Test indexing and searching subtitle files"""
+
+    def test_describe_subtitle_file(self):
+        """Test video id and language are taken from the filename"""
+        assert describe_subtitle_file(Path('Talk [dQw4w9WgXcQ].en-US.vtt')) == ('dQw4w9WgXcQ', 'en-US')
+        assert describe_subtitle_file(Path('My Video.srt')) == ('My Video', None)
+
+    def test_index_and_search(self, tmp_path):
+        """Test phrase search returns timestamped hits"""
+        (tmp_path / 'Talk [dQw4w9WgXcQ].en.vtt').write_text(VTT, encoding='utf-8')
+
+        with SubtitleIndex(tmp_path / 'index.sqlite') as index:
+            assert index.update(tmp_path)['added'] == 1
+
+            hits = index.search('"lazy dog"')
+            assert len(hits) == 1
+            assert hits[0]['video_id'] == 'dQw4w9WgXcQ'
+            assert hits[0]['lang'] == 'en'
+            assert hits[0]['start_ms'] == 60000
+
+            assert index.search('"dog lazy"') == []
+
+    def test_incremental_update(self, tmp_path):
+        """Test unchanged files are skipped and removed files are dropped"""
+        sub = tmp_path / 'video.vtt'
+        sub.write_text(VTT, encoding='utf-8')
+
+        with SubtitleIndex(tmp_path / 'index.sqlite') as index:
+            index.update(tmp_path)
+            assert index.update(tmp_path)['unchanged'] == 1
+
+            sub.write_text(VTT.replace('fox', 'cat'), encoding='utf-8')
+            assert index.update(tmp_path)['updated'] == 1
+            assert index.search('fox') == []
+            assert len(index.search('cat')) == 1
+
+            sub.unlink()
+            assert index.update(tmp_path)['removed'] == 1
+            assert index.search('cat') == []
+
+    def test_cues_deleted_by_rowid_range(self, tmp_path):
+        """Test re-indexing one file drops only its cues, without filtering on the unindexed file_id"""
+        (tmp_path / 'a.vtt').write_text(VTT, encoding='utf-8')
+        (tmp_path / 'b.vtt').write_text(VTT.replace('fox', 'owl'), encoding='utf-8')
+
+        with SubtitleIndex(tmp_path / 'index.sqlite') as index:
+            index.update(tmp_path)
+            statements = []
+            index.conn.set_trace_callback(statements.append)
+            (tmp_path / 'a.vtt').write_text(VTT.replace('fox', 'cat') + VTT, encoding='utf-8')
+            (tmp_path / 'b.vtt').unlink()
+            assert index.update(tmp_path) == {'added': 0, 'updated': 1, 'removed': 1, 'unchanged': 0}
+
+            assert [s for s in statements if s.startswith('DELETE FROM cues WHERE rowid BETWEEN')]
+            assert not [s for s in statements if 'file_id =' in s and s.startswith('DELETE FROM cues')]
+            assert len(index.search('cat')) == 1 and len(index.search('fox')) == 1
+            assert index.search('owl') == []
@@ -0,0 +1,144 @@
+"""Tests for the concurrent thumbnail pipeline"""
+
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from tests.conftest import KeepAliveHandler
+from ytd import thumbnails
+from ytd.thumbnails import ThumbnailPipeline, best_thumbnail, convert_image
+
+
+class ImageHandler(KeepAliveHandler):
+    """Serves the request path as image data"""
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append(self.path)
+        body = self.path.encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def server(http_server):
+    return http_server(ImageHandler)
+
+
+def video(server, video_id):
+    return {'id': video_id, 'extractor_key': 'Youtube', 'thumbnails': [
+        {'url': f'{server.url}/{video_id}/small.jpg', 'width': 120, 'height': 90},
+        {'url': f'{server.url}/{video_id}/maxres.webp', 'width': 1280, 'height': 720},
+        {'url': f'{server.url}/{video_id}/medium.jpg', 'width': 320, 'height': 180},
+    ]}
+
+
+def slow_convert(data, dest, max_size):
+    """Stands in for decoding and resizing: takes a while, writes the fetched bytes"""
+    time.sleep(0.2)
+    Path(dest).write_bytes(data)
+
+
+class TestThumbnailPipeline:
+    """Test thumbnails are fetched and converted ahead of the embed step"""
+
+    def test_best_thumbnail(self):
+        """Test preference wins over size, then the largest image, then info['thumbnail']"""
+        assert best_thumbnail({'thumbnails': [{'url': 'a', 'width': 10, 'height': 10},
+                                              {'url': 'b', 'width': 20, 'height': 20}]}) == 'b'
+        assert best_thumbnail({'thumbnails': [{'url': 'a', 'preference': 1},
+                                              {'url': 'b', 'width': 20, 'height': 20}]}) == 'a'
+        assert best_thumbnail({'thumbnail': 'c', 'thumbnails': []}) == 'c'
+
+    def test_batch_prepared_concurrently(self, server, tmp_path):
+        """Test a batch is fetched and converted on the workers at once, over kept-alive connections"""
+        pipeline = ThumbnailPipeline(tmp_path / 'cache', jobs=4)
+        start = time.monotonic()
+        with patch.object(thumbnails, 'convert_image', slow_convert):
+            futures = [pipeline.submit(video(server, f'v{i}')) for i in range(8)]
+            paths = [future.result() for future in futures]
+        elapsed = time.monotonic() - start
+        pipeline.close()
+
+        assert elapsed < 1.2  # 0.4s with four workers, 1.6s one at a time
+        assert [path.name for path in paths] == [f'youtube_v{i}_1280.jpg' for i in range(8)]
+        assert paths[3].read_bytes() == b'/v3/maxres.webp'
+        assert server.connections <= 4
+
+    def test_cached_by_video_id(self, server, tmp_path):
+        """Test a video's thumbnail is fetched once per size, within a run and across runs"""
+        with patch.object(thumbnails, 'convert_image', slow_convert):
+            pipeline = ThumbnailPipeline(tmp_path / 'cache')
+            first = pipeline.submit(video(server, 'v0'))
+            assert pipeline.submit(video(server, 'v0')) is first
+            first.result()
+            pipeline.close()
+
+            again = ThumbnailPipeline(tmp_path / 'cache')
+            assert again.result(video(server, 'v0')) == first.result()
+            again.close()
+            assert server.requests == ['/v0/maxres.webp']
+
+            # Another size is another image
+            original = ThumbnailPipeline(tmp_path / 'cache', max_size=0)
+            assert original.result(video(server, 'v0')).name == 'youtube_v0_full.jpg'
+            original.close()
+        assert server.requests == ['/v0/maxres.webp'] * 2
+
+    def test_failed_thumbnail_skipped(self, tmp_path):
+        """Test an unreachable thumbnail leaves the video without cover art instead of failing it"""
+        pipeline = ThumbnailPipeline(tmp_path / 'cache')
+        assert pipeline.result({'id': 'v0', 'thumbnail': 'http://127.0.0.1:9/v0.jpg'}) is None
+        assert pipeline.result({'id': 'v1'}) is None
+        pipeline.close()
+
+    def test_submit_ahead(self, server, tmp_path):
+        """Test extracted entries are submitted ahead of the consumer and flat ones are not"""
+        pipeline = ThumbnailPipeline(tmp_path / 'cache')
+        entries = [video(server, 'v0'), {'_type': 'url', 'id': 'v1', 'url': 'https://youtu.be/v1'},
+                   video(server, 'v2')]
+        with patch.object(thumbnails, 'convert_image', slow_convert):
+            passed = pipeline.submit_ahead(iter(entries), ahead=2)
+            assert next(passed) is entries[0]
+            # v2 was submitted before the consumer reached it
+            cache = tmp_path / 'cache'
+            assert sorted(pipeline._futures) == [str(cache / f'youtube_{i}_1280.jpg') for i in ('v0', 'v2')]
+            assert list(passed) == entries[1:]
+        pipeline.close()
+
+    def test_ready_pp_places_copy_for_embedding(self, server, tmp_path):
+        """Test the prepared image is put next to the media and the cached one survives its deletion"""
+        pipeline = ThumbnailPipeline(tmp_path / 'cache')
+        media = tmp_path / 'Talk.mp4'
+        media.write_bytes(b'media')
+        info = {**video(server, 'v0'), 'filepath': str(media)}
+        with patch.object(thumbnails, 'convert_image', slow_convert):
+            _, info = thumbnails._ThumbnailReadyPP(pipeline).run(info)
+        pipeline.close()
+
+        cover = tmp_path / 'Talk.jpg'
+        assert info['thumbnails'][-1]['filepath'] == str(cover)
+        assert cover.read_bytes() == b'/v0/maxres.webp'
+        cover.unlink()  # As the embed step does
+        assert (tmp_path / 'cache' / 'youtube_v0_1280.jpg').exists()
+
+    def test_ffmpeg_fallback_reads_from_pipe(self, tmp_path):
+        """Test without Pillow the image is piped to ffmpeg, scaled down to fit max_size"""
+        def fake_run(cmd, input, capture_output):
+            Path(cmd[-1]).write_bytes(b'jpeg')
+            return type('Result', (), {'returncode': 0, 'stderr': b''})()
+
+        with patch.object(thumbnails, 'Image', None), \
+                patch.object(thumbnails, 'get_ffmpeg_command', return_value='ffmpeg'), \
+                patch.object(thumbnails.subprocess, 'run', side_effect=fake_run) as run:
+            convert_image(b'webp', tmp_path / 'cover.jpg', max_size=640)
+
+        cmd = run.call_args.args[0]
+        assert cmd[cmd.index('-i') + 1] == 'pipe:0'
+        assert run.call_args.kwargs['input'] == b'webp'
+        assert "scale='min(640,iw)':'min(640,ih)':force_original_aspect_ratio=decrease" in cmd
+        assert (tmp_path / 'cover.jpg').read_bytes() == b'jpeg'
+        assert not (tmp_path / 'cover.jpg.part').exists()
@@ -0,0 +1,128 @@
+"""Tests for timestamp arithmetic and subtitle conversion"""
+
+from unittest.mock import patch
+
+import pytest
+from ytd import convert_subtitles
+from ytd.timestamps import parse_timestamp, format_timestamp, parse_timing_line, SubtitleTrack
+from ytd.convert_subtitles import vtt_to_srt, parse_subtitles, convert_file, iter_file_cues
+
+
+SAMPLE_VTT = """WEBVTT
+Kind: captions
+Language: en
+
+intro
+00:01.500 --> 00:03.000 align:start position:10.5%
+Hello <c>world</c>
+
+00:00:02.000 --> 00:00:04.250
+Second line
+"""
+
+
+class TestTimestamps:
+    """Test timestamp parsing and formatting"""
+
+    def test_parse_timestamp(self):
+        """Test full, short and SRT timestamp forms"""
+        assert parse_timestamp('00:00:01.500') == 1500
+        assert parse_timestamp('01:02:03,004') == 3723004
+        assert parse_timestamp('02:03.5') == 123500
+        assert parse_timestamp('100:00:00.000') == 360000000
+
+        with pytest.raises(ValueError):
+            parse_timestamp('00:61.000')
+        with pytest.raises(ValueError):
+            parse_timestamp('not a time')
+
+    def test_format_timestamp(self):
+        """Test formatting back to SRT and VTT strings"""
+        assert format_timestamp(3723004) == '01:02:03,004'
+        assert format_timestamp(1500, '.') == '00:00:01.500'
+        assert format_timestamp(-20) == '00:00:00,000'
+
+    def test_parse_timing_line_ignores_settings(self):
+        """Test that dots in cue settings don't affect timings"""
+        assert parse_timing_line('00:01.000 --> 00:02.000 position:12.5% line:0') == (1000, 2000)
+        assert parse_timing_line('no timing here') is None
+
+
+class TestSubtitleTrack:
+    """Test bulk track operations"""
+
+    def make_track(self):
+        return SubtitleTrack([(1000, 3000, 'a'), (2000, 4000, 'b'), (5000, 6000, 'c')])
+
+    def test_shift(self):
+        """Test shifting forwards and backwards past zero"""
+        track = self.make_track().shift(500)
+        assert list(track.starts) == [1500, 2500, 5500]
+
+        track = self.make_track().shift(-3500)
+        assert list(track) == [(0, 500, 'b'), (1500, 2500, 'c')]
+
+    def test_rescale(self):
+        """Test framerate rescaling"""
+        track = SubtitleTrack([(1000, 2000, 'a')]).rescale(25, 24)
+        assert list(track) == [(1042, 2083, 'a')]
+
+    def test_clamp_overlaps(self):
+        """Test overlapping cues are sorted and trimmed"""
+        track = SubtitleTrack([(2000, 4000, 'b'), (1000, 3000, 'a')]).clamp_overlaps(min_gap_ms=100)
+        assert list(track) == [(1000, 1900, 'a'), (2000, 4000, 'b')]
+
+    def test_cut(self):
+        """Test cutting to a range with rebasing"""
+        track = self.make_track().cut(2500, 5500)
+        assert list(track) == [(0, 500, 'a'), (0, 1500, 'b'), (2500, 3000, 'c')]
+
+
+class TestConversion:
+    """Test VTT to SRT conversion"""
+
+    def test_vtt_to_srt(self):
+        """Test short timestamps are normalised and settings dropped"""
+        srt = vtt_to_srt(SAMPLE_VTT)
+        assert srt == (
+            "1\n00:00:01,500 --> 00:00:03,000\nHello world\n\n"
+            "2\n00:00:02,000 --> 00:00:04,250\nSecond line\n"
+        )
+
+    def test_parse_srt(self):
+        """Test SRT input parses to the same cues"""
+        track = parse_subtitles(vtt_to_srt(SAMPLE_VTT))
+        assert list(track) == [(1500, 3000, 'Hello world'), (2000, 4250, 'Second line')]
+
+    def test_convert_file_streaming(self, tmp_path):
+        """Test file conversion through the memory-mapped reader"""
+        vtt = tmp_path / 'video.en.vtt'
+        vtt.write_bytes(SAMPLE_VTT.replace('\n', '\r\n').encode('utf-8'))
+
+        srt = convert_file(vtt)
+        assert srt == tmp_path / 'video.en.srt'
+        assert srt.read_text(encoding='utf-8') == vtt_to_srt(SAMPLE_VTT)
+
+    def test_convert_file_failure_keeps_output(self, tmp_path):
+        """Test a missing or failing source creates no SRT and leaves an earlier one intact"""
+        assert convert_file(tmp_path / 'missing.vtt') is None
+        assert list(tmp_path.iterdir()) == []
+
+        vtt = tmp_path / 'video.vtt'
+        vtt.write_text(SAMPLE_VTT, encoding='utf-8')
+        srt = convert_file(vtt)
+
+        def failing_cues(path):
+            yield 0, 1000, 'Partial'
+            raise OSError('read error')
+
+        with patch.object(convert_subtitles, 'iter_file_cues', failing_cues):
+            assert convert_file(vtt) is None
+        assert srt.read_text(encoding='utf-8') == vtt_to_srt(SAMPLE_VTT)
+        assert sorted(path.name for path in tmp_path.iterdir()) == ['video.srt', 'video.vtt']
+
+    def test_iter_file_cues_empty(self, tmp_path):
+        """Test empty files yield no cues"""
+        empty = tmp_path / 'empty.vtt'
+        empty.write_bytes(b'')
+        assert list(iter_file_cues(empty)) == []
@@ -0,0 +1,55 @@
+"""Tests for utility functions"""
+
+import pytest
+from ytd.utils import PlaylistItems, parse_playlist_items, parse_size
+
+
+class TestPlaylistItems:
+    """Test the playlist item interval set"""
+
+    def test_parse_and_merge(self):
+        """Test ranges are merged and kept sorted without being expanded"""
+        items = parse_playlist_items('10-13,1-3,7,4')
+        assert items.ranges() == [(1, 4), (7, 7), (10, 13)]
+        assert str(items) == '1:4,7,10:13'
+        assert list(items) == [1, 2, 3, 4, 7, 10, 11, 12, 13]
+        assert items.last == 13
+
+        huge = PlaylistItems.parse('1-100000')
+        assert len(huge) == 100000
+        assert huge.ranges() == [(1, 100000)]
+
+    def test_membership(self):
+        """Test membership at range edges"""
+        items = PlaylistItems.parse('1-3,7,50-')
+        assert 1 in items and 3 in items and 7 in items
+        assert 4 not in items and 49 not in items
+        assert 10 ** 9 in items
+        assert items.last is None
+
+    def test_negative_and_open(self):
+        """Test indexes from the end are resolved once the length is known"""
+        items = PlaylistItems.parse('1,-3:')
+        assert str(items) == '1,-3:'
+        assert items.last is None
+        assert list(items.resolve(10)) == [1, 8, 9, 10]
+        assert list(PlaylistItems.parse('3:-2').resolve(6)) == [3, 4, 5]
+        assert list(PlaylistItems.parse('5-').resolve(7)) == [5, 6, 7]
+        with pytest.raises(ValueError):
+            list(items)
+
+    @pytest.mark.parametrize('spec', ['', '1,,2', 'a-b', '0', '5-3', '1-2-3'])
+    def test_invalid(self, spec):
+        """Test malformed specifications are rejected"""
+        with pytest.raises(ValueError):
+            PlaylistItems.parse(spec)
+
+
+class TestParseSize:
+    """Test size parsing"""
+
+    def test_units(self):
+        """Test plain bytes and binary unit suffixes"""
+        assert parse_size('500') == 500
+        assert parse_size('1.5K') == 1536
+        assert parse_size('2G') == 2 * 1024 ** 3
@@ -0,0 +1,67 @@
+"""Codec-aware audio format selection for audio-only downloads"""
+
+from typing import Optional
+
+# --audio-format -> yt-dlp format filter for sources that only need a remux
+COPYABLE_SOURCES = {
+    'm4a': '[acodec^=mp4a]',
+    'aac': '[acodec^=mp4a]',
+    'opus': '[acodec=opus]',
+    'vorbis': '[acodec=vorbis]',
+    'mp3': '[acodec=mp3]',
+    'flac': '[acodec=flac]',
+}
+
+# Prefixes of yt-dlp acodec strings -> ffprobe codec names
+ACODEC_NAMES = {
+    'mp4a': 'aac',
+    'aac': 'aac',
+    'opus': 'opus',
+    'vorbis': 'vorbis',
+    'mp3': 'mp3',
+    'flac': 'flac',
+    'alac': 'alac',
+}
+
+# --audio-format -> extension of the extracted file, where they differ
+AUDIO_EXTENSIONS = {
+    'vorbis': 'ogg',
+    'aac': 'm4a',
+    'alac': 'm4a',
+}
+
+
+def audio_format_selector(audio_format: str) -> str:
+    """
+    yt-dlp format spec preferring audio that is already in audio_format.
+
+    Falls back to the best audio (and then the best format) when no stream
+    with a matching codec is offered.
+    """
+    codec_filter = COPYABLE_SOURCES.get(audio_format)
+    if not codec_filter:
+        return 'bestaudio/best'
+    return f'bestaudio{codec_filter}/bestaudio/best'
+
+
+def normalize_acodec(acodec: Optional[str]) -> Optional[str]:
+    """Map a yt-dlp acodec string (e.g. "mp4a.40.2") to the ffprobe codec name"""
+    if not acodec or acodec == 'none':
+        return None
+    prefix = acodec.split('.', 1)[0].lower()
+    return ACODEC_NAMES.get(prefix, prefix)
+
+
+def extraction_path(acodec: Optional[str], audio_format: str) -> str:
+    """
+    Whether extracting acodec to audio_format is a 'copy' or 'transcode'.
+
+    Mirrors yt-dlp's FFmpegExtractAudio, which stream-copies when the file's
+    codec already matches the requested one (AAC counts as m4a).
+    """
+    codec = normalize_acodec(acodec)
+    if codec is None:
+        return 'transcode'
+    if codec == 'aac' and audio_format in ('m4a', 'aac'):
+        return 'copy'
+    return 'copy' if codec == audio_format else 'transcode'
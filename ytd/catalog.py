@@ -0,0 +1,224 @@
+"""SQLite catalog of downloaded media, written as downloads finish"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from yt_dlp.postprocessor.common import PostProcessor
+
+from .store import HASH_ALGORITHM, SHA256_KEY
+
+DEFAULT_CATALOG_NAME = '.ytd-catalog.sqlite'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS media (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    video_id TEXT NOT NULL,
+    extractor TEXT,
+    title TEXT,
+    channel TEXT,
+    upload_date TEXT,
+    format_id TEXT,
+    ext TEXT,
+    size INTEGER,
+    download_bytes INTEGER,
+    duration REAL,
+    subtitle_langs TEXT,
+    sha256 TEXT,
+    url TEXT,
+    downloaded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS media_video_id ON media(video_id);
+CREATE INDEX IF NOT EXISTS media_channel ON media(channel, upload_date);
+CREATE INDEX IF NOT EXISTS media_upload_date ON media(upload_date);
+"""
+
+COLUMNS = ('path', 'video_id', 'extractor', 'title', 'channel', 'upload_date', 'format_id', 'ext',
+           'size', 'download_bytes', 'duration', 'subtitle_langs', 'sha256', 'url', 'downloaded_at')
+
+
+def file_checksum(path: Path) -> str:
+    """Hex digest of a file's contents"""
+    digest = hashlib.new(HASH_ALGORITHM)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def catalog_entry(info: Dict, download_bytes: Optional[int] = None, checksum: bool = False) -> Dict[str, Any]:
+    """
+    Catalog row for a finished, postprocessed download.
+
+    The checksum is the one the media store computed while storing the
+    file; only with checksum=True is an unstored file read again to hash it.
+    """
+    path = os.path.abspath(info['filepath'])
+    subtitles = sorted(lang for lang, sub in (info.get('requested_subtitles') or {}).items()
+                       if sub.get('filepath') and os.path.exists(sub['filepath']))
+    sha256 = info.get(SHA256_KEY)
+    if sha256 is None and checksum:
+        sha256 = file_checksum(path)
+    return {
+        'path': path,
+        'video_id': info.get('id'),
+        'extractor': info.get('extractor_key') or info.get('extractor'),
+        'title': info.get('title'),
+        'channel': info.get('channel') or info.get('uploader'),
+        'upload_date': info.get('upload_date'),
+        'format_id': info.get('format_id'),
+        'ext': os.path.splitext(path)[1].lstrip('.') or info.get('ext'),
+        'size': os.path.getsize(path),
+        'download_bytes': download_bytes,
+        'duration': info.get('duration'),
+        'subtitle_langs': ','.join(subtitles) or None,
+        'sha256': sha256,
+        'url': info.get('webpage_url') or info.get('original_url'),
+        'downloaded_at': time.time(),
+    }
+
+
+class Catalog:
+    """
+    What has been downloaded, where it is and what it contains.
+
+    One row per output file, replaced when the same path is downloaded
+    again. Lookups by video id, channel and upload date use indexes, so
+    answering "what do we have" never rescans or re-probes the library.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        # Pipelined playlists record entries from postprocessing threads
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection"""
+        self.conn.close()
+
+    def __enter__(self) -> 'Catalog':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        """Insert or replace the row for entry['path']"""
+        placeholders = ', '.join('?' for _ in COLUMNS)
+        updates = ', '.join(f'{column} = excluded.{column}' for column in COLUMNS if column != 'path')
+        with self.lock, self.conn:
+            self.conn.execute(
+                f"INSERT INTO media ({', '.join(COLUMNS)}) VALUES ({placeholders}) "
+                f"ON CONFLICT(path) DO UPDATE SET {updates}",
+                [entry.get(column) for column in COLUMNS])
+
+    def remove_missing(self) -> int:
+        """Drop rows whose files no longer exist, returning how many"""
+        with self.lock:
+            rows = self.conn.execute("SELECT id, path FROM media").fetchall()
+            missing = [(row['id'],) for row in rows if not os.path.exists(row['path'])]
+            with self.conn:
+                self.conn.executemany("DELETE FROM media WHERE id = ?", missing)
+        return len(missing)
+
+    def query(self, video_id: Optional[str] = None, channel: Optional[str] = None,
+              since: Optional[str] = None, until: Optional[str] = None,
+              title: Optional[str] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Catalog rows matching all given filters, newest uploads first.
+
+        since/until are inclusive YYYYMMDD upload dates; title matches a
+        case-insensitive substring.
+        """
+        clauses, params = [], []
+        if video_id:
+            clauses.append("video_id = ?")
+            params.append(video_id)
+        if channel:
+            clauses.append("channel = ?")
+            params.append(channel)
+        if since:
+            clauses.append("upload_date >= ?")
+            params.append(since)
+        if until:
+            clauses.append("upload_date <= ?")
+            params.append(until)
+        if title:
+            clauses.append("title LIKE ?")
+            params.append(f'%{title}%')
+
+        sql = "SELECT * FROM media"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY upload_date DESC, downloaded_at DESC"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self.lock:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+
+    def summary(self) -> Dict[str, Any]:
+        """Row count, total size and total duration"""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT COUNT(*) AS files, COALESCE(SUM(size), 0) AS size, "
+                "COALESCE(SUM(duration), 0) AS duration FROM media").fetchone()
+        return dict(row)
+
+
+class CatalogRecorder:
+    """Records each download of a YoutubeDL in a Catalog once it is in place"""
+
+    def __init__(self, catalog: Catalog, checksum: bool = False):
+        self.catalog = catalog
+        self.checksum = checksum
+        self._downloaded: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def attach(self, ydl) -> None:
+        ydl.add_progress_hook(self.progress_hook)
+        ydl.add_post_processor(_CatalogPP(self, ydl), when='after_move')
+
+    def progress_hook(self, d: Dict) -> None:
+        """Remember how many bytes were fetched (merged downloads finish once per format)"""
+        if d['status'] != 'finished':
+            return
+        info = d.get('info_dict') or {}
+        key = info.get('id') or info.get('url')
+        nbytes = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+        with self.lock:
+            self._downloaded[key] = self._downloaded.get(key, 0) + nbytes
+
+    def record(self, info: Dict) -> None:
+        key = info.get('id') or info.get('url')
+        with self.lock:
+            download_bytes = self._downloaded.pop(key, None)
+        self.catalog.add(catalog_entry(info, download_bytes, self.checksum))
+
+
+class _CatalogPP(PostProcessor):
+    def __init__(self, recorder: CatalogRecorder, downloader=None):
+        super().__init__(downloader)
+        self.recorder = recorder
+
+    @classmethod
+    def pp_key(cls):
+        return 'Catalog'
+
+    def run(self, info):
+        path = info.get('filepath')
+        if not path or not os.path.isfile(path) or not info.get('id'):
+            return [], info
+        try:
+            self.recorder.record(info)
+        except (OSError, sqlite3.Error) as e:
+            self.report_warning(f'Could not add "{path}" to the catalog: {e}')
+        return [], info
@@ -9,7 +9,12 @@ import validators
 from colorama import init, Fore, Style
 
 from .downloader import YouTubeDownloader
-from .utils import setup_logger, load_config, merge_options
+from .utils import setup_logger, load_config, merge_options, PlaylistItems
+from .subtitle_index import SubtitleIndex, DEFAULT_INDEX_NAME, build_index
+from .catalog import Catalog, DEFAULT_CATALOG_NAME
+from .subtitle_harvest import DEFAULT_HARVEST_INTERVAL, DEFAULT_HARVEST_JOBS, SubtitleHarvester
+from .subtitle_fetch import DEFAULT_SUBTITLE_BURST
+from .timestamps import format_timestamp
 from . import __version__
 
 init(autoreset=True)  # Initialize colorama
@@ -27,12 +32,22 @@ if sys.platform.startswith('win'):
         pass
 
 
+def playlist_items_arg(spec: str) -> PlaylistItems:
+    """argparse type for --playlist-items"""
+    try:
+        return PlaylistItems.parse(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
 def create_parser() -> argparse.ArgumentParser:
     """Create and configure argument parser"""
     parser = argparse.ArgumentParser(
         prog='ytd',
         description='Download YouTube videos and playlists with ease',
-        epilog='Example: ytd https://youtube.com/watch?v=VIDEO_ID -f best -o ~/Videos'
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='Example: ytd https://youtube.com/watch?v=VIDEO_ID -f best -o ~/Videos\n'
+               'Library commands: ytd index [DIR], ytd search QUERY'
     )
     
     # Positional argument
@@ -76,6 +91,53 @@ def create_parser() -> argparse.ArgumentParser:
         choices=['mp3', 'm4a', 'opus', 'vorbis', 'flac', 'wav'],
         help='Audio format for audio-only downloads (default: mp3)'
     )
+    format_group.add_argument(
+        '--max-filesize',
+        type=str,
+        metavar='SIZE',
+        help='Pick the best format no larger than SIZE (e.g. 500M, 2G)'
+    )
+    format_group.add_argument(
+        '--max-bitrate',
+        type=float,
+        metavar='KBPS',
+        help='Pick the best format with a total bitrate of at most KBPS kbit/s'
+    )
+    format_group.add_argument(
+        '--max-height',
+        type=int,
+        metavar='N',
+        help='Pick the best format no taller than N pixels (e.g. 720)'
+    )
+    format_group.add_argument(
+        '--max-download-time',
+        type=float,
+        metavar='SECONDS',
+        help='Pick the best format that downloads within SECONDS at the link speed'
+    )
+    format_group.add_argument(
+        '--link-speed',
+        type=str,
+        metavar='RATE',
+        help='Link speed for --max-download-time (e.g. 5M); measured from earlier downloads if omitted'
+    )
+    format_group.add_argument(
+        '--prefer-codecs',
+        type=str,
+        metavar='LIST',
+        help='Preferred codecs, best first (e.g. "av1,vp9,opus")'
+    )
+    format_group.add_argument(
+        '--container',
+        type=str,
+        choices=['mp4', 'webm', 'mkv'],
+        help='Preferred container; formats that fit it without remuxing are favoured'
+    )
+    format_group.add_argument(
+        '--plan-formats',
+        action='store_true',
+        help='Show which format the planner would pick and why, without downloading'
+    )
     format_group.add_argument(
         '--list-formats',
         action='store_true',
@@ -96,8 +158,26 @@ def create_parser() -> argparse.ArgumentParser:
     )
     download_group.add_argument(
         '--playlist-items',
-        type=str,
-        help='Playlist items to download (e.g., "1-3,7,10-13")'
+        type=playlist_items_arg,
+        help='Playlist items to download (e.g., "1-3,7,10-13", "50-" for 50 onwards, "-10:" for the last 10)'
+    )
+    download_group.add_argument(
+        '--prefetch',
+        type=int,
+        metavar='N',
+        help='Extract playlist entries on N threads ahead of the downloads '
+             '(and for --plan-formats with -p; default there: 4)'
+    )
+    download_group.add_argument(
+        '--prefetch-interval',
+        type=float,
+        metavar='SECONDS',
+        help='Minimum time between extraction requests to one host while prefetching (default: 0.25)'
+    )
+    download_group.add_argument(
+        '--no-stream-playlist',
+        action='store_true',
+        help='Enumerate the whole playlist before downloading the first entry'
     )
     download_group.add_argument(
         '-s', '--subtitles',
@@ -110,6 +190,19 @@ def create_parser() -> argparse.ArgumentParser:
         default='en',
         help='Subtitle languages (comma-separated, default: en). Use "all" for all available subtitles'
     )
+    download_group.add_argument(
+        '--sub-interval',
+        type=float,
+        metavar='SECONDS',
+        help='When downloading media and subtitles together, space subtitle requests to one host '
+             'this far apart once the burst is spent (default: 2)'
+    )
+    download_group.add_argument(
+        '--sub-burst',
+        type=int,
+        metavar='N',
+        help='Subtitle requests to one host allowed back to back before spacing starts (default: 3)'
+    )
     download_group.add_argument(
         '--write-auto-subs',
         action='store_true',
@@ -137,6 +230,19 @@ def create_parser() -> argparse.ArgumentParser:
         action='store_true',
         help='Embed thumbnail in the file'
     )
+    download_group.add_argument(
+        '--thumbnail-size',
+        type=int,
+        metavar='PIXELS',
+        help='Shrink embedded thumbnails to at most this many pixels on the longest side '
+             '(default: 1280, 0 to keep the original size)'
+    )
+    download_group.add_argument(
+        '--thumbnail-jobs',
+        type=int,
+        metavar='N',
+        help='Thumbnails fetched and resized concurrently while the media downloads (default: 4)'
+    )
     download_group.add_argument(
         '-r', '--limit-rate',
         type=str,
@@ -148,6 +254,75 @@ def create_parser() -> argparse.ArgumentParser:
         default=3,
         help='Number of concurrent fragment downloads (default: 3)'
     )
+    download_group.add_argument(
+        '--video-retries',
+        type=int,
+        metavar='N',
+        help='Retry a failed video up to N times when the error is worth retrying '
+             '(rate limiting, 403, network, extractor; default: 3, 0 to disable)'
+    )
+    download_group.add_argument(
+        '--retry-backoff',
+        type=float,
+        metavar='SECONDS',
+        help='Wait before the first retry, doubled (with jitter) for each further one (default: 10)'
+    )
+    download_group.add_argument(
+        '--min-free-space',
+        type=str,
+        metavar='SIZE',
+        help='Free space to leave on the output volume; downloads wait or fail rather than use it (default: 256M)'
+    )
+    download_group.add_argument(
+        '--no-space-check',
+        action='store_true',
+        help='Start downloads without reserving disk space for them first'
+    )
+    download_group.add_argument(
+        '--store',
+        type=str,
+        metavar='DIR',
+        help='Keep each download once in a content-addressed store under DIR; '
+             'output files become links to it and repeats are not downloaded again'
+    )
+    download_group.add_argument(
+        '--store-links',
+        choices=['hardlink', 'symlink'],
+        default='hardlink',
+        help='How output files point into the store (default: hardlink, '
+             'symlink when the store is on another filesystem)'
+    )
+    download_group.add_argument(
+        '--catalog',
+        type=str,
+        metavar='FILE',
+        help=f'Catalog database recording every download (default: OUTPUT/{DEFAULT_CATALOG_NAME})'
+    )
+    download_group.add_argument(
+        '--no-catalog',
+        action='store_true',
+        help='Do not record downloads in the catalog'
+    )
+    download_group.add_argument(
+        '--catalog-checksums',
+        action='store_true',
+        help='Hash every download for the catalog (re-reads each file; '
+             'downloads kept in --store are hashed anyway)'
+    )
+    download_group.add_argument(
+        '--postprocess-workers',
+        type=int,
+        default=0,
+        metavar='N',
+        help='Postprocess playlist entries on N worker threads while the next entries download (default: 0, inline)'
+    )
+    download_group.add_argument(
+        '--postprocess-queue',
+        type=int,
+        default=4,
+        metavar='N',
+        help='Pause downloading while N entries are waiting for postprocessing (default: 4)'
+    )
     
     # Other options
     other_group = parser.add_argument_group('Other Options')
@@ -200,6 +375,176 @@ def create_parser() -> argparse.ArgumentParser:
     return parser
 
 
+def create_library_parser() -> argparse.ArgumentParser:
+    """Create argument parser for library commands (index, search, ls)"""
+    parser = argparse.ArgumentParser(
+        prog='ytd',
+        description='Manage the local download library'
+    )
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    index_parser = subparsers.add_parser(
+        'index',
+        help='Build or update the subtitle search index for a directory'
+    )
+    index_parser.add_argument(
+        'directory',
+        nargs='?',
+        default='.',
+        help='Directory containing downloaded subtitles (default: current directory)'
+    )
+    index_parser.add_argument(
+        '--db',
+        type=str,
+        help=f'Index database path (default: DIRECTORY/{DEFAULT_INDEX_NAME})'
+    )
+
+    search_parser = subparsers.add_parser(
+        'search',
+        help='Search subtitle text in the index'
+    )
+    search_parser.add_argument(
+        'query',
+        help='Words or "exact phrase" to search for'
+    )
+    search_parser.add_argument(
+        '-d', '--directory',
+        type=str,
+        default='.',
+        help='Indexed directory (default: current directory)'
+    )
+    search_parser.add_argument(
+        '--db',
+        type=str,
+        help=f'Index database path (default: DIRECTORY/{DEFAULT_INDEX_NAME})'
+    )
+    search_parser.add_argument(
+        '-n', '--limit',
+        type=int,
+        default=20,
+        help='Maximum number of hits to show (default: 20)'
+    )
+
+    ls_parser = subparsers.add_parser(
+        'ls',
+        help='List downloaded media recorded in the catalog'
+    )
+    ls_parser.add_argument(
+        'directory',
+        nargs='?',
+        default='.',
+        help='Download directory (default: current directory)'
+    )
+    ls_parser.add_argument(
+        '--db',
+        type=str,
+        help=f'Catalog database path (default: DIRECTORY/{DEFAULT_CATALOG_NAME})'
+    )
+    ls_parser.add_argument(
+        '--id',
+        type=str,
+        dest='video_id',
+        help='Only this video id'
+    )
+    ls_parser.add_argument(
+        '--channel',
+        type=str,
+        help='Only videos from this channel'
+    )
+    ls_parser.add_argument(
+        '--since',
+        type=str,
+        metavar='YYYYMMDD',
+        help='Only videos uploaded on or after this date'
+    )
+    ls_parser.add_argument(
+        '--until',
+        type=str,
+        metavar='YYYYMMDD',
+        help='Only videos uploaded on or before this date'
+    )
+    ls_parser.add_argument(
+        '--title',
+        type=str,
+        help='Only titles containing this text'
+    )
+    ls_parser.add_argument(
+        '-n', '--limit',
+        type=int,
+        help='Maximum number of entries to show'
+    )
+    ls_parser.add_argument(
+        '--prune',
+        action='store_true',
+        help='Forget entries whose files no longer exist'
+    )
+
+    harvest_parser = subparsers.add_parser(
+        'harvest',
+        help='Fetch subtitles for many videos without downloading any media'
+    )
+    harvest_parser.add_argument(
+        'inputs',
+        nargs='*',
+        metavar='URL_OR_ID',
+        help='Video URLs, YouTube video ids or playlist URLs'
+    )
+    harvest_parser.add_argument(
+        '-a', '--batch-file',
+        type=str,
+        help='File with one URL or id per line ("#" starts a comment)'
+    )
+    harvest_parser.add_argument(
+        '-o', '--output',
+        type=str,
+        default='.',
+        help='Output directory (default: current directory)'
+    )
+    harvest_parser.add_argument(
+        '--sub-langs',
+        type=str,
+        default='en',
+        help='Subtitle languages (comma-separated, default: en). Use "all" for all available subtitles'
+    )
+    harvest_parser.add_argument(
+        '--convert-subs',
+        type=str,
+        choices=['srt', 'vtt', 'keep'],
+        default='keep',
+        help='Write subtitles in this format (default: keep original)'
+    )
+    harvest_parser.add_argument(
+        '-j', '--jobs',
+        type=int,
+        default=DEFAULT_HARVEST_JOBS,
+        help=f'Videos extracted and fetched at once (default: {DEFAULT_HARVEST_JOBS})'
+    )
+    harvest_parser.add_argument(
+        '--sub-interval',
+        type=float,
+        default=DEFAULT_HARVEST_INTERVAL,
+        metavar='SECONDS',
+        help=f'Seconds between caption requests to one host once the burst is spent '
+             f'(default: {DEFAULT_HARVEST_INTERVAL})'
+    )
+    harvest_parser.add_argument(
+        '--sub-burst',
+        type=int,
+        metavar='N',
+        help='Caption requests to one host allowed back to back (default: 3)'
+    )
+    harvest_parser.add_argument(
+        '--archive',
+        type=str,
+        help='Record harvested videos in this file and skip those already in it'
+    )
+
+    return parser
+
+
+LIBRARY_COMMANDS = ('index', 'search', 'ls', 'harvest')
+
+
 def validate_url(url: str) -> bool:
     """Validate URL - now supports all sites that yt-dlp supports"""
     # Just check if it's a valid URL format
@@ -234,8 +579,113 @@ def print_info(message: str) -> None:
     safe_print(f"{Fore.BLUE}ℹ {message}{Style.RESET_ALL}")
 
 
+def library_main(argv: list) -> int:
+    """Entry point for library commands (index, search, ls, harvest)"""
+    args = create_library_parser().parse_args(argv)
+
+    try:
+        if args.command == 'index':
+            directory = Path(args.directory).expanduser()
+            if not directory.is_dir():
+                print_error(f"Directory not found: {args.directory}")
+                return 1
+
+            db_path = Path(args.db).expanduser() if args.db else None
+            print_info(f"Indexing subtitles in: {directory}")
+            stats, elapsed = build_index(directory, db_path)
+            print_success(
+                f"Index updated in {elapsed:.1f}s: {stats['added']} added, "
+                f"{stats['updated']} updated, {stats['removed']} removed, "
+                f"{stats['unchanged']} unchanged"
+            )
+            return 0
+
+        if args.command == 'search':
+            directory = Path(args.directory).expanduser()
+            db_path = Path(args.db).expanduser() if args.db else directory / DEFAULT_INDEX_NAME
+            if not db_path.exists():
+                print_error(f"Index not found: {db_path}")
+                print_info(f"Build it first with: ytd index {args.directory}")
+                return 1
+
+            with SubtitleIndex(db_path) as index:
+                hits = index.search(args.query, limit=args.limit)
+
+            if not hits:
+                print("No matches found")
+                return 0
+
+            for hit in hits:
+                lang = f" ({hit['lang']})" if hit['lang'] else ''
+                text = hit['text'].replace('\n', ' ')
+                safe_print(f"[{format_timestamp(hit['start_ms'])}] {hit['video_id']}{lang}: {text}")
+                safe_print(f"    {hit['path']}")
+            print(f"\nTotal: {len(hits)} matches")
+            return 0
+
+        if args.command == 'ls':
+            directory = Path(args.directory).expanduser()
+            db_path = Path(args.db).expanduser() if args.db else directory / DEFAULT_CATALOG_NAME
+            if not db_path.exists():
+                print_error(f"Catalog not found: {db_path}")
+                return 1
+
+            with Catalog(db_path) as catalog:
+                if args.prune:
+                    print_info(f"Removed {catalog.remove_missing()} missing file(s) from the catalog")
+                entries = catalog.query(video_id=args.video_id, channel=args.channel, since=args.since,
+                                        until=args.until, title=args.title, limit=args.limit)
+                summary = catalog.summary()
+
+            for entry in entries:
+                date = entry['upload_date'] or '-' * 8
+                size = f"{(entry['size'] or 0) / 1024 / 1024:.1f}MB"
+                subs = f" [{entry['subtitle_langs']}]" if entry['subtitle_langs'] else ''
+                safe_print(f"{date}  {entry['video_id']:<12} {size:>9}  {entry['title'] or ''}{subs}")
+                safe_print(f"    {entry['path']}")
+            print(f"\nShown: {len(entries)} of {summary['files']} files, "
+                  f"{summary['size'] / 1024 / 1024 / 1024:.2f}GB, {summary['duration'] / 3600:.1f}h in the catalog")
+            return 0
+
+        if args.command == 'harvest':
+            inputs = list(args.inputs)
+            if args.batch_file:
+                with open(Path(args.batch_file).expanduser(), encoding='utf-8') as f:
+                    inputs += [line.strip() for line in f if line.strip() and not line.lstrip().startswith('#')]
+            if not inputs:
+                print_error("Nothing to harvest: give URLs, ids or --batch-file")
+                return 1
+
+            harvester = SubtitleHarvester(
+                Path(args.output).expanduser(),
+                langs=args.sub_langs.split(','),
+                convert=args.convert_subs,
+                jobs=args.jobs,
+                interval=args.sub_interval,
+                burst=args.sub_burst or DEFAULT_SUBTITLE_BURST,
+                archive=Path(args.archive).expanduser() if args.archive else None,
+                logger=setup_logger(),
+            )
+            print_info(f"Harvesting subtitles for {len(inputs)} input(s)")
+            stats = harvester.harvest(inputs)
+            print_success(
+                f"{stats['tracks']} subtitle file(s) for {stats['videos']} video(s); "
+                f"{stats['skipped']} skipped (archive), {stats['without_subtitles']} without "
+                f"the requested subtitles, {stats['failed']} failed"
+            )
+            return 0 if not stats['failed'] else 1
+    except RuntimeError as e:
+        print_error(str(e))
+        return 1
+
+    return 1
+
+
 def main() -> int:
     """Main entry point"""
+    if len(sys.argv) > 1 and sys.argv[1] in LIBRARY_COMMANDS:
+        return library_main(sys.argv[1:])
+
     parser = create_parser()
     args = parser.parse_args()
     
@@ -315,6 +765,15 @@ def main() -> int:
                     print(f"  {fmt}")
             return 0
         
+        # Handle format planning dry run
+        if args.plan_formats:
+            print_info(f"Planning format for: {args.url}")
+            explanation = downloader.explain_formats(args.url)
+            if explanation is None:
+                return 1
+            print(explanation)
+            return 0
+        
         # Handle list subtitles request
         if args.list_subs:
             print_info(f"Fetching available subtitles for: {args.url}")
@@ -333,14 +792,6 @@ def main() -> int:
                 print("No subtitles available for this video")
             return 0
         
-        # Check if trying to download video/audio with subtitles
-        if args.subtitles and not args.skip_download:
-            print_error("Downloading video and subtitles together is not supported due to rate limiting.")
-            print_info("Please download them separately:")
-            print_info("  1. Download video: ytd URL")
-            print_info("  2. Download subtitles: ytd URL -s --sub-langs LANG --skip-download")
-            return 1
-        
         # Perform download
         print_info(f"Starting download: {args.url}")
         
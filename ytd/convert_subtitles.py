@@ -1,67 +1,117 @@
 #!/usr/bin/env python3
 """Convert subtitle formats (VTT to SRT)"""
 
+import itertools
+import mmap
+import os
 import re
 import sys
 from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+
+try:
+    from .timestamps import SubtitleTrack, format_timestamp, parse_timing_line
+except ImportError:
+    from timestamps import SubtitleTrack, format_timestamp, parse_timing_line
+
+
+MAPPED_WINDOW = 8 * 1024 * 1024  # Bytes of a mapped file kept resident while streaming
+TAG_RE = re.compile(r'<[^>]+>')  # HTML-like tags and inline timestamps
+
+
+def clean_cue_text(text: str) -> str:
+    """Strip VTT markup (<c>, <i>, inline <00:00:01.000> timestamps) from cue text"""
+    return TAG_RE.sub('', text).strip()
+
+
+def iter_cues(lines: Iterable[str]) -> Iterator[Tuple[int, int, str]]:
+    """
+    Parse VTT or SRT lines into (start_ms, end_ms, text) cues.
+
+    Header blocks, cue identifiers and cue settings are skipped, and cues
+    whose text is empty after cleaning are dropped.
+    """
+    timing = None
+    text_lines = []
+
+    for line in lines:
+        line = line.strip()
+        parsed = parse_timing_line(line) if '-->' in line else None
+
+        if parsed or not line:
+            if timing and text_lines:
+                yield timing[0], timing[1], '\n'.join(text_lines)
+            timing = parsed
+            text_lines = []
+        elif timing:
+            text = clean_cue_text(line)
+            if text:
+                text_lines.append(text)
+
+    if timing and text_lines:
+        yield timing[0], timing[1], '\n'.join(text_lines)
+
+
+def parse_subtitles(content: str) -> SubtitleTrack:
+    """Parse VTT or SRT content into a SubtitleTrack"""
+    return SubtitleTrack(iter_cues(content.splitlines()))
+
+
+def iter_file_cues(path: Path) -> Iterator[Tuple[int, int, str]]:
+    """
+    Stream cues from a VTT/SRT file without loading it into memory.
+
+    The file is memory-mapped and walked line by line, so only the
+    current line is ever decoded and peak memory stays flat no matter
+    how large the caption file is.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            yield from iter_cues(_iter_mapped_lines(mm))
+
+
+def _iter_mapped_lines(mm: mmap.mmap) -> Iterator[str]:
+    """Decode lines from a mapping, releasing pages that were already consumed"""
+    can_release = hasattr(mm, 'madvise') and hasattr(mmap, 'MADV_DONTNEED')
+    released = 0
+
+    for line in iter(mm.readline, b''):
+        yield line.decode('utf-8', errors='replace')
+
+        # Mapped pages count towards RSS once touched; drop them in
+        # MAPPED_WINDOW steps so memory doesn't grow with the file size
+        if can_release and mm.tell() - released >= MAPPED_WINDOW:
+            end = mm.tell() - mm.tell() % mmap.PAGESIZE
+            mm.madvise(mmap.MADV_DONTNEED, released, end - released)
+            released = end
+
+
+def format_srt_cue(index: int, start: int, end: int, text: str) -> str:
+    """Format a single SRT cue"""
+    return f"{index}\n{format_timestamp(start)} --> {format_timestamp(end)}\n{text}\n"
+
+
+def track_to_srt(track: SubtitleTrack) -> str:
+    """Render a SubtitleTrack as SRT"""
+    return '\n'.join(format_srt_cue(i, start, end, text)
+                     for i, (start, end, text) in enumerate(track, 1))
+
+
+def track_to_vtt(track: SubtitleTrack) -> str:
+    """Render a SubtitleTrack as WebVTT"""
+    cues = [f"{format_timestamp(start, '.')} --> {format_timestamp(end, '.')}\n{text}\n"
+            for start, end, text in track]
+    return 'WEBVTT\n\n' + '\n'.join(cues)
 
 
 def vtt_to_srt(vtt_content: str) -> str:
     """Convert VTT subtitle format to SRT format"""
-    # Remove WEBVTT header and metadata
-    lines = vtt_content.split('\n')
-    srt_lines = []
-    subtitle_index = 1
-    i = 0
-    
-    # Skip WEBVTT header and any metadata
-    while i < len(lines) and not re.match(r'^\d{2}:\d{2}:', lines[i]):
-        i += 1
-    
-    while i < len(lines):
-        line = lines[i].strip()
-        
-        # Skip empty lines
-        if not line:
-            i += 1
-            continue
-        
-        # Check if this is a timestamp line
-        if ' --> ' in line:
-            # Add subtitle index
-            srt_lines.append(str(subtitle_index))
-            
-            # Convert timestamp format
-            # VTT: 00:00:00.000 --> 00:00:02.000
-            # SRT: 00:00:00,000 --> 00:00:02,000
-            timestamp = line.replace('.', ',')
-            
-            # Remove position tags if present (align:start position:0%)
-            timestamp = re.sub(r'\s*align:.*$', '', timestamp)
-            timestamp = re.sub(r'\s*position:.*$', '', timestamp)
-            
-            srt_lines.append(timestamp)
-            
-            # Collect subtitle text
-            i += 1
-            text_lines = []
-            while i < len(lines) and lines[i].strip() and ' --> ' not in lines[i]:
-                # Remove VTT tags like <c>, </c>, timestamps within text
-                text = lines[i].strip()
-                text = re.sub(r'<[^>]+>', '', text)  # Remove HTML-like tags
-                text = re.sub(r'<\d{2}:\d{2}:\d{2}\.\d{3}>', '', text)  # Remove inline timestamps
-                if text:
-                    text_lines.append(text)
-                i += 1
-            
-            if text_lines:
-                srt_lines.append('\n'.join(text_lines))
-                srt_lines.append('')  # Empty line between subtitles
-                subtitle_index += 1
-        else:
-            i += 1
-    
-    return '\n'.join(srt_lines)
+    return track_to_srt(parse_subtitles(vtt_content))
 
 
 def convert_file(vtt_path: Path, srt_path: Path = None) -> Path:
@@ -69,21 +119,53 @@ def convert_file(vtt_path: Path, srt_path: Path = None) -> Path:
     if srt_path is None:
         srt_path = vtt_path.with_suffix('.srt')
     
+    tmp_path = srt_path.with_name(srt_path.name + '.part')
     try:
-        # Read VTT content
-        with open(vtt_path, 'r', encoding='utf-8') as f:
-            vtt_content = f.read()
-        
-        # Convert to SRT
-        srt_content = vtt_to_srt(vtt_content)
-        
-        # Write SRT file
-        with open(srt_path, 'w', encoding='utf-8') as f:
-            f.write(srt_content)
+        # Stream cues straight from the mapped VTT file into the SRT file;
+        # the source is opened before anything is written, and an existing
+        # SRT is only replaced once the conversion is complete
+        cues = enumerate(iter_file_cues(vtt_path), 1)
+        first = next(cues, None)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for index, (start, end, text) in itertools.chain([first] if first else [], cues):
+                if index > 1:
+                    f.write('\n')
+                f.write(format_srt_cue(index, start, end, text))
+        os.replace(tmp_path, srt_path)
         
         return srt_path
     except Exception as e:
         print(f"Error converting {vtt_path}: {e}")
+        tmp_path.unlink(missing_ok=True)
+        return None
+
+
+def resync_file(path: Path, output_path: Path = None, offset_ms: int = 0,
+                from_fps: float = None, to_fps: float = None) -> Optional[Path]:
+    """
+    Re-time a VTT/SRT file in place (or into output_path).
+
+    The framerate rescale is applied before the offset, then overlapping
+    cues are clamped so players don't show two lines at once.
+    """
+    output_path = output_path or path
+
+    try:
+        track = SubtitleTrack(iter_file_cues(path))
+
+        if from_fps and to_fps:
+            track.rescale(from_fps, to_fps)
+        if offset_ms:
+            track.shift(offset_ms)
+        track.clamp_overlaps()
+
+        content = track_to_srt(track) if output_path.suffix.lower() == '.srt' else track_to_vtt(track)
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+
+        return output_path
+    except Exception as e:
+        print(f"Error re-timing {path}: {e}")
         return None
 
 
@@ -0,0 +1,345 @@
+"""Disk space reservations so concurrent downloads never overcommit a volume"""
+
+import functools
+import json
+import logging
+import os
+import random
+import shutil
+import socket
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import IO, Dict, Optional, Tuple
+
+from yt_dlp.postprocessor.common import PostProcessor
+
+from .pipeline import QUEUED_KEY, PipelinedYoutubeDL
+from .store import FROM_STORE_KEY
+
+try:
+    import fcntl
+except ImportError:  # Windows: stale reservations expire by age instead
+    fcntl = None
+
+RESERVATIONS_DIR = '.ytd-reservations'
+DEFAULT_MIN_FREE = 256 * 1024 * 1024  # Headroom left for everything else on the volume
+DEFAULT_RESERVE_TIMEOUT = 3600.0  # Longest wait for other downloads to free space
+REWRITE_FACTOR = 2  # Merging/embedding writes a full copy before deleting the inputs
+
+
+class InsufficientSpaceError(Exception):
+    """Raised when a download can never fit, even with no other downloads running"""
+
+
+# Owner of this process's reservations. PIDs alone repeat across containers
+# sharing an output volume (each one's ytd is often PID 1)
+OWNER = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+_owner_locks: Dict[Path, IO] = {}
+_owner_locks_lock = threading.Lock()
+
+
+def _hold_owner_lock(store: Path) -> None:
+    """Lock OWNER's lock file in store for as long as this process lives"""
+    if fcntl is None:
+        return
+    path = store / f'{OWNER}.lock'
+    with _owner_locks_lock:
+        if path in _owner_locks:
+            return
+        while True:
+            f = open(path, 'a')
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            try:
+                if os.path.samestat(os.fstat(f.fileno()), os.stat(path)):
+                    break
+            except FileNotFoundError:
+                pass
+            f.close()  # Swept as dead before the lock was taken
+        _owner_locks[path] = f
+    # Lock files of processes that exited without a reservation left
+    for lock in store.glob('*.lock'):
+        _owner_alive(store, lock.stem)
+
+
+def _owner_alive(store: Path, owner: str) -> bool:
+    """Whether the process that wrote owner's reservations still holds its lock"""
+    if owner == OWNER or fcntl is None:
+        return True
+    path = store / f'{owner}.lock'
+    try:
+        fd = os.open(path, os.O_RDWR)
+    except FileNotFoundError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    else:
+        path.unlink(missing_ok=True)  # Still locked by us, so no one is about to take it
+        return False
+    finally:
+        os.close(fd)
+
+
+class Reservation:
+    """Space held for one download; tracks bytes already written so they aren't counted twice"""
+
+    def __init__(self, ledger: 'DiskSpaceLedger', path: Path, nbytes: int):
+        self.ledger = ledger
+        self.path = path
+        self.nbytes = nbytes
+        self.used = 0
+        self._last_write = 0.0
+
+    @property
+    def outstanding(self) -> int:
+        return max(0, self.nbytes - self.used)
+
+    def update(self, used: int) -> None:
+        """Record bytes written so far (persisted at most once a second)"""
+        self.used = used
+        if time.monotonic() - self._last_write > 1.0:
+            self.ledger._write(self)
+
+    def release(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+class DiskSpaceLedger:
+    """
+    Reservations shared by every ytd process writing to a directory.
+
+    Each reservation is a small file under .ytd-reservations, so threads and
+    separate processes (e.g. parallel jobs or containers on one volume) see
+    each other's claims. A process holds a lock on its own lock file there
+    while it runs; claims whose owner's lock is gone were left by a crashed
+    job and are removed. Admission is optimistic: the claim is written
+    first and withdrawn if the volume turns out to be overcommitted, so two
+    jobs racing for the last gigabyte can't both get it.
+    """
+
+    def __init__(self, directory: Path, min_free: int = DEFAULT_MIN_FREE,
+                 poll_interval: float = 1.0, stale_after: float = 24 * 3600):
+        self.directory = Path(directory)
+        self.store = self.directory / RESERVATIONS_DIR
+        self.min_free = min_free
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+
+    def _write(self, reservation: Reservation) -> None:
+        data = {'owner': OWNER, 'bytes': reservation.nbytes, 'used': reservation.used}
+        tmp = reservation.path.with_suffix('.tmp')
+        tmp.write_text(json.dumps(data))
+        os.replace(tmp, reservation.path)
+        reservation._last_write = time.monotonic()
+
+    def free_bytes(self) -> int:
+        return shutil.disk_usage(self.directory).free
+
+    def _claims(self, exclude: Optional[Path] = None) -> Tuple[int, int]:
+        """Bytes claimed but not yet written by live reservations: (this process, other processes)"""
+        own = others = 0
+        if not self.store.exists():
+            return 0, 0
+        alive: Dict[str, bool] = {}
+        for path in self.store.glob('*.json'):
+            if path == exclude:
+                continue
+            try:
+                data = json.loads(path.read_text())
+                owner = data.get('owner', '')
+                if owner not in alive:
+                    alive[owner] = bool(owner) and _owner_alive(self.store, owner)
+                if not alive[owner] or time.time() - path.stat().st_mtime > self.stale_after:
+                    path.unlink(missing_ok=True)  # Left behind by a crashed job
+                    continue
+                claim = max(0, data['bytes'] - data.get('used', 0))
+                if owner == OWNER:
+                    own += claim
+                else:
+                    others += claim
+            except (OSError, ValueError, KeyError):
+                continue  # Being replaced or removed right now
+        return own, others
+
+    def outstanding(self, exclude: Optional[Path] = None) -> int:
+        """Bytes claimed but not yet written by all live reservations"""
+        return sum(self._claims(exclude))
+
+    def available(self) -> int:
+        """Bytes that may still be reserved"""
+        return self.free_bytes() - self.outstanding() - self.min_free
+
+    def reserve(self, nbytes: int, timeout: Optional[float] = DEFAULT_RESERVE_TIMEOUT,
+                logger: Optional[logging.Logger] = None, label: str = '', wait_for_own: bool = False) -> Reservation:
+        """
+        Reserve nbytes, waiting while other downloads hold the space needed.
+
+        Only reservations of other processes are waited for, as this
+        process's own are released by the thread asking for more space. With
+        wait_for_own, they are waited for too, for callers whose reservations
+        are released concurrently (postprocessing workers).
+
+        Raises:
+            InsufficientSpaceError: if nbytes doesn't fit while no reservations
+                it may wait for are held, or the timeout expires
+        """
+        self.store.mkdir(parents=True, exist_ok=True)
+        _hold_owner_lock(self.store)
+        reservation = Reservation(self, self.store / f"{OWNER}-{uuid.uuid4().hex}.json", nbytes)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        waiting = False
+
+        while True:
+            self._write(reservation)
+            own, others = self._claims(exclude=reservation.path)
+            free = self.free_bytes() - self.min_free
+            if free - own - others >= nbytes:
+                return reservation
+
+            reservation.release()
+            if wait_for_own:
+                own, others = 0, own + others
+            if others == 0 or free - own < nbytes:
+                # Nothing to wait for: other downloads finishing is what frees
+                # the unused part of their (upper bound) reservations
+                raise InsufficientSpaceError(
+                    f"{label or 'Download'} needs {nbytes / 1024 / 1024:.0f}MB but only "
+                    f"{max(free - own, 0) / 1024 / 1024:.0f}MB is available on {self.directory}")
+            if deadline is not None and time.monotonic() > deadline:
+                raise InsufficientSpaceError(f"Timed out waiting for {nbytes / 1024 / 1024:.0f}MB of disk space")
+
+            if logger and not waiting:
+                logger.info(f"Waiting for disk space: {label or 'download'} needs "
+                            f"{nbytes / 1024 / 1024:.0f}MB, {others / 1024 / 1024:.0f}MB reserved by other downloads")
+                waiting = True
+            # Jitter so racing jobs don't keep colliding
+            time.sleep(self.poll_interval * (0.5 + random.random()))
+
+
+def estimate_download_bytes(info: Dict) -> Optional[int]:
+    """Expected download size of the selected format(s), or None if unknown"""
+    total = 0
+    for fmt in info.get('requested_formats') or [info]:
+        size = fmt.get('filesize') or fmt.get('filesize_approx')
+        if not size and fmt.get('tbr') and info.get('duration'):
+            size = fmt['tbr'] * 1000 / 8 * info['duration']
+        if not size:
+            return None
+        total += size
+    return int(total)
+
+
+class DiskAdmission:
+    """
+    Admission control for a YoutubeDL: reserve before each download, release
+    once it has been postprocessed or has failed.
+    """
+
+    def __init__(self, ledger: DiskSpaceLedger, rewrite: bool = True, logger: Optional[logging.Logger] = None):
+        self.ledger = ledger
+        self.rewrite = rewrite
+        self.logger = logger or logging.getLogger(__name__)
+        self.reservations: Dict[str, Reservation] = {}
+        self.lock = threading.Lock()
+        self._written: Dict[str, Dict[str, int]] = {}
+        self._wait_for_own = False
+
+    def attach(self, ydl) -> None:
+        ydl.add_post_processor(_AdmitPP(self, ydl), when='before_dl')
+        ydl.add_post_processor(_ReleasePP(self, ydl), when='after_move')
+        ydl.add_progress_hook(self.progress_hook)
+        if isinstance(ydl, PipelinedYoutubeDL):
+            # Postprocessing workers release this process's reservations while it waits
+            self._wait_for_own = True
+            ydl.add_job_hook(self.release)
+
+        # A failed download never reaches after_move, and yt-dlp reports it
+        # without raising (ignoreerrors) or a progress hook status
+        process_info = ydl.process_info
+
+        @functools.wraps(process_info)
+        def guarded_process_info(info_dict):
+            try:
+                return process_info(info_dict)
+            finally:
+                if not info_dict.get(QUEUED_KEY):
+                    self.release(info_dict)
+
+        ydl.process_info = guarded_process_info
+
+    def admit(self, info: Dict) -> None:
+        key = info.get('id') or info.get('url')
+        size = estimate_download_bytes(info)
+        if size is None:
+            self.logger.debug(f"No size known for {key}; downloading without a reservation")
+            return
+        # Room for the merged or re-embedded copy while the inputs still exist
+        nbytes = size * REWRITE_FACTOR if self.rewrite or info.get('requested_formats') else size
+        self.release(info)  # Left over from an earlier attempt (retries admit the same video again)
+        reservation = self.ledger.reserve(nbytes, logger=self.logger, label=info.get('title') or key,
+                                          wait_for_own=self._wait_for_own)
+        with self.lock:
+            self.reservations[key] = reservation
+            self._written[key] = {}
+
+    def release(self, info: Dict) -> None:
+        key = info.get('id') or info.get('url')
+        with self.lock:
+            reservation = self.reservations.pop(key, None)
+            self._written.pop(key, None)
+        if reservation:
+            reservation.release()
+
+    def release_all(self) -> None:
+        with self.lock:
+            reservations, self.reservations = list(self.reservations.values()), {}
+            self._written.clear()
+        for reservation in reservations:
+            reservation.release()
+
+    def progress_hook(self, d: Dict) -> None:
+        info = d.get('info_dict') or {}
+        key = info.get('id') or info.get('url')
+        with self.lock:
+            reservation = self.reservations.get(key)
+            if reservation is None:
+                return
+            # Merged downloads report each format's file separately
+            written = self._written[key]
+            written[d.get('filename', '')] = d.get('downloaded_bytes') or d.get('total_bytes') or 0
+            used = sum(written.values())
+        reservation.update(used)
+
+
+class _AdmitPP(PostProcessor):
+    def __init__(self, admission: DiskAdmission, downloader=None):
+        super().__init__(downloader)
+        self.admission = admission
+
+    @classmethod
+    def pp_key(cls):
+        return 'DiskAdmission'
+
+    def run(self, info):
+        # Nothing is downloaded for entries linked from the media store
+        if not self.get_param('skip_download') and not info.get(FROM_STORE_KEY):
+            self.admission.admit(info)
+        return [], info
+
+
+class _ReleasePP(PostProcessor):
+    def __init__(self, admission: DiskAdmission, downloader=None):
+        super().__init__(downloader)
+        self.admission = admission
+
+    @classmethod
+    def pp_key(cls):
+        return 'DiskRelease'
+
+    def run(self, info):
+        self.admission.release(info)
+        return [], info
@@ -2,11 +2,27 @@
 
 import subprocess
 import logging
+import time
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, Iterator, List, Optional, Any, Tuple
 import yt_dlp
 from tqdm import tqdm
 from .convert_subtitles import convert_file
+from .audio import AUDIO_EXTENSIONS, audio_format_selector, extraction_path, normalize_acodec
+from .pipeline import PipelinedYoutubeDL, DEFAULT_MAX_PENDING
+from .embed import FusedEmbedPP
+from .formats import Constraints, Plan, explain_plan, make_format_selector, plan_formats
+from .utils import PlaylistItems, parse_size
+from .diskspace import DiskAdmission, DiskSpaceLedger, DEFAULT_MIN_FREE
+from .store import MediaStore
+from .catalog import Catalog, CatalogRecorder, DEFAULT_CATALOG_NAME
+from .playlist_stream import stream_playlist
+from .retry import (DEFAULT_BACKOFF, DEFAULT_RETRIES, ErrorCapture, FailedItem, FailureTracker,
+                    HostCooldowns, RetryPolicy, RetryScheduler, causes_cooldown, classify_error, host_of)
+from .subtitle_fetch import DEFAULT_SUBTITLE_BURST, DEFAULT_SUBTITLE_INTERVAL, SubtitleFetcher
+from .thumbnails import DEFAULT_THUMBNAIL_CACHE_NAME, DEFAULT_THUMBNAIL_JOBS, DEFAULT_THUMBNAIL_SIZE, ThumbnailPipeline
+from .prefetch import DEFAULT_HOST_INTERVAL, DEFAULT_JOBS as DEFAULT_PREFETCH_JOBS, InfoCache, MetadataPrefetcher
 
 
 class YouTubeDownloader:
@@ -23,12 +39,23 @@ class YouTubeDownloader:
         self.pbar = None
         self.last_percentage = 0
         
+        # Smoothed download speed (bytes/s), used by the format planner
+        self.link_speed = None
+        
+        # Info dicts extracted by the prefetch stage, reused for the rest of the run
+        self.info_cache = InfoCache()
+        
+        # yt-dlp reports failed videos here (ignoreerrors); they are retried afterwards
+        self.errors = ErrorCapture(self.logger)
+        self.cooldowns = HostCooldowns()
+        self.thumbnails: Optional[ThumbnailPipeline] = None
+        
     def _get_ydl_opts(self, additional_opts: Optional[Dict] = None) -> Dict:
         """Get yt-dlp options based on configuration"""
         opts = {
             'outtmpl': str(self.output_dir / '%(title)s.%(ext)s'),
             'progress_hooks': [self._progress_hook],
-            'logger': self.logger,
+            'logger': self.errors,
             'quiet': self.options.get('quiet', False),
             'no_warnings': self.options.get('quiet', False),
             'ignoreerrors': True,  # Continue on download errors
@@ -38,14 +65,32 @@ class YouTubeDownloader:
         
         # Format selection
         format_spec = self.options.get('format', 'best')
+        constraints = self._format_constraints()
+        if constraints.active:
+            if format_spec not in (None, 'best'):
+                self.logger.warning(f"-f {format_spec} is ignored: formats are picked by the planner "
+                                    f"while size, bitrate, height, time, codec or container limits are set")
+            # Planned per video against size/bitrate/time limits
+            opts['format'] = make_format_selector(self._format_constraints,
+                                                  audio_only=bool(self.options.get('audio_only')),
+                                                  on_plan=self._log_plan)
+            if constraints.container and not self.options.get('audio_only'):
+                opts['merge_output_format'] = constraints.container
+        
         if self.options.get('audio_only'):
-            opts['format'] = 'bestaudio/best'
+            audio_format = self.options.get('audio_format', 'mp3')
+            # Prefer a source already in the target codec so it is only remuxed
+            if not constraints.active:
+                opts['format'] = audio_format_selector(audio_format)
             opts['postprocessors'] = [{
                 'key': 'FFmpegExtractAudio',
-                'preferredcodec': self.options.get('audio_format', 'mp3'),
-                'preferredquality': '192',
+                'preferredcodec': audio_format,
+                'preferredquality': '192',  # Only used when transcoding
             }]
-        else:
+            opts['postprocessor_hooks'] = [self._audio_path_hook]
+            # Lets an already extracted file (e.g. linked from the store) skip the download
+            opts['final_ext'] = AUDIO_EXTENSIONS.get(audio_format, audio_format)
+        elif not constraints.active:
             opts['format'] = format_spec
         
         # Subtitles
@@ -63,18 +108,15 @@ class YouTubeDownloader:
                 # Download specific languages
                 opts['subtitleslangs'] = sub_langs.split(',')
         
-        # Metadata and thumbnail
-        if self.options.get('metadata'):
-            opts['addmetadata'] = True
-        if self.options.get('thumbnail'):
+        # Metadata and thumbnail are embedded by FusedEmbedPP (see _create_ydl);
+        # cover art for downloads comes from the ThumbnailPipeline instead
+        if self.options.get('thumbnail') and self.options.get('skip_download'):
             opts['writethumbnail'] = True
+            # MP4 and MP3 cover art must be JPEG or PNG
             opts['postprocessors'] = opts.get('postprocessors', []) + [{
-                'key': 'FFmpegEmbedSubtitle',
-            }, {
-                'key': 'FFmpegMetadata',
-                'add_metadata': True,
-            }, {
-                'key': 'EmbedThumbnail',
+                'key': 'FFmpegThumbnailsConvertor',
+                'format': 'jpg',
+                'when': 'before_dl',
             }]
         
         # Rate limiting
@@ -98,8 +140,9 @@ class YouTubeDownloader:
             opts['outtmpl'] = str(self.output_dir / self.options['filename'])
         
         # Playlist options
-        if self.options.get('playlist_items'):
-            opts['playlist_items'] = self.options['playlist_items']
+        items = self._playlist_items()
+        if items:
+            opts['playlist_items'] = str(items)
         
         # Skip download option (useful for subtitles only)
         if self.options.get('skip_download'):
@@ -116,6 +159,118 @@ class YouTubeDownloader:
         
         return opts
     
+    def _format_constraints(self) -> Constraints:
+        """Format planner constraints from the options and the measured link speed"""
+        prefer = self.options.get('prefer_codecs')
+        prefer_codecs = tuple(c.strip().lower() for c in prefer.split(',') if c.strip()) if prefer else ()
+        max_size = self.options.get('max_filesize')
+        link_speed = self.options.get('link_speed')
+        constraints = Constraints(
+            max_bytes=parse_size(max_size) if max_size else None,
+            max_bitrate=self.options.get('max_bitrate'),
+            max_height=self.options.get('max_height'),
+            max_seconds=self.options.get('max_download_time'),
+            link_speed=self._parse_rate_limit(link_speed) if link_speed else self.link_speed,
+            prefer_codecs=prefer_codecs,
+            container=self.options.get('container'),
+        )
+        if self.options.get('audio_only') and not prefer_codecs and constraints.active:
+            # Keep preferring audio that needs no transcode (see audio_format_selector)
+            audio_format = self.options.get('audio_format', 'mp3')
+            constraints = constraints._replace(prefer_codecs=({'m4a': 'aac'}.get(audio_format, audio_format),))
+        return constraints
+    
+    def _log_plan(self, plan: Plan) -> None:
+        """Log the planner's choice for each video"""
+        if plan.choice:
+            self.logger.info(f"Format plan: {plan.choice.describe()} "
+                             f"({len(plan.accepted)} acceptable, {len(plan.rejected)} rejected)")
+        else:
+            self.logger.error("Format plan: no format fits the constraints (use --plan-formats to see why)")
+    
+    def plan_formats(self, url: str) -> Optional[Plan]:
+        """Plan the format for a video without downloading (dry run)"""
+        try:
+            opts = {
+                'quiet': True,
+                'no_warnings': True,
+            }
+            
+            with yt_dlp.YoutubeDL(opts) as ydl:
+                info = ydl.extract_info(url, download=False)
+            
+            return plan_formats(info.get('formats') or [], self._format_constraints(),
+                                info.get('duration'), bool(self.options.get('audio_only')))
+        except Exception as e:
+            self.logger.error(f"Error planning formats: {str(e)}")
+            return None
+    
+    def _create_prefetcher(self, opts: Dict, jobs: int) -> MetadataPrefetcher:
+        """Prefetch stage sharing this downloader's info cache"""
+        interval = self.options.get('prefetch_interval')
+        return MetadataPrefetcher(
+            opts,
+            jobs=jobs,
+            host_interval=DEFAULT_HOST_INTERVAL if interval is None else interval,
+            cache=self.info_cache,
+        )
+    
+    def prefetch_playlist(self, url: str) -> Optional[List[Dict]]:
+        """
+        Extract every (requested) entry of a playlist concurrently.
+        
+        The playlist is enumerated flat, then entries are extracted on
+        --prefetch worker threads (4 by default) with per-host spacing.
+        Results are kept in self.info_cache.
+        """
+        try:
+            # Same cookies and playlist items as a download, without its progress output
+            opts = self._get_ydl_opts({'quiet': True, 'no_warnings': True, 'noprogress': True})
+            
+            with yt_dlp.YoutubeDL({**opts, 'extract_flat': 'in_playlist'}) as ydl:
+                playlist = ydl.extract_info(url, download=False)
+            if playlist is None:
+                return None
+            entries = [entry for entry in playlist.get('entries') or [playlist] if entry]
+            
+            jobs = self.options.get('prefetch') or DEFAULT_PREFETCH_JOBS
+            with self._create_prefetcher(opts, jobs) as prefetcher:
+                started = time.perf_counter()
+                infos = prefetcher.prefetch(entries)
+                elapsed = time.perf_counter() - started
+            self.logger.info(f"Extracted {len(infos)} entries in {elapsed:.1f}s on {jobs} thread(s)")
+            return infos
+        except Exception as e:
+            self.logger.error(f"Error prefetching playlist: {str(e)}")
+            return None
+    
+    def plan_playlist(self, url: str) -> Optional[List[Tuple[Dict, Plan]]]:
+        """Plan the format of every playlist entry (dry run, entries extracted concurrently)"""
+        infos = self.prefetch_playlist(url)
+        if infos is None:
+            return None
+        constraints = self._format_constraints()
+        audio_only = bool(self.options.get('audio_only'))
+        return [(info, plan_formats(info.get('formats') or [], constraints, info.get('duration'), audio_only))
+                for info in infos if info.get('formats')]
+    
+    def explain_formats(self, url: str) -> Optional[str]:
+        """Dry-run explanation of the planned format choice (per entry for playlists)"""
+        if not self.options.get('playlist'):
+            plan = self.plan_formats(url)
+            return explain_plan(plan) if plan else None
+        
+        plans = self.plan_playlist(url)
+        if plans is None:
+            return None
+        sections = [f"== {info.get('title') or info.get('id')} [{info.get('id')}]\n{explain_plan(plan, limit=3)}"
+                    for info, plan in plans]
+        chosen = [plan.choice for _, plan in plans if plan.choice]
+        known = [choice.size for choice in chosen if choice.size]
+        sections.append(f"Playlist: {len(chosen)} of {len(plans)} entries have a format, "
+                        f"~{sum(known) / 1024 / 1024:.0f}MB ({len(chosen) - len(known)} of unknown size)")
+        return '\n\n'.join(sections)
+    
     def _parse_rate_limit(self, rate: str) -> int:
         """Parse rate limit string to bytes"""
         rate = rate.upper()
@@ -129,6 +284,11 @@ class YouTubeDownloader:
     
     def _progress_hook(self, d: Dict) -> None:
         """Progress hook for yt-dlp"""
+        if d['status'] == 'downloading' and d.get('speed'):
+            # Exponential moving average, so later playlist entries plan with a measured speed
+            speed = d['speed']
+            self.link_speed = speed if self.link_speed is None else 0.8 * self.link_speed + 0.2 * speed
+        
         if d['status'] == 'downloading':
             if not self.options.get('no_progress') and not self.options.get('quiet'):
                 total = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
@@ -169,6 +329,19 @@ class YouTubeDownloader:
                 self.last_percentage = 0
             self.logger.info(f"Download finished: {d.get('filename', 'Unknown')}")
     
+    def _audio_path_hook(self, d: Dict) -> None:
+        """Report whether audio extraction is a stream copy or a transcode"""
+        if d['status'] != 'started' or d.get('postprocessor') != 'ExtractAudio':
+            return
+        
+        audio_format = self.options.get('audio_format', 'mp3')
+        acodec = d.get('info_dict', {}).get('acodec')
+        source = normalize_acodec(acodec) or 'unknown'
+        if extraction_path(acodec, audio_format) == 'copy':
+            self.logger.info(f"Audio: stream copy ({source} → {audio_format}, no re-encode)")
+        else:
+            self.logger.info(f"Audio: transcoding {source} → {audio_format}")
+    
     def _handle_subtitle_conversion(self) -> None:
         """Convert downloaded subtitles if requested"""
         convert_format = self.options.get('convert_subs', 'keep')
@@ -187,14 +360,177 @@ class YouTubeDownloader:
                 except Exception as e:
                     self.logger.error(f"Failed to convert {subtitle_file}: {e}")
     
+    @contextmanager
+    def _create_ydl(self, opts: Dict, playlist: bool = False) -> Iterator[yt_dlp.YoutubeDL]:
+        """
+        Create the YoutubeDL for a download.
+        
+        Playlists postprocess on a worker pool if requested, metadata, cover
+        art and subtitles are embedded in one combined ffmpeg pass, downloads
+        already in the media store are linked instead of fetched, finished
+        files are recorded in the catalog, and disk space is reserved before
+        each download starts. Subtitles requested along with the media are
+        fetched after it, spaced out per host, and cover art is fetched and
+        resized on a worker pool while the media downloads.
+        """
+        workers = self.options.get('postprocess_workers') or 0
+        if playlist and workers > 0:
+            self.logger.info(f"Postprocessing on {workers} worker(s) while downloading")
+            ydl = PipelinedYoutubeDL(
+                opts,
+                workers=workers,
+                max_pending=self.options.get('postprocess_queue') or DEFAULT_MAX_PENDING,
+                output_dir=self.output_dir,
+                logger=self.logger,
+            )
+        else:
+            ydl = yt_dlp.YoutubeDL(opts)
+        
+        thumbnail = bool(self.options.get('thumbnail'))
+        self.thumbnails = None
+        if thumbnail and not self.options.get('skip_download'):
+            size = self.options.get('thumbnail_size')
+            self.thumbnails = ThumbnailPipeline(
+                self.output_dir / DEFAULT_THUMBNAIL_CACHE_NAME,
+                jobs=self.options.get('thumbnail_jobs') or DEFAULT_THUMBNAIL_JOBS,
+                max_size=DEFAULT_THUMBNAIL_SIZE if size is None else size,
+                logger=self.logger,
+            )
+            # Before FusedEmbedPP, which picks up the image it puts next to the media
+            self.thumbnails.attach(ydl)
+        if thumbnail or self.options.get('metadata'):
+            ydl.add_post_processor(FusedEmbedPP(
+                ydl,
+                add_metadata=True,
+                embed_thumbnail=thumbnail,
+                embed_subtitles=thumbnail,
+            ))
+        
+        if self.options.get('subtitles') and not self.options.get('skip_download'):
+            # One extraction per video: the subtitle URLs came with the formats.
+            # Before the catalog, which records the languages written
+            interval = self.options.get('sub_interval')
+            SubtitleFetcher(
+                interval=DEFAULT_SUBTITLE_INTERVAL if interval is None else interval,
+                burst=self.options.get('sub_burst') or DEFAULT_SUBTITLE_BURST,
+                policy=self._retry_policy(),
+                cooldowns=self.cooldowns,
+                logger=self.logger,
+            ).attach(ydl)
+        
+        if self.options.get('store'):
+            # Attached first so stored entries are linked before space is reserved
+            MediaStore(self.options['store'], link_mode=self.options.get('store_links') or 'hardlink',
+                       logger=self.logger).attach(ydl, self._store_variant())
+        
+        catalog = None
+        if not self.options.get('no_catalog'):
+            # After the store, which supplies the checksum when it is in use
+            catalog = Catalog(self.catalog_path())
+            CatalogRecorder(catalog, checksum=bool(self.options.get('catalog_checksums'))).attach(ydl)
+        
+        admission = None
+        if not self.options.get('no_space_check'):
+            min_free = self.options.get('min_free_space')
+            ledger = DiskSpaceLedger(self.output_dir, parse_size(min_free) if min_free else DEFAULT_MIN_FREE)
+            # Postprocessing that rewrites the file needs room for a second copy
+            rewrite = bool(self.options.get('audio_only') or thumbnail or self.options.get('metadata'))
+            admission = DiskAdmission(ledger, rewrite=rewrite, logger=self.logger)
+            admission.attach(ydl)
+        
+        try:
+            with ydl:
+                yield ydl
+        finally:
+            if admission:
+                admission.release_all()
+            if catalog:
+                catalog.close()
+            if self.thumbnails:
+                self.thumbnails.close()
+    
+    def _playlist_items(self) -> Optional[PlaylistItems]:
+        """--playlist-items as an interval set (config files give a string)"""
+        items = self.options.get('playlist_items')
+        if isinstance(items, str):
+            items = PlaylistItems.parse(items)
+        return items or None
+    
+    def catalog_path(self) -> Path:
+        """Catalog database for this output directory"""
+        if self.options.get('catalog'):
+            return Path(self.options['catalog']).expanduser()
+        return self.output_dir / DEFAULT_CATALOG_NAME
+    
+    def _store_variant(self) -> str:
+        """Postprocessing that changes a download's bytes, part of its store key"""
+        parts = []
+        if self.options.get('audio_only'):
+            parts.append(self.options.get('audio_format', 'mp3'))
+        if self.options.get('thumbnail'):
+            parts.append('thumb')
+        if self.options.get('metadata'):
+            parts.append('meta')
+        return '-'.join(parts)
+    
+    def _download_with_retries(self, ydl: yt_dlp.YoutubeDL, url: str) -> None:
+        """Download url, retrying it if it fails with a retriable error"""
+        self.errors.take()
+        ydl.download([url])
+        errors = self.errors.take()
+        if errors:
+            if causes_cooldown(classify_error(errors[-1])):
+                self.cooldowns.penalize(host_of(url))
+            self._retry_failures(ydl, [FailedItem(url, errors)])
+    
+    def _retry_policy(self) -> RetryPolicy:
+        """Retry policy from --video-retries and --retry-backoff"""
+        retries = self.options.get('video_retries')
+        backoff = self.options.get('retry_backoff')
+        return RetryPolicy(
+            retries=DEFAULT_RETRIES if retries is None else retries,
+            backoff=DEFAULT_BACKOFF if backoff is None else backoff,
+        )
+    
+    def _retry_failures(self, ydl: yt_dlp.YoutubeDL, failures: List[FailedItem]) -> None:
+        """
+        Retry failed videos with backoff and per-host cool-downs.
+        
+        Failures are classified from yt-dlp's error message: rate limiting,
+        throttling, 403s, network and extractor errors are retried (up to
+        --video-retries times), unavailable videos are not.
+        """
+        if not failures:
+            return
+        policy = self._retry_policy()
+        
+        def process(failure: FailedItem) -> List[str]:
+            self.errors.take()
+            try:
+                if isinstance(failure.item, str):
+                    ydl.download([failure.item])
+                else:
+                    ydl.process_ie_result(dict(failure.item), download=True, extra_info=failure.extra_info)
+            except Exception as e:
+                self.errors.error(str(e))
+            return self.errors.take()
+        
+        recovered, given_up = RetryScheduler(policy, self.cooldowns, self.logger).run(failures, process)
+        self.logger.info(f"{len(failures)} video(s) failed: {len(recovered)} recovered on retry, "
+                         f"{len(given_up)} given up")
+        for failure in given_up:
+            reason = failure.errors[-1] if failure.errors else 'unknown error'
+            self.logger.error(f"Gave up on {failure.label} after {failure.attempts} attempt(s) "
+                              f"({failure.error_class.replace('_', ' ')}): {reason}")
+    
     def download_video(self, url: str) -> bool:
         """Download a single video"""
         try:
             opts = self._get_ydl_opts()
             
-            with yt_dlp.YoutubeDL(opts) as ydl:
+            with self._create_ydl(opts) as ydl:
                 self.logger.info(f"Downloading video: {url}")
-                ydl.download([url])
+                self._download_with_retries(ydl, url)
             
             # Handle subtitle conversion if requested
             if self.options.get('subtitles'):
@@ -213,9 +549,36 @@ class YouTubeDownloader:
                 'playlistrandom': False,
             })
             
-            with yt_dlp.YoutubeDL(opts) as ydl:
+            with self._create_ydl(opts, playlist=True) as ydl:
                 self.logger.info(f"Downloading playlist: {url}")
-                ydl.download([url])
+                if self.options.get('no_stream_playlist'):
+                    ydl.download([url])
+                else:
+                    # Downloads start with the first page of entries, not after the last
+                    jobs = self.options.get('prefetch') or 0
+                    prefetcher = self._create_prefetcher(opts, jobs) if jobs > 0 else None
+                    tracker = FailureTracker(self.errors, self.cooldowns, self.logger)
+                    thumbnails = self.thumbnails
+                    
+                    def wrap_entries(entries, playlist):
+                        if thumbnails:
+                            # Prefetched entries are complete; their cover art can be fetched early
+                            entries = thumbnails.submit_ahead(entries)
+                        return tracker.track(entries, playlist)
+                    
+                    try:
+                        stream_playlist(ydl, url, self._playlist_items(), prefetcher, wrap_entries=wrap_entries)
+                    finally:
+                        if prefetcher:
+                            prefetcher.close()
+                    self._retry_failures(ydl, tracker.failed)
+                
+                if isinstance(ydl, PipelinedYoutubeDL):
+                    failures = ydl.wait()
+                    self.logger.info(f"Postprocessing finished ({ydl.pp_seconds:.1f}s of ffmpeg work "
+                                     f"overlapped with downloads)")
+                    for filename, error in failures:
+                        self.logger.error(f"Postprocessing failed: {filename}: {error}")
             
             # Handle subtitle conversion if requested
             if self.options.get('subtitles'):
@@ -232,9 +595,9 @@ class YouTubeDownloader:
             # Audio-only option is already handled in _get_ydl_opts
             opts = self._get_ydl_opts()
             
-            with yt_dlp.YoutubeDL(opts) as ydl:
+            with self._create_ydl(opts) as ydl:
                 self.logger.info(f"Downloading audio: {url}")
-                ydl.download([url])
+                self._download_with_retries(ydl, url)
             
             # Handle subtitle conversion if requested
             if self.options.get('subtitles'):
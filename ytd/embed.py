@@ -0,0 +1,169 @@
+"""Embed metadata, cover art and subtitles in a single ffmpeg pass"""
+
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from yt_dlp.postprocessor.common import PostProcessor
+from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+from yt_dlp.utils import PostProcessingError, prepend_extension
+
+from .merge_subtitles import SUBTITLE_CODECS, track_metadata
+from .store import FROM_STORE_KEY
+
+# Container tag -> info dict fields tried in order (the first one set wins)
+METADATA_FIELDS = (
+    ('title', ('track', 'title')),
+    ('date', ('upload_date',)),
+    ('description', ('description',)),
+    ('synopsis', ('description',)),
+    ('purl', ('webpage_url',)),
+    ('comment', ('webpage_url',)),
+    ('artist', ('artist', 'creator', 'uploader', 'uploader_id')),
+    ('album', ('album', 'series')),
+    ('genre', ('genre', 'categories')),
+)
+
+MP4_EXTENSIONS = ('mp4', 'm4v', 'mov', 'm4a')
+MATROSKA_EXTENSIONS = ('mkv', 'mka')
+SUBTITLE_CONTAINERS = ('mp4', 'm4v', 'mov', 'mkv', 'webm')
+THUMBNAIL_MIMETYPES = {'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'png': 'image/png', 'webp': 'image/webp'}
+
+
+def metadata_tags(info: Dict) -> Dict[str, str]:
+    """Container metadata tags for an info dict"""
+    tags = {}
+    for tag, fields in METADATA_FIELDS:
+        value = next((info[field] for field in fields if info.get(field) not in (None, '', [])), None)
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple)):
+            value = ', '.join(map(str, value))
+        tags[tag] = str(value).replace('\0', '')
+    return tags
+
+
+def build_embed_options(ext: str, stream_count: int, metadata: Optional[Dict[str, str]] = None,
+                        thumbnail: Optional[str] = None,
+                        subtitles: Sequence[Tuple[str, str]] = ()) -> Tuple[List[str], List[str]]:
+    """
+    Build the extra inputs and output options for one combined pass.
+
+    Args:
+        ext: Extension of the media file (decides how cover art and subtitles are stored)
+        stream_count: Number of non-data streams in the media file
+        metadata: Container tags to set
+        thumbnail: Cover image to embed
+        subtitles: (language, path) pairs to add as subtitle streams
+
+    Returns:
+        (input paths after the media file, output options)
+    """
+    inputs: List[str] = []
+    opts = ['-map', '0', '-dn', '-c', 'copy']
+
+    if thumbnail and ext in MP4_EXTENSIONS + ('mp3',):
+        inputs.append(thumbnail)
+        opts += ['-map', f'{len(inputs)}:0']
+        if ext == 'mp3':
+            opts += ['-id3v2_version', '3',
+                     '-metadata:s:v', 'title=Album cover', '-metadata:s:v', 'comment=Cover (front)']
+        else:
+            # The cover is mapped right after the original streams
+            opts += [f'-disposition:{stream_count}', 'attached_pic']
+    elif thumbnail and ext in MATROSKA_EXTENSIONS:
+        thumb_ext = Path(thumbnail).suffix.lstrip('.').lower()
+        opts += ['-attach', thumbnail,
+                 '-metadata:s:t', f"mimetype={THUMBNAIL_MIMETYPES.get(thumb_ext, 'image/jpeg')}",
+                 '-metadata:s:t', f'filename=cover.{thumb_ext or "jpg"}']
+
+    if subtitles and ext in SUBTITLE_CONTAINERS:
+        opts += ['-c:s', SUBTITLE_CODECS[f'.{ext}']]
+        for i, (lang, path) in enumerate(subtitles):
+            inputs.append(path)
+            opts += ['-map', f'{len(inputs)}:0']
+            code, title = track_metadata(lang)
+            if code:
+                opts += [f'-metadata:s:s:{i}', f'language={code}']
+            opts += [f'-metadata:s:s:{i}', f'title={title}']
+
+    for tag, value in (metadata or {}).items():
+        opts += ['-metadata', f'{tag}={value}']
+
+    if ext == 'mp3':
+        opts += ['-write_id3v1', '1']
+    return inputs, opts
+
+
+class FusedEmbedPP(FFmpegPostProcessor):
+    """
+    Replaces the FFmpegEmbedSubtitle -> FFmpegMetadata -> EmbedThumbnail chain.
+
+    Each of those rewrites the whole media file; this writes it once. Cover
+    art is supported for MP4/M4A, Matroska and MP3; subtitles for MP4,
+    Matroska and WebM. Subtitle files are kept, the embedded thumbnail is
+    deleted like EmbedThumbnail does.
+    """
+
+    def __init__(self, downloader=None, add_metadata=True, embed_thumbnail=True, embed_subtitles=True):
+        FFmpegPostProcessor.__init__(self, downloader)
+        self._add_metadata = add_metadata
+        self._embed_thumbnail = embed_thumbnail
+        self._embed_subtitles = embed_subtitles
+
+    @classmethod
+    def pp_key(cls):
+        return 'FusedEmbed'
+
+    def _thumbnail(self, info: Dict) -> Optional[str]:
+        for thumbnail in reversed(info.get('thumbnails') or []):
+            path = thumbnail.get('filepath')
+            if path and os.path.exists(path):
+                return path
+        return None
+
+    def _subtitles(self, info: Dict) -> List[Tuple[str, str]]:
+        subtitles = []
+        for lang, sub in (info.get('requested_subtitles') or {}).items():
+            path = sub.get('filepath')
+            if path and os.path.exists(path) and sub.get('ext') != 'json':
+                subtitles.append((lang, path))
+        return subtitles
+
+    def _stream_count(self, path: str) -> int:
+        streams = self.get_metadata_object(path).get('streams', [])
+        return sum(1 for s in streams if s.get('codec_type') != 'data')
+
+    @PostProcessor._restrict_to(images=False)
+    def run(self, info):
+        filename = info['filepath']
+        ext = info['ext']
+        if info.get(FROM_STORE_KEY):
+            # The stored file was embedded when it was first downloaded
+            thumbnail = self._thumbnail(info) if self._embed_thumbnail else None
+            return [thumbnail] if thumbnail else [], info
+        thumbnail = self._thumbnail(info) if self._embed_thumbnail else None
+        subtitles = self._subtitles(info) if self._embed_subtitles else []
+        metadata = metadata_tags(info) if self._add_metadata else {}
+
+        if not (thumbnail or subtitles or metadata):
+            self.to_screen('Nothing to embed')
+            return [], info
+
+        stream_count = self._stream_count(filename) if thumbnail else 0
+        inputs, opts = build_embed_options(ext, stream_count, metadata, thumbnail, subtitles)
+
+        temp_filename = prepend_extension(filename, 'temp')
+        parts = [name for name, wanted in (('metadata', metadata), ('cover art', thumbnail),
+                                           (f'{len(subtitles)} subtitle track(s)', subtitles)) if wanted]
+        self.to_screen(f'Embedding {", ".join(parts)} in "{filename}" (single pass)')
+        try:
+            self.run_ffmpeg_multiple_files([filename, *inputs], temp_filename, opts)
+        except PostProcessingError:
+            if os.path.exists(temp_filename):
+                os.remove(temp_filename)
+            raise
+        os.replace(temp_filename, filename)
+
+        files_to_delete = [thumbnail] if thumbnail and thumbnail in inputs + opts else []
+        return files_to_delete, info
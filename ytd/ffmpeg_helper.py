@@ -9,14 +9,25 @@ import sys
 import platform
 import subprocess
 import shutil
+import threading
 import zipfile
 import tarfile
+from functools import cached_property
+from http.client import HTTPException
 from pathlib import Path
-from urllib.request import urlopen, urlretrieve
-from urllib.error import URLError
+from typing import FrozenSet, Optional
 import json
 from tqdm import tqdm
 
+try:
+    from .http_pool import default_pool
+    from .ranged_download import download_file, DownloadError
+    from .stream_extract import StreamReader, extract_members
+except ImportError:
+    from http_pool import default_pool
+    from ranged_download import download_file, DownloadError
+    from stream_extract import StreamReader, extract_members
+
 
 class FFmpegHelper:
     """Helper class for managing FFmpeg installation"""
@@ -25,7 +36,9 @@ class FFmpegHelper:
     FFMPEG_URLS = {
         'Windows': {
             'url': 'https://github.com/BtbN/FFmpeg-Builds/releases/download/latest/ffmpeg-master-latest-win64-gpl.zip',
-            'exe': 'ffmpeg.exe'
+            'exe': 'ffmpeg.exe',
+            'checksum_url': 'https://github.com/BtbN/FFmpeg-Builds/releases/download/latest/checksums.sha256',
+            'checksum_type': 'sha256'
         },
         'Darwin': {  # macOS
             'url': 'https://evermeet.cx/ffmpeg/getrelease/ffmpeg/zip',
@@ -33,7 +46,9 @@ class FFmpegHelper:
         },
         'Linux': {
             'url': 'https://johnvansickle.com/ffmpeg/builds/ffmpeg-git-amd64-static.tar.xz',
-            'exe': 'ffmpeg'
+            'exe': 'ffmpeg',
+            'checksum_url': 'https://johnvansickle.com/ffmpeg/builds/ffmpeg-git-amd64-static.tar.xz.md5',
+            'checksum_type': 'md5'
         }
     }
     
@@ -95,8 +110,33 @@ class FFmpegHelper:
         
         return 'ffmpeg'  # Fallback
     
-    def download_ffmpeg(self, progress_callback=None) -> bool:
-        """Download and install ffmpeg for the current platform"""
+    def get_ffprobe_command(self) -> str:
+        """Get the ffprobe command to use (installed next to ffmpeg)"""
+        system_ffprobe = shutil.which('ffprobe')
+        if system_ffprobe:
+            return system_ffprobe
+        
+        # Static builds ship ffprobe alongside ffmpeg
+        exe_name = 'ffprobe.exe' if self.system == 'Windows' else 'ffprobe'
+        local_ffprobe = self.ffmpeg_dir / exe_name
+        if local_ffprobe.exists():
+            return str(local_ffprobe)
+        
+        return 'ffprobe'  # Fallback
+    
+    # Parallel connections used for the archive download when the server allows it
+    DOWNLOAD_SEGMENTS = 4
+    
+    def download_ffmpeg(self, progress_callback=None, streaming=True) -> bool:
+        """
+        Download and install ffmpeg for the current platform.
+        
+        By default the binaries are extracted while the archive streams in,
+        so the archive itself never touches the disk; a stream that breaks
+        off is continued with a Range request. A partial download left by an
+        earlier non-streaming attempt is resumed instead. Either way the
+        archive is verified against the published checksum if there is one.
+        """
         if self.system not in self.FFMPEG_URLS:
             print(f"Unsupported platform: {self.system}")
             return False
@@ -113,12 +153,16 @@ class FFmpegHelper:
         
         # Download with progress
         temp_file = self.ffmpeg_dir / 'ffmpeg_temp.download'
+        checksum = self._fetch_checksum(download_info)
+        
+        if streaming and not temp_file.exists():
+            return self._install_streaming(url, checksum, progress_callback)
         
         try:
             if progress_callback:
-                self._download_with_progress(url, temp_file, progress_callback)
+                self._download_with_progress(url, temp_file, progress_callback, checksum)
             else:
-                self._download_with_tqdm(url, temp_file)
+                self._download_with_tqdm(url, temp_file, checksum)
             
             # Extract based on file type
             print("Extracting FFmpeg...")
@@ -138,37 +182,138 @@ class FFmpegHelper:
             if temp_file.exists():
                 temp_file.unlink()
             
+            # Forget the cached "not found" resolution
+            invalidate_ffmpeg_cache()
+            
             print(f"FFmpeg installed successfully to: {self.ffmpeg_path}")
             return True
             
+        except DownloadError as e:
+            # Keep the partial download so the next attempt can resume it
+            print(f"Error downloading FFmpeg: {e}")
+            if temp_file.exists():
+                print("The partial download was kept and will be resumed on the next attempt.")
+            return False
         except Exception as e:
             print(f"Error downloading FFmpeg: {e}")
             if temp_file.exists():
                 temp_file.unlink()
             return False
     
-    def _download_with_tqdm(self, url: str, dest: Path):
+    def _binary_names(self) -> list:
+        """Names of the binaries to install from the archive"""
+        suffix = '.exe' if self.system == 'Windows' else ''
+        return [f'ffmpeg{suffix}', f'ffprobe{suffix}']
+    
+    def _install_streaming(self, url: str, checksum=None, progress_callback=None) -> bool:
+        """
+        Extract ffmpeg and ffprobe straight from the HTTP response.
+        
+        Members are written to .partial files and only moved into place once
+        the whole archive has passed verification. Without a checksum the
+        download stops as soon as both binaries have been extracted. A
+        dropped connection is continued from the bytes already read with a
+        Range request, as long as the server honours it.
+        """
+        algorithm = checksum.partition(':')[0] if checksum else None
+        wanted = {name: self.ffmpeg_dir / f'{name}.partial' for name in self._binary_names()}
+        resumed = []
+        
+        def reopen(offset):
+            response = default_pool().request('GET', url, {'Range': f'bytes={offset}-'})
+            resumed.append(response)
+            content_range = response.headers.get('Content-Range') or ''
+            if response.status != 206 or not content_range.startswith(f'bytes {offset}-'):
+                raise DownloadError("The server cannot resume the interrupted download")
+            return response
+        
+        try:
+            with default_pool().request('GET', url) as response, \
+                    tqdm(unit='B', unit_scale=True, desc='Downloading', disable=bool(progress_callback)) as pbar:
+                total = int(response.headers.get('Content-Length') or 0)
+                pbar.total = total or None
+                
+                def report_progress(downloaded):
+                    if progress_callback:
+                        percent = min(100, (downloaded / total) * 100) if total else 0
+                        progress_callback(percent, downloaded, total)
+                    else:
+                        pbar.update(downloaded - pbar.n)
+                
+                reader = StreamReader(response, algorithm, report_progress, reopen=reopen, size=total or None)
+                print("Extracting FFmpeg while downloading...")
+                extracted = extract_members(reader, wanted, stop_early=not checksum)
+                
+                if checksum:
+                    reader.drain()
+                    expected = checksum.partition(':')[2].strip().lower()
+                    if reader.hexdigest() != expected:
+                        raise DownloadError(f"Checksum mismatch for {url}")
+            
+            if wanted[self.ffmpeg_path.name] not in extracted.values():
+                raise DownloadError("ffmpeg was not found in the archive")
+            
+            for name, partial in extracted.items():
+                final = self.ffmpeg_dir / name
+                os.replace(partial, final)
+                if self.system in ['Darwin', 'Linux']:
+                    os.chmod(final, 0o755)
+            
+            # Forget the cached "not found" resolution
+            invalidate_ffmpeg_cache()
+            
+            print(f"FFmpeg installed successfully to: {self.ffmpeg_path}")
+            return True
+        
+        except Exception as e:
+            print(f"Error downloading FFmpeg: {e}")
+            return False
+        finally:
+            for response in resumed:
+                response.close()
+            for partial in wanted.values():
+                if partial.exists():
+                    partial.unlink()
+    
+    def _fetch_checksum(self, download_info: dict):
+        """Fetch the published checksum for the archive as "algorithm:hexdigest", if any"""
+        checksum_url = download_info.get('checksum_url')
+        if not checksum_url:
+            return None
+        
+        archive_name = download_info['url'].rsplit('/', 1)[-1]
+        try:
+            lines = default_pool().get(checksum_url).decode('utf-8', errors='replace').splitlines()
+        except (HTTPException, OSError, ValueError) as e:
+            print(f"Warning: Could not fetch checksum, skipping verification: {e}")
+            return None
+        
+        # Either a single "<hash>  <file>" line or a list covering several files
+        for line in lines:
+            parts = line.split()
+            if parts and (len(lines) == 1 or (len(parts) > 1 and parts[-1].lstrip('*') == archive_name)):
+                return f"{download_info['checksum_type']}:{parts[0]}"
+        return None
+    
+    def _download_with_tqdm(self, url: str, dest: Path, checksum=None):
         """Download file with tqdm progress bar"""
-        response = urlopen(url)
-        total_size = int(response.headers.get('Content-Length', 0))
-        
-        with open(dest, 'wb') as f:
-            with tqdm(total=total_size, unit='B', unit_scale=True, desc='Downloading') as pbar:
-                while True:
-                    chunk = response.read(8192)
-                    if not chunk:
-                        break
-                    f.write(chunk)
-                    pbar.update(len(chunk))
-    
-    def _download_with_progress(self, url: str, dest: Path, callback):
+        with tqdm(unit='B', unit_scale=True, desc='Downloading') as pbar:
+            def report_progress(downloaded, total_size):
+                if total_size and pbar.total != total_size:
+                    pbar.total = total_size
+                pbar.update(downloaded - pbar.n)
+            
+            download_file(url, dest, segments=self.DOWNLOAD_SEGMENTS,
+                          checksum=checksum, progress_callback=report_progress)
+    
+    def _download_with_progress(self, url: str, dest: Path, callback, checksum=None):
         """Download file with custom progress callback"""
-        def report_progress(block_num, block_size, total_size):
-            downloaded = block_num * block_size
+        def report_progress(downloaded, total_size):
             percent = min(100, (downloaded / total_size) * 100) if total_size > 0 else 0
             callback(percent, downloaded, total_size)
         
-        urlretrieve(url, dest, reporthook=report_progress)
+        download_file(url, dest, segments=self.DOWNLOAD_SEGMENTS,
+                      checksum=checksum, progress_callback=report_progress)
     
     def _extract_zip(self, zip_path: Path):
         """Extract zip file and find ffmpeg binary"""
@@ -199,7 +344,7 @@ class FFmpegHelper:
                     tar_ref.extract(member, self.ffmpeg_dir)
                     break
     
-    def ensure_ffmpeg(self) -> bool:
+    def ensure_ffmpeg(self, streaming=True) -> bool:
         """Ensure ffmpeg is available, download if necessary"""
         if self.check_ffmpeg():
             return True
@@ -210,7 +355,7 @@ class FFmpegHelper:
         try:
             response = input().strip().lower()
             if response == 'y':
-                return self.download_ffmpeg()
+                return self.download_ffmpeg(streaming=streaming)
             else:
                 print("\nPlease install FFmpeg manually:")
                 print("  Windows: Download from https://ffmpeg.org/download.html")
@@ -222,21 +367,114 @@ class FFmpegHelper:
             return False
 
 
+class FFmpegInstallation:
+    """
+    Resolved ffmpeg/ffprobe locations for this process.
+    
+    Versions and capabilities are probed with a subprocess the first time
+    they are asked for and then remembered.
+    """
+    
+    def __init__(self, ffmpeg: str, ffprobe: str, available: bool):
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self.available = available
+    
+    @staticmethod
+    def _run(cmd: list) -> str:
+        """Run a command and return its stdout, or '' if it fails"""
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True)
+            return result.stdout if result.returncode == 0 else ''
+        except Exception:
+            return ''
+    
+    @staticmethod
+    def _parse_table(output: str) -> FrozenSet[str]:
+        """Parse the names out of `ffmpeg -encoders`/`-muxers` style listings"""
+        names = set()
+        in_table = False
+        for line in output.splitlines():
+            if line.strip().startswith('--'):
+                in_table = True
+                continue
+            parts = line.split()
+            if in_table and len(parts) >= 2:
+                names.update(parts[1].split(','))
+        return frozenset(names)
+    
+    @cached_property
+    def version(self) -> Optional[str]:
+        """First line of `ffmpeg -version`"""
+        output = self._run([self.ffmpeg, '-version'])
+        return output.splitlines()[0] if output else None
+    
+    @cached_property
+    def ffprobe_version(self) -> Optional[str]:
+        """First line of `ffprobe -version`"""
+        output = self._run([self.ffprobe, '-version'])
+        return output.splitlines()[0] if output else None
+    
+    @cached_property
+    def encoders(self) -> FrozenSet[str]:
+        """Names of the encoders this ffmpeg build supports"""
+        return self._parse_table(self._run([self.ffmpeg, '-hide_banner', '-encoders']))
+    
+    @cached_property
+    def muxers(self) -> FrozenSet[str]:
+        """Names of the output formats this ffmpeg build supports"""
+        return self._parse_table(self._run([self.ffmpeg, '-hide_banner', '-muxers']))
+    
+    def has_encoder(self, name: str) -> bool:
+        """Check whether an encoder (e.g. 'libmp3lame', 'mov_text') is available"""
+        return name in self.encoders
+
+
+_installation: Optional[FFmpegInstallation] = None
+_installation_lock = threading.Lock()
+
+
+def get_ffmpeg_installation() -> FFmpegInstallation:
+    """Resolve ffmpeg once per process; later calls reuse the result"""
+    global _installation
+    with _installation_lock:
+        if _installation is None:
+            helper = FFmpegHelper()
+            _installation = FFmpegInstallation(
+                helper.get_ffmpeg_command(),
+                helper.get_ffprobe_command(),
+                helper.check_ffmpeg(),
+            )
+        return _installation
+
+
+def invalidate_ffmpeg_cache() -> None:
+    """Forget the cached resolution (e.g. after installing or removing ffmpeg)"""
+    global _installation
+    with _installation_lock:
+        _installation = None
+
+
 # Convenience functions
 def check_ffmpeg() -> bool:
     """Check if ffmpeg is available"""
-    helper = FFmpegHelper()
-    return helper.check_ffmpeg()
+    return get_ffmpeg_installation().available
 
 
 def get_ffmpeg_command() -> str:
     """Get the ffmpeg command to use"""
-    helper = FFmpegHelper()
-    return helper.get_ffmpeg_command()
+    return get_ffmpeg_installation().ffmpeg
+
+
+def get_ffprobe_command() -> str:
+    """Get the ffprobe command to use"""
+    return get_ffmpeg_installation().ffprobe
 
 
 def ensure_ffmpeg() -> bool:
     """Ensure ffmpeg is available, download if necessary"""
+    if check_ffmpeg():
+        return True
     helper = FFmpegHelper()
     return helper.ensure_ffmpeg()
 
@@ -245,7 +483,10 @@ if __name__ == "__main__":
     # Test the helper
     helper = FFmpegHelper()
     if helper.check_ffmpeg():
-        print(f"FFmpeg found at: {helper.get_ffmpeg_command()}")
+        installation = get_ffmpeg_installation()
+        print(f"FFmpeg found at: {installation.ffmpeg}")
+        print(f"  Version: {installation.version}")
+        print(f"  FFprobe: {installation.ffprobe} ({installation.ffprobe_version})")
     else:
         print("FFmpeg not found.")
         if helper.ensure_ffmpeg():
@@ -0,0 +1,295 @@
+"""Format planner: pick the cheapest acceptable format under size, bitrate and time limits"""
+
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+# Leading part of a yt-dlp codec string -> codec family
+CODEC_FAMILIES = {
+    'avc1': 'h264', 'avc3': 'h264', 'h264': 'h264',
+    'hev1': 'h265', 'hvc1': 'h265', 'h265': 'h265',
+    'vp9': 'vp9', 'vp09': 'vp9', 'vp8': 'vp8',
+    'av01': 'av1', 'av1': 'av1',
+    'mp4a': 'aac', 'aac': 'aac', 'opus': 'opus', 'vorbis': 'vorbis',
+    'mp3': 'mp3', 'flac': 'flac', 'ac-3': 'ac3', 'ec-3': 'eac3',
+}
+
+# Codecs each container takes with a plain stream copy (no remux to another container)
+CONTAINER_CODECS = {
+    'mp4': {'h264', 'h265', 'av1', 'aac', 'mp3', 'ac3', 'eac3'},
+    'webm': {'vp8', 'vp9', 'av1', 'opus', 'vorbis'},
+    'mkv': None,  # Anything goes
+    'm4a': {'aac', 'alac', 'ac3', 'eac3'},
+    'mp3': {'mp3'},
+    'opus': {'opus'},
+    'ogg': {'vorbis', 'opus', 'flac'},
+    'flac': {'flac'},
+}
+
+
+def codec_family(codec: Optional[str]) -> Optional[str]:
+    """Map "avc1.64001F" -> "h264", "mp4a.40.2" -> "aac"; None for 'none'"""
+    if not codec or codec == 'none':
+        return None
+    prefix = codec.split('.', 1)[0].lower()
+    return CODEC_FAMILIES.get(prefix, prefix)
+
+
+def estimate_size(fmt: Dict, duration: Optional[float]) -> Optional[int]:
+    """Size in bytes from filesize, filesize_approx or bitrate x duration"""
+    size = fmt.get('filesize') or fmt.get('filesize_approx')
+    if size:
+        return int(size)
+    if fmt.get('tbr') and duration:
+        return int(fmt['tbr'] * 1000 / 8 * duration)
+    return None
+
+
+class Constraints(NamedTuple):
+    """Limits and preferences for format planning (None means no limit)"""
+    max_bytes: Optional[int] = None
+    max_bitrate: Optional[float] = None  # kbit/s, audio and video combined
+    max_height: Optional[int] = None
+    max_seconds: Optional[float] = None  # Estimated download time
+    link_speed: Optional[float] = None  # bytes/s, used for the time estimate
+    prefer_codecs: Tuple[str, ...] = ()
+    container: Optional[str] = None
+
+    @property
+    def active(self) -> bool:
+        """Whether any limit or preference is set (link speed alone is not one)"""
+        return any(value not in (None, ()) for name, value in self._asdict().items() if name != 'link_speed')
+
+
+class Candidate(NamedTuple):
+    """A single muxed format, or a video-only + audio-only pair to merge"""
+    video: Optional[Dict]
+    audio: Optional[Dict]
+    size: Optional[int]
+    bitrate: Optional[float]
+    height: int
+    ext: str
+    codecs: Tuple[Optional[str], Optional[str]]
+
+    @property
+    def format_id(self) -> str:
+        parts = [f['format_id'] for f in (self.video, self.audio) if f]
+        return '+'.join(dict.fromkeys(parts))
+
+    @property
+    def merged(self) -> bool:
+        return bool(self.video and self.audio and self.video is not self.audio)
+
+    def describe(self) -> str:
+        size = f"{self.size / 1024 / 1024:.1f}MB" if self.size else '?MB'
+        bitrate = f"{self.bitrate:.0f}k" if self.bitrate else '?k'
+        resolution = f"{self.height}p" if self.height else 'audio'
+        codecs = '+'.join(c for c in self.codecs if c) or '?'
+        return f"{self.format_id:<12} {resolution:>6} {codecs:<10} {self.ext:<5} {size:>9} {bitrate:>7}"
+
+
+class Plan(NamedTuple):
+    """Outcome of planning: the choice plus every candidate considered"""
+    choice: Optional[Candidate]
+    accepted: List[Candidate]
+    rejected: List[Tuple[Candidate, str]]
+    constraints: Constraints
+    duration: Optional[float]
+
+
+def _merge_ext(video: Dict, audio: Dict, container: Optional[str]) -> str:
+    if container:
+        return container
+    if video.get('ext') == 'mp4' and audio.get('ext') == 'm4a':
+        return 'mp4'
+    if video.get('ext') == 'webm' and audio.get('ext') == 'webm':
+        return 'webm'
+    return 'mkv'
+
+
+def build_candidates(formats: Sequence[Dict], duration: Optional[float] = None,
+                     container: Optional[str] = None, audio_only: bool = False) -> List[Candidate]:
+    """All single formats and video+audio pairs worth considering"""
+    muxed, videos, audios = [], [], []
+    for fmt in formats:
+        vcodec, acodec = codec_family(fmt.get('vcodec')), codec_family(fmt.get('acodec'))
+        if fmt.get('format_id') is None or fmt.get('ext') in ('mhtml', None):
+            continue
+        if vcodec and acodec:
+            muxed.append(fmt)
+        elif vcodec:
+            videos.append(fmt)
+        elif acodec:
+            audios.append(fmt)
+
+    def candidate(video, audio, ext):
+        parts = [f for f in (video, audio) if f]
+        if video is audio:
+            parts = [video]
+        sizes = [estimate_size(f, duration) for f in parts]
+        bitrates = [f.get('tbr') for f in parts]
+        return Candidate(
+            video=video, audio=audio,
+            size=sum(sizes) if None not in sizes else None,
+            bitrate=sum(bitrates) if None not in bitrates else None,
+            height=(video or {}).get('height') or 0,
+            ext=ext,
+            codecs=(codec_family((video or {}).get('vcodec')), codec_family((audio or {}).get('acodec'))),
+        )
+
+    if audio_only:
+        return [candidate(None, a, a['ext']) for a in audios] + \
+               [candidate(None, m, m['ext']) for m in muxed if not videos and not audios]
+
+    candidates = [candidate(m, m, m['ext']) for m in muxed]
+    candidates += [candidate(v, a, _merge_ext(v, a, container)) for v in videos for a in audios]
+    return candidates
+
+
+def _rejection(candidate: Candidate, constraints: Constraints) -> Optional[str]:
+    """Why a candidate breaks the constraints, or None if it is acceptable"""
+    c = constraints
+    if c.max_height and candidate.height > c.max_height:
+        return f"height {candidate.height}p > {c.max_height}p"
+    if c.max_bytes and candidate.size and candidate.size > c.max_bytes:
+        return f"size {candidate.size / 1024 / 1024:.1f}MB > {c.max_bytes / 1024 / 1024:.1f}MB"
+    if c.max_bitrate and candidate.bitrate and candidate.bitrate > c.max_bitrate:
+        return f"bitrate {candidate.bitrate:.0f}k > {c.max_bitrate:.0f}k"
+    if c.max_seconds and c.link_speed and candidate.size:
+        seconds = candidate.size / c.link_speed
+        if seconds > c.max_seconds:
+            return f"~{seconds:.0f}s to download > {c.max_seconds:.0f}s"
+    if c.max_bytes and candidate.size is None:
+        return "size unknown"
+    return None
+
+
+def _needs_remux(candidate: Candidate, container: Optional[str]) -> bool:
+    """True if the streams can't simply be copied into the wanted container"""
+    target = container or candidate.ext
+    allowed = CONTAINER_CODECS.get(target)
+    if allowed is None:
+        return target not in CONTAINER_CODECS  # Unknown container: assume the worst
+    return any(codec and codec not in allowed for codec in candidate.codecs)
+
+
+def _score(candidate: Candidate, constraints: Constraints) -> tuple:
+    """Sort key: resolution, preferred codecs, no remux, audio quality, then fewest bytes"""
+    preferred = constraints.prefer_codecs
+    codec_rank = min((preferred.index(c) for c in candidate.codecs if c in preferred), default=len(preferred))
+    audio = candidate.audio or {}
+    audio_bitrate = audio.get('abr') or (audio.get('tbr') if candidate.video is None else 0) or 0
+    return (
+        -candidate.height,
+        codec_rank,
+        _needs_remux(candidate, constraints.container),
+        -audio_bitrate,
+        candidate.size if candidate.size is not None else float('inf'),
+    )
+
+
+def plan_formats(formats: Sequence[Dict], constraints: Constraints = Constraints(),
+                 duration: Optional[float] = None, audio_only: bool = False) -> Plan:
+    """
+    Pick a format for the given constraints.
+
+    Candidates over any limit are rejected. Of the rest, the highest
+    resolution wins; within a resolution, preferred codecs and streams that
+    fit the container without remuxing come first, then the better audio,
+    then the smallest download.
+    """
+    accepted, rejected = [], []
+    for candidate in build_candidates(formats, duration, constraints.container, audio_only):
+        reason = _rejection(candidate, constraints)
+        if reason:
+            rejected.append((candidate, reason))
+        else:
+            accepted.append(candidate)
+
+    accepted.sort(key=lambda c: _score(c, constraints))
+    return Plan(accepted[0] if accepted else None, accepted, rejected, constraints, duration)
+
+
+def explain_plan(plan: Plan, limit: int = 10) -> str:
+    """Human-readable account of a plan for --plan-formats"""
+    c = plan.constraints
+    limits = []
+    if c.max_bytes:
+        limits.append(f"size <= {c.max_bytes / 1024 / 1024:.0f}MB")
+    if c.max_bitrate:
+        limits.append(f"bitrate <= {c.max_bitrate:.0f}k")
+    if c.max_height:
+        limits.append(f"height <= {c.max_height}p")
+    if c.max_seconds:
+        speed = f" at {c.link_speed / 1024 / 1024:.1f}MB/s" if c.link_speed else " (no link speed known, ignored)"
+        limits.append(f"download <= {c.max_seconds:.0f}s{speed}")
+    if c.prefer_codecs:
+        limits.append(f"prefer {','.join(c.prefer_codecs)}")
+    if c.container:
+        limits.append(f"container {c.container}")
+
+    lines = [f"Constraints: {', '.join(limits) or 'none'}"]
+    if plan.choice:
+        choice = plan.choice
+        how = 'merge' if choice.merged else 'single file'
+        remux = ', needs remux' if _needs_remux(choice, c.container) else ''
+        lines.append(f"Chosen:   {choice.describe()}  ({how}{remux})")
+    else:
+        lines.append("Chosen:   nothing fits the constraints")
+
+    lines.append(f"\nAcceptable ({len(plan.accepted)}), best first:")
+    lines += [f"  {candidate.describe()}" for candidate in plan.accepted[:limit]]
+    if len(plan.accepted) > limit:
+        lines.append(f"  ... {len(plan.accepted) - limit} more")
+
+    lines.append(f"\nRejected ({len(plan.rejected)}):")
+    lines += [f"  {candidate.describe()}  {reason}" for candidate, reason in plan.rejected[:limit]]
+    if len(plan.rejected) > limit:
+        lines.append(f"  ... {len(plan.rejected) - limit} more")
+    return '\n'.join(lines)
+
+
+# Fields a merged format takes from its video and its audio stream, as yt-dlp's own merge does
+MERGED_VIDEO_FIELDS = ('width', 'height', 'resolution', 'fps', 'dynamic_range', 'vcodec', 'vbr',
+                       'stretched_ratio', 'aspect_ratio')
+MERGED_AUDIO_FIELDS = ('acodec', 'abr', 'asr', 'audio_channels')
+
+
+def candidate_to_selection(candidate: Candidate) -> Dict:
+    """Format dict for yt-dlp's callable format selector"""
+    if not candidate.merged:
+        return candidate.video or candidate.audio
+    video, audio = candidate.video, candidate.audio
+    both = (video, audio)
+    selection = {
+        'format': '+'.join(f['format'] for f in both if f.get('format')),
+        'format_id': candidate.format_id,
+        'ext': candidate.ext,
+        'requested_formats': [video, audio],
+        'protocol': f"{video.get('protocol')}+{audio.get('protocol')}",
+        'format_note': '+'.join(f['format_note'] for f in both if f.get('format_note')) or None,
+        'filesize_approx': sum(f.get('filesize') or f.get('filesize_approx') or 0 for f in both) or None,
+        'tbr': sum(f.get('tbr') or f.get('vbr') or f.get('abr') or 0 for f in both),
+    }
+    selection.update({field: video.get(field) for field in MERGED_VIDEO_FIELDS})
+    selection.update({field: audio.get(field) for field in MERGED_AUDIO_FIELDS})
+    if not selection['resolution'] and video.get('width') and video.get('height'):
+        selection['resolution'] = f"{video['width']}x{video['height']}"
+    return selection
+
+
+def make_format_selector(get_constraints: Callable[[], Constraints], audio_only: bool = False,
+                         on_plan: Optional[Callable[[Plan], None]] = None) -> Callable[[Dict], Iterator[Dict]]:
+    """
+    Build a callable for yt-dlp's 'format' option that plans each video.
+
+    Constraints are fetched per video so a link speed measured on earlier
+    downloads applies to later playlist entries.
+    """
+    def selector(ctx: Dict) -> Iterator[Dict]:
+        duration = (ctx.get('info_dict') or {}).get('duration')
+        plan = plan_formats(ctx.get('formats') or [], get_constraints(), duration, audio_only)
+        if on_plan:
+            on_plan(plan)
+        if plan.choice:
+            yield candidate_to_selection(plan.choice)
+
+    return selector
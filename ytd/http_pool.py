@@ -0,0 +1,222 @@
+"""Pooled keep-alive HTTP connections for the requests ytd makes itself"""
+
+import http.client
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+from urllib.request import getproxies, proxy_bypass
+
+DEFAULT_POOL_SIZE = 4  # Idle connections kept per host
+DEFAULT_TIMEOUT = 30.0
+MAX_REDIRECTS = 5
+USER_AGENT = 'ytd'
+
+REDIRECT_CODES = (301, 302, 303, 307, 308)
+# Raised when a kept-alive connection turns out to have been closed by the server
+STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, http.client.BadStatusLine,
+                           ConnectionResetError, BrokenPipeError, ConnectionAbortedError)
+
+_Key = Tuple[str, str, Optional[str]]  # (scheme, host:port, proxy)
+
+
+class HTTPError(OSError):
+    """Response with an error status (message format matches urllib's)"""
+
+    def __init__(self, url: str, status: int, reason: str, headers=None):
+        super().__init__(f'HTTP Error {status}: {reason}')
+        self.url = url
+        self.status = self.code = status
+        self.reason = reason
+        self.headers = headers
+
+
+class PooledResponse:
+    """
+    An HTTP response whose connection goes back to the pool once it is done.
+
+    A response read to the end (or one without a body) returns its
+    connection for reuse on close; one closed early closes the connection,
+    as the rest of the body would otherwise arrive as the next response.
+    """
+
+    def __init__(self, pool: 'HTTPPool', key: _Key, conn: http.client.HTTPConnection,
+                 response: http.client.HTTPResponse, url: str):
+        self._pool = pool
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self.url = url
+        self.status = response.status
+        self.reason = response.reason
+        self.headers = response.headers
+
+    def read(self, amt: Optional[int] = None) -> bytes:
+        return self._response.read(amt)
+
+    def getheader(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        return self._response.getheader(name, default)
+
+    def close(self) -> None:
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        # HEAD and 204/304 responses have no body and never read to the end
+        finished = self._response.isclosed() or self._response.length == 0
+        reusable = finished and not self._response.will_close
+        self._response.close()
+        if reusable:
+            self._pool._release(self._key, conn)
+        else:
+            conn.close()
+
+    def __enter__(self) -> 'PooledResponse':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class HTTPPool:
+    """
+    Keep-alive HTTP(S) connections, reused per host across threads.
+
+    Each request takes an idle connection to its host from the pool (or
+    opens one) and returns it once the response has been read, so a batch
+    of requests to one host pays for the TCP and TLS handshakes once per
+    concurrent worker instead of once per request. Up to pool_size idle
+    connections are kept per host; extra ones are closed when released.
+    Proxies from the environment are honoured as urllib would.
+    """
+
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, timeout: float = DEFAULT_TIMEOUT,
+                 headers: Optional[Dict[str, str]] = None):
+        self.pool_size = max(0, pool_size)
+        self.timeout = timeout
+        self.headers = {'User-Agent': USER_AGENT, **(headers or {})}
+        self._idle: Dict[_Key, Deque[http.client.HTTPConnection]] = {}
+        self.lock = threading.Lock()
+
+    def _key(self, scheme: str, netloc: str) -> _Key:
+        host = netloc.rsplit('@', 1)[-1]
+        proxy = getproxies().get(scheme)
+        if proxy and proxy_bypass(host.split(':')[0]):
+            proxy = None
+        return scheme, host, proxy
+
+    def _connect(self, key: _Key, timeout: float) -> http.client.HTTPConnection:
+        scheme, host, proxy = key
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        if not proxy:
+            return cls(host, timeout=timeout)
+        proxy_host = urlsplit(proxy if '://' in proxy else f'http://{proxy}').netloc
+        if scheme == 'https':
+            conn = cls(proxy_host, timeout=timeout)
+            conn.set_tunnel(host)
+            return conn
+        return http.client.HTTPConnection(proxy_host, timeout=timeout)
+
+    def _acquire(self, key: _Key, timeout: float) -> Tuple[http.client.HTTPConnection, bool]:
+        """An idle connection for key (reused=True) or a new one"""
+        with self.lock:
+            idle = self._idle.get(key)
+            conn = idle.pop() if idle else None
+        if conn is None:
+            return self._connect(key, timeout), False
+        conn.timeout = timeout
+        if conn.sock is not None:
+            conn.sock.settimeout(timeout)
+        return conn, True
+
+    def _release(self, key: _Key, conn: http.client.HTTPConnection) -> None:
+        with self.lock:
+            idle = self._idle.setdefault(key, deque())
+            if len(idle) < self.pool_size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def _send(self, method: str, url: str, headers: Dict[str, str], body: Optional[bytes],
+              timeout: float) -> PooledResponse:
+        parts = urlsplit(url)
+        if parts.scheme not in ('http', 'https'):
+            raise ValueError(f'Unsupported URL scheme: {url}')
+        key = self._key(parts.scheme, parts.netloc)
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+        if key[2] and parts.scheme == 'http':
+            target = url  # Plain HTTP proxies take the absolute URL
+
+        while True:
+            conn, reused = self._acquire(key, timeout)
+            try:
+                conn.request(method, target, body=body, headers={**self.headers, **headers})
+                response = conn.getresponse()
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                if reused:
+                    continue  # The server dropped an idle connection; retry on a fresh one
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            return PooledResponse(self, key, conn, response, url)
+
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None,
+                body: Optional[bytes] = None, timeout: Optional[float] = None) -> PooledResponse:
+        """
+        Send a request, following redirects.
+
+        Raises:
+            HTTPError: for 4xx/5xx responses (the connection is kept)
+        """
+        timeout = self.timeout if timeout is None else timeout
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self._send(method, url, headers or {}, body, timeout)
+            location = response.getheader('Location')
+            if response.status in REDIRECT_CODES and location:
+                with response:
+                    response.read()
+                url = urljoin(url, location)
+                if response.status == 303 and method != 'HEAD':
+                    method, body = 'GET', None
+                continue
+            if response.status >= 400:
+                with response:
+                    response.read()
+                raise HTTPError(url, response.status, response.reason, response.headers)
+            return response
+        raise OSError(f'Too many redirects: {url}')
+
+    def get(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: Optional[float] = None) -> bytes:
+        """Body of a GET request"""
+        with self.request('GET', url, headers, timeout=timeout) as response:
+            return response.read()
+
+    def close(self) -> None:
+        """Close all idle connections"""
+        with self.lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for conn in connections:
+                conn.close()
+
+    def __enter__(self) -> 'HTTPPool':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+_default_pool: Optional[HTTPPool] = None
+_default_lock = threading.Lock()
+
+
+def default_pool() -> HTTPPool:
+    """Pool shared by ytd's own downloads (ffmpeg bootstrap, ranged downloads)"""
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = HTTPPool()
+        return _default_pool
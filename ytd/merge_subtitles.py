@@ -7,12 +7,63 @@ import argparse
 import subprocess
 import sys
 from pathlib import Path
-import shutil
-import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 try:
     from .ffmpeg_helper import ensure_ffmpeg, get_ffmpeg_command
+    from .pairing import pair_videos, subtitle_language, SubtitleFile
+    from .probe import ProbeCache, probe_file
 except ImportError:
     from ffmpeg_helper import ensure_ffmpeg, get_ffmpeg_command
+    from pairing import pair_videos, subtitle_language, SubtitleFile
+    from probe import ProbeCache, probe_file
+
+
+# ISO 639-1 tags used in subtitle filenames -> (ISO 639-2 code for ffmpeg, display name)
+LANGUAGES = {
+    'ar': ('ara', 'Arabic'), 'bg': ('bul', 'Bulgarian'), 'bs': ('bos', 'Bosnian'),
+    'ca': ('cat', 'Catalan'), 'cs': ('cze', 'Czech'), 'da': ('dan', 'Danish'),
+    'de': ('ger', 'German'), 'el': ('gre', 'Greek'), 'en': ('eng', 'English'),
+    'es': ('spa', 'Spanish'), 'et': ('est', 'Estonian'), 'fa': ('per', 'Persian'),
+    'fi': ('fin', 'Finnish'), 'fr': ('fre', 'French'), 'he': ('heb', 'Hebrew'),
+    'hi': ('hin', 'Hindi'), 'hr': ('hrv', 'Croatian'), 'hu': ('hun', 'Hungarian'),
+    'id': ('ind', 'Indonesian'), 'it': ('ita', 'Italian'), 'ja': ('jpn', 'Japanese'),
+    'ko': ('kor', 'Korean'), 'lt': ('lit', 'Lithuanian'), 'lv': ('lav', 'Latvian'),
+    'mk': ('mac', 'Macedonian'), 'ms': ('may', 'Malay'), 'nl': ('dut', 'Dutch'),
+    'no': ('nor', 'Norwegian'), 'pl': ('pol', 'Polish'), 'pt': ('por', 'Portuguese'),
+    'ro': ('rum', 'Romanian'), 'ru': ('rus', 'Russian'), 'sk': ('slo', 'Slovak'),
+    'sl': ('slv', 'Slovenian'), 'sr': ('srp', 'Serbian'), 'sv': ('swe', 'Swedish'),
+    'th': ('tha', 'Thai'), 'tr': ('tur', 'Turkish'), 'uk': ('ukr', 'Ukrainian'),
+    'vi': ('vie', 'Vietnamese'), 'zh': ('chi', 'Chinese'),
+}
+
+
+def track_metadata(lang):
+    """
+    Map a filename language tag to ffmpeg (language, title) metadata.
+    
+    "en" -> ("eng", "English"), "pt-BR" -> ("por", "Portuguese (BR)").
+    Unknown tags are passed through as the title with no language code.
+    """
+    primary, _, variant = lang.partition('-')
+    if primary.lower() not in LANGUAGES:
+        return None, lang
+    
+    code, name = LANGUAGES[primary.lower()]
+    return code, f"{name} ({variant})" if variant else name
+
+
+def _subtitle_tracks(video_path, subtitle_path):
+    """Normalise one or several subtitle paths into SubtitleFile tracks"""
+    if isinstance(subtitle_path, (str, Path, SubtitleFile)):
+        subtitle_path = [subtitle_path]
+    
+    tracks = []
+    for sub in subtitle_path:
+        if not isinstance(sub, SubtitleFile):
+            sub = SubtitleFile(Path(sub), subtitle_language(video_path, sub))
+        tracks.append(sub)
+    return tracks
 
 
 def check_ffmpeg():
@@ -20,33 +71,134 @@ def check_ffmpeg():
     return ensure_ffmpeg()
 
 
+# Subtitle codec each output container accepts
+SUBTITLE_CODECS = {
+    '.mp4': 'mov_text',
+    '.m4v': 'mov_text',
+    '.mov': 'mov_text',
+    '.mkv': 'srt',
+    '.webm': 'webvtt',  # WebM only allows WebVTT subtitles
+}
+
+
 def get_video_info(video_path):
-    """Get video information using ffprobe"""
-    try:
+    """Get video information using ffprobe (cached per file)"""
+    return probe_file(video_path)
+
+
+def needs_probe(output_path):
+    """Whether choosing a subtitle codec for output_path requires probing the video"""
+    return Path(output_path).suffix.lower() not in SUBTITLE_CODECS
+
+
+def select_subtitle_codec(output_path, video_info=None):
+    """
+    Pick the subtitle codec for an output container.
+    
+    The output extension decides the muxer; only for unknown extensions is
+    the container reported by ffprobe consulted.
+    """
+    codec = SUBTITLE_CODECS.get(Path(output_path).suffix.lower())
+    if codec:
+        return codec
+    
+    format_name = ((video_info or {}).get('format') or {}).get('format_name', '')
+    if 'matroska' in format_name:
+        return 'srt'
+    return 'mov_text'  # Default
+
+
+def build_merge_command(video_path, subtitle_path, output_path,
+                        subtitle_track_name=None, soft_subs=True,
+                        subtitle_codec='mov_text', force=False, video_info=None):
+    """
+    Build the ffmpeg command line for merging subtitles into a video.
+    
+    subtitle_path may be a single file or a list of files; every soft
+    subtitle track is muxed in the same ffmpeg pass, with language and
+    title metadata taken from video.<lang>.ext filenames.
+    """
+    tracks = _subtitle_tracks(video_path, subtitle_path)
+    
+    # Auto-detect subtitle codec based on container
+    if subtitle_codec == 'auto':
+        if video_info is None and needs_probe(output_path):
+            video_info = get_video_info(video_path)
+        subtitle_codec = select_subtitle_codec(output_path, video_info)
+    
+    if soft_subs:
+        # Embed subtitles as separate tracks (soft subs)
+        cmd = [get_ffmpeg_command(), '-i', str(video_path)]
+        for track in tracks:
+            cmd.extend(['-i', str(track.path)])
+        
+        cmd.extend([
+            '-c:v', 'copy',  # Copy video codec
+            '-c:a', 'copy',  # Copy audio codec
+            '-c:s', subtitle_codec,  # Subtitle codec
+            '-map', '0:v',   # Map video from first input
+            '-map', '0:a?',  # Map audio from first input (if exists)
+        ])
+        
+        # Map first stream from each subtitle input
+        for i in range(len(tracks)):
+            cmd.extend(['-map', f'{i + 1}:0'])
+        
+        # Add metadata for subtitle tracks
+        for i, track in enumerate(tracks):
+            language, title = track_metadata(track.lang) if track.lang else (None, None)
+            if subtitle_track_name and len(tracks) == 1:
+                title = subtitle_track_name
+                language = language or subtitle_track_name[:3].lower()
+            
+            if title:
+                cmd.extend([f'-metadata:s:s:{i}', f'title={title}'])
+            if language:
+                cmd.extend([f'-metadata:s:s:{i}', f'language={language}'])
+            
+            # First track is the default subtitle track
+            cmd.extend([f'-disposition:s:{i}', 'default' if i == 0 else '0'])
+        
+    else:
+        # Burn subtitles into video (hard subs)
+        # Use subtitles filter to burn them in
+        escaped_path = str(tracks[0].path).replace('\\', '\\\\').replace(':', '\\:')
+        subtitle_filter = f"subtitles='{escaped_path}'"
+        
         cmd = [
-            get_ffmpeg_command().replace('ffmpeg', 'ffprobe'),
-            '-v', 'quiet',
-            '-print_format', 'json',
-            '-show_streams',
-            str(video_path)
+            get_ffmpeg_command(),
+            '-i', str(video_path),
+            '-vf', subtitle_filter,
+            '-c:a', 'copy',  # Copy audio codec
         ]
+    
+    # Add output file
+    if force:
+        cmd.extend(['-y'])  # Overwrite without asking
+    
+    cmd.append(str(output_path))
+    return cmd
+
+
+def run_ffmpeg(cmd):
+    """Run an ffmpeg command, returning (success, error output)"""
+    try:
         result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode == 0:
-            return json.loads(result.stdout)
-        return None
-    except Exception:
-        return None
+        return result.returncode == 0, result.stderr
+    except Exception as e:
+        return False, str(e)
 
 
 def merge_subtitles(video_path, subtitle_path, output_path=None, 
                    subtitle_track_name=None, soft_subs=True, 
                    subtitle_codec='mov_text', force=False):
     """
-    Merge subtitle file with video file.
+    Merge subtitle file(s) with video file.
     
     Args:
         video_path: Path to video file
-        subtitle_path: Path to subtitle file (SRT/VTT)
+        subtitle_path: Path to subtitle file (SRT/VTT), or a list of them to
+                       mux several language tracks in one pass
         output_path: Output file path (default: video_with_subs.ext)
         subtitle_track_name: Name for subtitle track (e.g., "English")
         soft_subs: If True, embeds as soft subtitles (can be turned on/off)
@@ -55,16 +207,21 @@ def merge_subtitles(video_path, subtitle_path, output_path=None,
         force: Overwrite output file if it exists
     """
     video_path = Path(video_path)
-    subtitle_path = Path(subtitle_path)
+    tracks = _subtitle_tracks(video_path, subtitle_path)
     
     # Validate inputs
     if not video_path.exists():
         print(f"Error: Video file not found: {video_path}")
         return False
     
-    if not subtitle_path.exists():
-        print(f"Error: Subtitle file not found: {subtitle_path}")
-        return False
+    for track in tracks:
+        if not track.path.exists():
+            print(f"Error: Subtitle file not found: {track.path}")
+            return False
+    
+    if not soft_subs and len(tracks) > 1:
+        print(f"Warning: Only one subtitle file can be burned in, using {tracks[0].path.name}")
+        tracks = tracks[:1]
     
     # Determine output path
     if output_path is None:
@@ -78,148 +235,170 @@ def merge_subtitles(video_path, subtitle_path, output_path=None,
         print("Use --force to overwrite")
         return False
     
-    # Auto-detect subtitle codec based on container
-    if subtitle_codec == 'auto':
-        if output_path.suffix.lower() == '.mp4':
-            subtitle_codec = 'mov_text'
-        elif output_path.suffix.lower() in ['.mkv', '.webm']:
-            subtitle_codec = 'srt'
-        else:
-            subtitle_codec = 'mov_text'  # Default
-    
     print(f"Merging subtitles...")
     print(f"  Video: {video_path.name}")
-    print(f"  Subtitles: {subtitle_path.name}")
+    for track in tracks:
+        print(f"  Subtitles: {track.path.name}" + (f" ({track.lang})" if track.lang else ''))
     print(f"  Output: {output_path.name}")
     print(f"  Mode: {'Soft subtitles (can be toggled)' if soft_subs else 'Hard subtitles (burned in)'}")
     
-    if soft_subs:
-        # Embed subtitles as a separate track (soft subs)
-        cmd = [
-            get_ffmpeg_command(),
-            '-i', str(video_path),
-            '-i', str(subtitle_path),
-            '-c:v', 'copy',  # Copy video codec
-            '-c:a', 'copy',  # Copy audio codec
-            '-c:s', subtitle_codec,  # Subtitle codec
-            '-map', '0:v',   # Map video from first input
-            '-map', '0:a?',  # Map audio from first input (if exists)
-            '-map', '1:0',   # Map first stream from second input (subtitle)
-        ]
+    cmd = build_merge_command(video_path, tracks, output_path,
+                              subtitle_track_name, soft_subs, subtitle_codec, force)
+    
+    # Execute ffmpeg
+    print("\nRunning ffmpeg...")
+    success, error_output = run_ffmpeg(cmd)
+    
+    if success:
+        print(f"\n✅ Successfully created: {output_path}")
         
-        # Add metadata for subtitle track
-        if subtitle_track_name:
-            cmd.extend(['-metadata:s:s:0', f'title={subtitle_track_name}'])
-            cmd.extend(['-metadata:s:s:0', f'language={subtitle_track_name[:3].lower()}'])
+        # Get file sizes for comparison
+        original_size = video_path.stat().st_size / (1024 * 1024)  # MB
+        output_size = output_path.stat().st_size / (1024 * 1024)  # MB
         
-        # Set default subtitle track
-        cmd.extend(['-disposition:s:0', 'default'])
+        print(f"\nFile sizes:")
+        print(f"  Original: {original_size:.1f} MB")
+        print(f"  Output: {output_size:.1f} MB")
         
-    else:
-        # Burn subtitles into video (hard subs)
-        # Use subtitles filter to burn them in
-        subtitle_filter = f"subtitles='{str(subtitle_path).replace('\\', '\\\\').replace(':', '\\:')}'"
+        if soft_subs:
+            print("\n💡 Tip: The subtitles are embedded as a soft track.")
+            print("   Most players will show them automatically.")
+            print("   You can turn them on/off in your video player.")
+        else:
+            print("\n💡 Note: The subtitles are permanently burned into the video.")
         
-        cmd = [
-            get_ffmpeg_command(),
-            '-i', str(video_path),
-            '-vf', subtitle_filter,
-            '-c:a', 'copy',  # Copy audio codec
-        ]
+        return True
+    else:
+        print(f"\n❌ Error merging files:")
+        print(error_output)
+        return False
+
+
+def pick_subtitle(subtitles):
+    """
+    Pick the subtitle to merge from a video's subtitle files.
     
-    # Add output file
-    if force:
-        cmd.extend(['-y'])  # Overwrite without asking
+    Prefers language-tagged files (video.en.srt) over untagged ones, and
+    SRT over VTT. Other formats (ASS/SSA) are not merged.
+    """
+    candidates = [sub for sub in subtitles if sub.path.suffix.lower() in ('.srt', '.vtt')]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda sub: (sub.lang is None, sub.path.suffix.lower() != '.srt'))
+
+
+def pick_all_subtitles(subtitles):
+    """Pick one SRT/VTT file per language, preferring SRT, for multi-track muxing"""
+    by_lang = {}
+    for sub in sorted(subtitles, key=lambda sub: sub.path.suffix.lower() != '.srt'):
+        if sub.path.suffix.lower() in ('.srt', '.vtt'):
+            by_lang.setdefault(sub.lang, sub)
     
-    cmd.append(str(output_path))
+    # Language-tagged tracks first, in name order
+    return sorted(by_lang.values(), key=lambda sub: (sub.lang is None, sub.lang or ''))
+
+
+def _merge_job(video_file, subtitles, output_path, soft_subs, subtitle_codec, force, video_info):
+    """Run one batch merge without printing, returning (success, error, seconds)"""
+    started = time.perf_counter()
+    if output_path.exists() and not force:
+        return False, f"Output file already exists: {output_path.name}", 0.0
     
-    # Execute ffmpeg
-    try:
-        print("\nRunning ffmpeg...")
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        
-        if result.returncode == 0:
-            print(f"\n✅ Successfully created: {output_path}")
-            
-            # Get file sizes for comparison
-            original_size = video_path.stat().st_size / (1024 * 1024)  # MB
-            output_size = output_path.stat().st_size / (1024 * 1024)  # MB
-            
-            print(f"\nFile sizes:")
-            print(f"  Original: {original_size:.1f} MB")
-            print(f"  Output: {output_size:.1f} MB")
-            
-            if soft_subs:
-                print("\n💡 Tip: The subtitles are embedded as a soft track.")
-                print("   Most players will show them automatically.")
-                print("   You can turn them on/off in your video player.")
-            else:
-                print("\n💡 Note: The subtitles are permanently burned into the video.")
-            
-            return True
-        else:
-            print(f"\n❌ Error merging files:")
-            print(result.stderr)
-            return False
-            
-    except Exception as e:
-        print(f"\n❌ Error running ffmpeg: {e}")
-        return False
+    cmd = build_merge_command(video_file, subtitles, output_path,
+                              soft_subs=soft_subs, subtitle_codec=subtitle_codec, force=force,
+                              video_info=video_info)
+    success, error_output = run_ffmpeg(cmd)
+    return success, error_output, time.perf_counter() - started
 
 
-def batch_merge(directory, pattern="*.mp4", soft_subs=True, force=False):
+def batch_merge(directory, pattern="*.mp4", soft_subs=True, force=False,
+                jobs=1, subtitle_codec='auto', all_subs=False, probe_cache=None):
     """
     Merge all videos with matching subtitle files in a directory.
     
     Looks for subtitle files with the same base name as videos.
     E.g., video.mp4 + video.en.srt or video.srt
+    
+    Stream-copy muxing is I/O bound, so up to `jobs` ffmpeg processes run
+    at once. Results are still reported in directory order. With all_subs,
+    every language found is muxed into the output in a single pass.
+    
+    Videos that need ffprobe for codec selection are probed up front in
+    parallel through probe_cache (a ProbeCache, optionally disk-backed),
+    so repeated runs over the same library don't re-probe unchanged files.
     """
     directory = Path(directory)
     if not directory.exists():
         print(f"Error: Directory not found: {directory}")
         return
     
-    videos = list(directory.glob(pattern))
-    if not videos:
+    pairs = pair_videos(directory, pattern)
+    if not pairs:
         print(f"No videos found matching pattern: {pattern}")
         return
     
-    print(f"Found {len(videos)} video(s) in {directory}")
+    print(f"Found {len(pairs)} video(s) in {directory}")
     
-    merged_count = 0
-    for video_file in videos:
-        base_name = video_file.stem
-        
-        # Look for matching subtitle files
-        subtitle_patterns = [
-            f"{base_name}.*.srt",
-            f"{base_name}.*.vtt",
-            f"{base_name}.srt",
-            f"{base_name}.vtt",
-        ]
+    tasks = []
+    for video_file, subtitles in pairs:
+        if all_subs and soft_subs:
+            selected = pick_all_subtitles(subtitles)
+        else:
+            selected = [sub for sub in [pick_subtitle(subtitles)] if sub]
         
-        subtitle_file = None
-        for pattern in subtitle_patterns:
-            matches = list(directory.glob(pattern))
-            if matches:
-                subtitle_file = matches[0]
-                break
+        if selected:
+            output_path = directory / f"{video_file.stem}_merged{video_file.suffix}"
+            tasks.append((video_file, selected, output_path))
+        else:
+            print(f"Skipping {video_file.name} - no matching subtitle found")
+    
+    if not tasks:
+        print("No videos with matching subtitles to merge")
+        return
+    
+    jobs = max(1, min(jobs, len(tasks)))
+    
+    video_infos = {}
+    if subtitle_codec == 'auto':
+        probe_cache = probe_cache or ProbeCache()
+        to_probe = [video_file for video_file, _, output_path in tasks if needs_probe(output_path)]
+        if to_probe:
+            video_infos = probe_cache.probe_many(to_probe, jobs=jobs)
+            probe_cache.save()
+    print(f"\nMerging {len(tasks)} video(s) with {jobs} parallel job(s)...")
+    
+    merged_count = 0
+    busy_time = 0.0
+    bytes_written = 0
+    started = time.perf_counter()
+    
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(_merge_job, video_file, selected, output_path,
+                                   soft_subs, subtitle_codec, force, video_infos.get(video_file))
+                   for video_file, selected, output_path in tasks]
         
-        if subtitle_file:
-            print(f"\n{'='*60}")
-            print(f"Processing: {video_file.name}")
-            print(f"Found subtitle: {subtitle_file.name}")
+        # Report in submission order; later jobs keep running meanwhile
+        for i, ((video_file, selected, output_path), future) in enumerate(zip(tasks, futures), 1):
+            success, error_output, elapsed = future.result()
+            busy_time += elapsed
+            prefix = f"[{i}/{len(tasks)}]"
+            subtitle_names = ', '.join(sub.path.name for sub in selected)
             
-            output_path = directory / f"{base_name}_merged{video_file.suffix}"
-            
-            if merge_subtitles(video_file, subtitle_file, output_path, 
-                             soft_subs=soft_subs, force=force):
+            if success:
                 merged_count += 1
-        else:
-            print(f"\nSkipping {video_file.name} - no matching subtitle found")
+                bytes_written += output_path.stat().st_size
+                print(f"{prefix} ✅ {video_file.name} + {subtitle_names} ({elapsed:.1f}s)")
+            else:
+                print(f"{prefix} ❌ {video_file.name} + {subtitle_names}")
+                if error_output:
+                    print(error_output.strip())
     
+    wall_time = time.perf_counter() - started
     print(f"\n{'='*60}")
-    print(f"✅ Successfully merged {merged_count} video(s)")
+    print(f"✅ Successfully merged {merged_count} of {len(tasks)} video(s)")
+    print(f"   Wall time: {wall_time:.1f}s, ffmpeg time: {busy_time:.1f}s "
+          f"({busy_time / wall_time if wall_time else 0:.1f}x parallelism)")
+    print(f"   Written: {bytes_written / (1024 * 1024):.1f} MB")
 
 
 def main():
@@ -240,14 +419,24 @@ Examples:
   # Batch merge all videos in directory
   %(prog)s --batch downloads/
   
+  # Batch merge running 4 ffmpeg processes at once
+  %(prog)s --batch downloads/ --jobs 4
+  
   # Merge with subtitle track name
   %(prog)s video.mp4 english.srt --subtitle-name "English"
+  
+  # Mux several languages in one pass (language taken from video.<lang>.srt)
+  %(prog)s video.mp4 video.en.srt video.hr.srt video.de.srt
+  
+  # Batch merge every available language per video
+  %(prog)s --batch downloads/ --all-subs
         """
     )
     
     # Positional arguments for single file mode
     parser.add_argument('video', nargs='?', help='Video file path')
-    parser.add_argument('subtitle', nargs='?', help='Subtitle file path (SRT/VTT)')
+    parser.add_argument('subtitle', nargs='*',
+                       help='Subtitle file path(s) (SRT/VTT); several files are muxed as separate tracks')
     
     # Output options
     parser.add_argument('-o', '--output', help='Output file path')
@@ -259,7 +448,7 @@ Examples:
                        help='Burn subtitles into video (permanent)')
     parser.add_argument('--subtitle-name', help='Name for subtitle track (e.g., "English")')
     parser.add_argument('--subtitle-codec', default='auto',
-                       choices=['auto', 'mov_text', 'srt', 'ass'],
+                       choices=['auto', 'mov_text', 'srt', 'webvtt', 'ass'],
                        help='Subtitle codec (auto-detected by default)')
     
     # Batch mode
@@ -267,6 +456,12 @@ Examples:
                        help='Batch process all videos in directory')
     parser.add_argument('--pattern', default='*.mp4',
                        help='File pattern for batch mode (default: *.mp4)')
+    parser.add_argument('--all-subs', action='store_true',
+                       help='In batch mode, mux every subtitle language found instead of just one')
+    parser.add_argument('--probe-cache', metavar='FILE',
+                       help='Keep ffprobe results in FILE between batch runs')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                       help='Number of ffmpeg processes to run at once in batch mode (default: 1)')
     
     args = parser.parse_args()
     
@@ -277,7 +472,10 @@ Examples:
     # Batch mode
     if args.batch:
         batch_merge(args.batch, args.pattern, 
-                   soft_subs=not args.hard_subs, force=args.force)
+                   soft_subs=not args.hard_subs, force=args.force,
+                   jobs=args.jobs, subtitle_codec=args.subtitle_codec,
+                   all_subs=args.all_subs,
+                   probe_cache=ProbeCache(args.probe_cache) if args.probe_cache else None)
         return 0
     
     # Single file mode
@@ -0,0 +1,84 @@
+"""Match video files with their subtitle files in a single directory scan"""
+
+import fnmatch
+import os
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+VIDEO_EXTENSIONS = {'.mp4', '.mkv', '.avi', '.mov', '.webm'}
+SUBTITLE_EXTENSIONS = {'.vtt', '.srt', '.ass', '.ssa'}
+
+
+class SubtitleFile(NamedTuple):
+    """A subtitle file and the language tag from its name (video.<lang>.vtt)"""
+    path: Path
+    lang: Optional[str]
+
+
+def subtitle_language(video_path: Path, subtitle_path: Path) -> Optional[str]:
+    """Language tag of a subtitle named after its video ("Talk.en-US.vtt" -> "en-US")"""
+    video_stem = Path(video_path).stem
+    subtitle_stem = Path(subtitle_path).stem
+    if subtitle_stem.startswith(video_stem + '.'):
+        return subtitle_stem[len(video_stem) + 1:] or None
+    return None
+
+
+def pair_videos(directory: Path, pattern: Optional[str] = None) -> List[Tuple[Path, List[SubtitleFile]]]:
+    """
+    Pair every video in directory with its subtitle files.
+
+    The directory is listed once. Subtitles are indexed by the dot-separated
+    prefixes of their names, so "Talk.en-US.vtt" belongs to "Talk.mp4" with
+    language "en-US". When several videos could claim a subtitle (e.g. "a.mp4"
+    and "a.b.mp4" for "a.b.en.srt") the longest matching name wins.
+
+    Args:
+        directory: Directory to scan (not recursive)
+        pattern: Glob pattern selecting videos (default: known video extensions)
+
+    Returns:
+        (video, subtitles) tuples sorted by video name; videos without
+        subtitles are included with an empty list.
+    """
+    videos: Dict[str, List[Path]] = {}
+    subtitles = []
+
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+
+            stem, ext = os.path.splitext(entry.name)
+            if ext.lower() in SUBTITLE_EXTENSIONS:
+                subtitles.append((stem, Path(entry.path)))
+                continue
+
+            if pattern:
+                is_video = fnmatch.fnmatch(entry.name, pattern)
+            else:
+                is_video = ext.lower() in VIDEO_EXTENSIONS
+            if is_video:
+                videos.setdefault(stem, []).append(Path(entry.path))
+
+    matched: Dict[str, List[SubtitleFile]] = {}
+    for stem, path in subtitles:
+        prefix, lang = stem, None
+        while prefix:
+            if prefix in videos:
+                matched.setdefault(prefix, []).append(SubtitleFile(path, lang))
+                break
+            prefix, _, tag = prefix.rpartition('.')
+            lang = f"{tag}.{lang}" if lang else tag
+
+    pairs = []
+    for stem, paths in videos.items():
+        subs = sorted(matched.get(stem, []), key=lambda sub: sub.path.name)
+        pairs.extend((path, subs) for path in paths)
+
+    return sorted(pairs, key=lambda pair: pair[0].name)
+
+
+def find_video_subtitle_pairs(directory: Path, pattern: Optional[str] = None) -> List[Tuple[Path, List[SubtitleFile]]]:
+    """Like pair_videos, but only videos that have at least one subtitle"""
+    return [(video, subs) for video, subs in pair_videos(directory, pattern) if subs]
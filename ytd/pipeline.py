@@ -0,0 +1,145 @@
+"""Run yt-dlp postprocessing on worker threads while the next entries download"""
+
+import logging
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import yt_dlp
+from yt_dlp.utils import PostProcessingError
+
+DEFAULT_MAX_PENDING = 4
+DEFAULT_MIN_FREE_BYTES = 1024 * 1024 * 1024  # Keep 1 GB free for the next download
+QUEUED_KEY = '__ytd_postprocess_queued'  # Set on info dicts whose postprocessing runs on a worker
+
+
+class PipelinedYoutubeDL(yt_dlp.YoutubeDL):
+    """
+    YoutubeDL that hands each finished download to a postprocessing pool.
+
+    yt-dlp normally runs merging, audio extraction and embedding inline, so
+    the network idles while ffmpeg runs. Here post_process() queues the job
+    and returns at once, and the download loop moves on to the next entry.
+    yt-dlp's download archive entry for a queued video is held back until
+    its postprocessing has succeeded, so a failed merge is tried again by
+    the next run, and the final filepath is copied to the caller's info.
+
+    Back-pressure: the download thread blocks while max_pending jobs are
+    queued or running, and while free space in output_dir is below
+    min_free_bytes and postprocessing (which frees the intermediate files)
+    is still in flight.
+    """
+
+    def __init__(self, params: Optional[Dict] = None, workers: int = 2,
+                 max_pending: int = DEFAULT_MAX_PENDING, output_dir: Optional[Path] = None,
+                 min_free_bytes: int = DEFAULT_MIN_FREE_BYTES, logger: Optional[logging.Logger] = None):
+        super().__init__(params)
+        self.output_dir = Path(output_dir or '.')
+        self.min_free_bytes = min_free_bytes
+        self.pp_logger = logger or logging.getLogger(__name__)
+        self.max_pending = max(1, max_pending)
+
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix='postprocess')
+        self._cond = threading.Condition()
+        self._pending = 0
+        self._futures = []
+        self.failures: List[Tuple[str, str]] = []
+        self.pp_seconds = 0.0
+        self._job_hooks: List[Callable[[Dict], None]] = []
+        # Archive ids of queued videos: jobs outstanding, and whether one failed
+        self._archive_jobs: Dict[str, int] = {}
+        self._archive_failed: Set[str] = set()
+
+    def add_job_hook(self, hook: Callable[[Dict], None]) -> None:
+        """Call hook(info) on the worker once a queued job has finished, successfully or not"""
+        self._job_hooks.append(hook)
+
+    def _free_bytes(self) -> int:
+        try:
+            return shutil.disk_usage(self.output_dir).free
+        except OSError:
+            return self.min_free_bytes
+
+    def _wait_for_capacity(self) -> None:
+        """Block the download thread until another job may be queued"""
+        with self._cond:
+            while self._pending >= self.max_pending or (
+                    self._pending and self._free_bytes() < self.min_free_bytes):
+                # Re-check disk space periodically as well as on job completion
+                self._cond.wait(timeout=1.0)
+
+    def _run_job(self, filename: str, info: Dict, files_to_move: Optional[Dict], original: Dict) -> None:
+        started = time.monotonic()
+        archive_id = self._make_archive_id(info)
+        failed = True
+        try:
+            result = super().post_process(filename, info, files_to_move)
+            original['filepath'] = result.get('filepath', filename)
+            failed = False
+        except Exception as e:
+            # A traceback for anything unexpected; it would otherwise only surface in wait()
+            self.pp_logger.error(f"Postprocessing failed for {filename}: {e}",
+                                 exc_info=not isinstance(e, (PostProcessingError, OSError)))
+            with self._cond:
+                self.failures.append((filename, str(e)))
+        finally:
+            for hook in self._job_hooks:
+                hook(info)
+            self._finish_archive(archive_id, info, failed)
+            with self._cond:
+                self._pending -= 1
+                self.pp_seconds += time.monotonic() - started
+                self._cond.notify_all()
+
+    def _finish_archive(self, archive_id: Optional[str], info: Dict, failed: bool) -> None:
+        """Record a video in the download archive once all its queued jobs succeeded"""
+        if archive_id is None:
+            return
+        with self._cond:
+            self._archive_jobs[archive_id] -= 1
+            if failed:
+                self._archive_failed.add(archive_id)
+            done = self._archive_jobs[archive_id] == 0 and archive_id not in self._archive_failed
+        if done:
+            super().record_download_archive(info)
+
+    def record_download_archive(self, info_dict):
+        """Skip videos still being postprocessed (their job records them)"""
+        archive_id = self._make_archive_id(info_dict)
+        with self._cond:
+            if archive_id in self._archive_jobs:
+                return
+        super().record_download_archive(info_dict)
+
+    def post_process(self, filename, info, files_to_move=None):
+        """Queue postprocessing for a downloaded file and return immediately"""
+        self._wait_for_capacity()
+        info[QUEUED_KEY] = True
+        archive_id = self._make_archive_id(info)
+        with self._cond:
+            self._pending += 1
+            if archive_id is not None:
+                if not self._archive_jobs.get(archive_id):
+                    self._archive_failed.discard(archive_id)  # A new attempt, e.g. a retry
+                self._archive_jobs[archive_id] = self._archive_jobs.get(archive_id, 0) + 1
+        # Shallow copy: the download loop keeps using the original dict
+        job_info = dict(info)
+        self._futures.append(self._executor.submit(self._run_job, filename, job_info, files_to_move, info))
+        return info
+
+    def wait(self) -> List[Tuple[str, str]]:
+        """Wait for all queued postprocessing and return (file, error) failures"""
+        for future in self._futures:
+            future.result()
+        self._futures.clear()
+        return list(self.failures)
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            self._executor.shutdown(wait=True)
+            super().close()
@@ -0,0 +1,102 @@
+"""Stream playlist entries into downloads while the rest of the playlist is still being paged"""
+
+import itertools
+import queue
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional
+
+from .prefetch import MetadataPrefetcher
+from .utils import PlaylistItems
+
+DEFAULT_READ_AHEAD = 100  # Entries enumerated ahead of the download in progress
+
+_DONE = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def read_ahead(entries: Iterable, size: int = DEFAULT_READ_AHEAD, limit: Optional[int] = None) -> Iterator:
+    """
+    Iterate entries, fetching up to size of them ahead on a background thread.
+
+    Extraction errors raised while paging are re-raised in the consumer at
+    the point they occurred. Closing the iterator early (e.g. once the
+    requested playlist items are done) stops the producer, and at most
+    limit entries are paged, so nothing past the last requested playlist
+    item is ever fetched.
+    """
+    buffer: 'queue.Queue[Any]' = queue.Queue(maxsize=max(1, size))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for entry in itertools.islice(entries, limit):
+                if not put(entry):
+                    return
+        except BaseException as e:  # Handed to the consumer, which decides what it means
+            put(_Failure(e))
+            return
+        put(_DONE)
+
+    thread = threading.Thread(target=produce, name='ytd-playlist-pager', daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+
+
+def stream_playlist(ydl, url: str, items: Optional[PlaylistItems] = None,
+                    prefetcher: Optional[MetadataPrefetcher] = None,
+                    read_ahead_size: int = DEFAULT_READ_AHEAD,
+                    wrap_entries: Optional[Callable[[Iterator, Dict], Iterator]] = None) -> Optional[Dict]:
+    """
+    Download url, starting on playlist entries as soon as each one is known.
+
+    yt-dlp normally pages through the whole playlist before downloading the
+    first entry. Here entries are processed lazily (yt-dlp's lazy_playlist)
+    and the pages are fetched on a background thread, so enumeration
+    overlaps with the downloads instead of delaying them. Single videos are
+    downloaded as usual.
+
+    Paging stops after the last of the requested items (yt-dlp's
+    playlist_items still picks the entries before it). With a prefetcher,
+    the requested entries are also extracted concurrently ahead of the
+    download in progress. wrap_entries(entries, playlist) sees each entry
+    just before yt-dlp processes it.
+    """
+    ydl.params['lazy_playlist'] = True
+    ie_result = ydl.extract_info(url, download=False, process=False)
+    if ie_result is None:
+        return None
+
+    entries = ie_result.get('entries')
+    if ie_result.get('_type') in ('playlist', 'multi_video') and entries is not None \
+            and not isinstance(entries, (list, tuple)) and hasattr(entries, '__next__'):
+        entries = read_ahead(entries, read_ahead_size, items.last if items else None)
+        if prefetcher:
+            # Negative indexes aren't known until the end; then resolve everything
+            wanted = items.__contains__ if items and not items.relative else None
+            entries = prefetcher.iter_resolved(entries, wanted=wanted)
+        if wrap_entries:
+            entries = wrap_entries(entries, ie_result)
+        ie_result['entries'] = entries
+    return ydl.process_ie_result(ie_result, download=True)
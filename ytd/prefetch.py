@@ -0,0 +1,182 @@
+"""Concurrent metadata extraction for playlist entries"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlparse
+
+import yt_dlp
+
+DEFAULT_JOBS = 4
+DEFAULT_HOST_INTERVAL = 0.25  # Seconds between extraction starts against one host
+
+
+class HostRateLimiter:
+    """Spaces out request starts per host, however many threads are asking"""
+
+    def __init__(self, interval: float = DEFAULT_HOST_INTERVAL):
+        self.interval = interval
+        self._next: Dict[str, float] = {}
+        self.lock = threading.Lock()
+
+    def wait(self, host: str) -> None:
+        """Block until a request to host may start"""
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, 0.0))
+            self._next[host] = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class InfoCache:
+    """Extracted info dicts of one run, by extractor and video id (or URL)"""
+
+    def __init__(self):
+        self._infos: Dict[tuple, Dict] = {}
+        self._entry_keys: Dict[tuple, tuple] = {}  # Key of an info -> key of the entry it resolved
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def key(entry: Dict) -> tuple:
+        extractor = entry.get('ie_key') or entry.get('extractor_key')
+        if extractor and entry.get('id'):
+            return extractor.lower(), entry['id']
+        return ('url', entry.get('url') or entry.get('webpage_url'))
+
+    def get(self, entry: Dict) -> Optional[Dict]:
+        with self.lock:
+            return self._infos.get(self.key(entry))
+
+    def put(self, entry: Dict, info: Dict) -> None:
+        with self.lock:
+            self._infos[self.key(entry)] = info
+            self._infos[self.key(info)] = info
+            self._entry_keys[self.key(info)] = self.key(entry)
+
+    def discard(self, info: Dict) -> None:
+        """Forget an info dict that won't be asked for again"""
+        key = self.key(info)
+        with self.lock:
+            self._infos.pop(key, None)
+            self._infos.pop(self._entry_keys.pop(key, key), None)
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len({id(info) for info in self._infos.values()})
+
+
+def needs_extraction(entry: Optional[Dict]) -> bool:
+    """Flat playlist entries that only point at the video page"""
+    return bool(entry) and entry.get('_type') == 'url' and bool(entry.get('url'))
+
+
+class MetadataPrefetcher:
+    """
+    Resolves flat playlist entries to full info dicts on a thread pool.
+
+    Each worker thread extracts with its own YoutubeDL (extractor instances
+    keep per-instance state), requests to one host are spaced by
+    host_interval, and results land in an InfoCache so nothing is
+    extracted twice in a run. Resolved entries are handed to yt-dlp as
+    ready-made video results, so downloading and format planning no longer
+    wait on extraction.
+    """
+
+    def __init__(self, params: Optional[Dict] = None, jobs: int = DEFAULT_JOBS,
+                 host_interval: float = DEFAULT_HOST_INTERVAL, cache: Optional[InfoCache] = None,
+                 ydl_factory: Callable[[Dict], yt_dlp.YoutubeDL] = yt_dlp.YoutubeDL):
+        # Hooks and postprocessors belong to the downloading YoutubeDL
+        self.params = {key: value for key, value in (params or {}).items()
+                       if key not in ('progress_hooks', 'postprocessor_hooks', 'postprocessors')}
+        self.jobs = max(1, jobs)
+        self.limiter = HostRateLimiter(host_interval)
+        self.cache = cache if cache is not None else InfoCache()
+        self.ydl_factory = ydl_factory
+        self._executor = ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix='ytd-prefetch')
+        self._local = threading.local()
+        self._ydls: List[yt_dlp.YoutubeDL] = []
+        self._ydls_lock = threading.Lock()
+
+    def _ydl(self) -> yt_dlp.YoutubeDL:
+        ydl = getattr(self._local, 'ydl', None)
+        if ydl is None:
+            ydl = self._local.ydl = self.ydl_factory(dict(self.params))
+            with self._ydls_lock:
+                self._ydls.append(ydl)
+        return ydl
+
+    def resolve(self, entry: Dict) -> Dict:
+        """
+        Full info dict for entry (from the cache if already extracted).
+
+        Entries that fail to extract are returned unchanged, so the caller's
+        own extraction reports the error in the usual way.
+        """
+        if not needs_extraction(entry):
+            return entry
+        cached = self.cache.get(entry)
+        if cached is not None:
+            return cached
+
+        self.limiter.wait(urlparse(entry['url']).hostname or '')
+        try:
+            info = self._ydl().extract_info(entry['url'], download=False, process=False,
+                                            ie_key=entry.get('ie_key'))
+        except Exception:
+            return entry
+        if not info or info.get('_type', 'video') != 'video':
+            return entry
+        self.cache.put(entry, info)
+        return info
+
+    def prefetch(self, entries: Iterable[Dict]) -> List[Dict]:
+        """Resolve all entries concurrently, keeping their order"""
+        return list(self._executor.map(self.resolve, entries))
+
+    def iter_resolved(self, entries: Iterable[Dict], ahead: Optional[int] = None,
+                      wanted: Optional[Callable[[int], bool]] = None) -> Iterator[Dict]:
+        """
+        Yield entries in order, resolving up to ahead of them in the background.
+
+        The window keeps every worker busy while the consumer downloads the
+        current entry, without resolving so far ahead that signed media
+        URLs expire before use. Entries whose 1-based position fails wanted
+        are passed through unresolved. Each resolved entry leaves the cache
+        as it is yielded, so a long playlist holds no more than the window.
+        """
+        ahead = ahead or self.jobs * 2
+        pending = deque()
+        for position, entry in enumerate(entries, 1):
+            if needs_extraction(entry) and (wanted is None or wanted(position)):
+                entry = self._executor.submit(self.resolve, entry)
+            pending.append(entry)
+            if len(pending) >= ahead:
+                yield self._hand_over(pending.popleft())
+        while pending:
+            yield self._hand_over(pending.popleft())
+
+    def _hand_over(self, item):
+        info = _result(item)
+        if info is not item:
+            self.cache.discard(info)
+        return info
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._ydls_lock:
+            ydls, self._ydls = self._ydls, []
+        for ydl in ydls:
+            ydl.close()
+
+    def __enter__(self) -> 'MetadataPrefetcher':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _result(item):
+    return item.result() if hasattr(item, 'result') else item
@@ -0,0 +1,126 @@
+"""Cached ffprobe results keyed by file identity"""
+
+import json
+import os
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+try:
+    from .ffmpeg_helper import get_ffprobe_command
+except ImportError:
+    from ffmpeg_helper import get_ffprobe_command
+
+
+def run_ffprobe(path: Path) -> Optional[Dict[str, Any]]:
+    """Run ffprobe on a file, returning its streams and format as a dict"""
+    try:
+        cmd = [
+            get_ffprobe_command(),
+            '-v', 'quiet',
+            '-print_format', 'json',
+            '-show_streams',
+            '-show_format',
+            str(path)
+        ]
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode == 0:
+            return json.loads(result.stdout)
+        return None
+    except Exception:
+        return None
+
+
+class ProbeCache:
+    """
+    In-memory (and optionally on-disk) cache of ffprobe results.
+
+    Entries are keyed by path and validated against the file's size, mtime
+    and inode, so a replaced or modified file is probed again while an
+    untouched one never spawns ffprobe twice.
+    """
+
+    def __init__(self, cache_file: Optional[Path] = None):
+        self.cache_file = Path(cache_file).expanduser() if cache_file else None
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+        self.dirty = False
+
+        if self.cache_file and self.cache_file.exists():
+            try:
+                with open(self.cache_file, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                self.entries = {}
+
+    @staticmethod
+    def _identity(path: Path) -> Optional[Dict[str, int]]:
+        """Size, mtime and inode of a file, or None if it doesn't exist"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'inode': stat.st_ino}
+
+    def get(self, path: Path) -> Optional[Dict[str, Any]]:
+        """Return the cached probe for path if the file is unchanged"""
+        identity = self._identity(path)
+        key = str(Path(path).resolve())
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry and identity and all(entry.get(k) == v for k, v in identity.items()):
+            return entry['info']
+        return None
+
+    def probe(self, path: Path) -> Optional[Dict[str, Any]]:
+        """Probe a file, using the cache when its identity is unchanged"""
+        cached = self.get(path)
+        if cached is not None:
+            return cached
+
+        identity = self._identity(path)
+        if identity is None:
+            return None
+
+        info = run_ffprobe(path)
+        if info is not None:
+            with self.lock:
+                self.entries[str(Path(path).resolve())] = dict(identity, info=info)
+                self.dirty = True
+        return info
+
+    def probe_many(self, paths: Iterable[Path], jobs: int = 4) -> Dict[Path, Optional[Dict[str, Any]]]:
+        """Probe several files, running up to `jobs` ffprobe processes for cache misses"""
+        paths = list(paths)
+        results = {path: self.get(path) for path in paths}
+        misses = [path for path, info in results.items() if info is None]
+
+        if misses:
+            with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+                for path, info in zip(misses, executor.map(self.probe, misses)):
+                    results[path] = info
+
+        return results
+
+    def save(self) -> None:
+        """Write the cache to its file, if one was configured and anything changed"""
+        if not self.cache_file or not self.dirty:
+            return
+
+        self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+        temp_file = self.cache_file.with_name(self.cache_file.name + '.tmp')
+        with self.lock:
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f)
+            os.replace(temp_file, self.cache_file)
+            self.dirty = False
+
+
+_default_cache = ProbeCache()
+
+
+def probe_file(path: Path) -> Optional[Dict[str, Any]]:
+    """Probe a file through the process-wide cache"""
+    return _default_cache.probe(path)
@@ -0,0 +1,293 @@
+"""Resumable HTTP downloads with Range requests and optional parallel segments"""
+
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPException
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+try:
+    from .http_pool import HTTPError, default_pool
+except ImportError:
+    from http_pool import HTTPError, default_pool
+
+MIN_BUFFER = 16 * 1024
+START_BUFFER = 64 * 1024
+MAX_BUFFER = 4 * 1024 * 1024
+MIN_SEGMENT_SIZE = 1024 * 1024  # Don't split files into segments smaller than this
+
+ProgressCallback = Callable[[int, int], None]  # (downloaded bytes, total bytes or 0)
+
+# Errors worth retrying from the last byte received
+RETRYABLE_ERRORS = (HTTPException, ConnectionError, TimeoutError, OSError)
+
+
+class DownloadError(Exception):
+    """Raised when a download cannot be completed or fails verification"""
+
+
+class AdaptiveBuffer:
+    """
+    Read size that grows while reads keep filling the buffer quickly and
+    shrinks when a read stalls, so fast links use few large reads and slow
+    links still report progress smoothly.
+    """
+
+    def __init__(self, size: int = START_BUFFER):
+        self.size = size
+
+    def read(self, response) -> bytes:
+        started = time.monotonic()
+        chunk = response.read(self.size)
+        elapsed = time.monotonic() - started
+
+        if len(chunk) == self.size and elapsed < 0.05:
+            self.size = min(self.size * 2, MAX_BUFFER)
+        elif elapsed > 1.0:
+            self.size = max(self.size // 2, MIN_BUFFER)
+        return chunk
+
+
+def _open(url: str, start: int = 0, end: Optional[int] = None, method: str = 'GET', timeout: float = 30):
+    """Open url on a pooled connection, requesting bytes start..end (inclusive) when a range is given"""
+    headers = {}
+    if start or end is not None:
+        headers['Range'] = f"bytes={start}-{'' if end is None else end}"
+    return default_pool().request(method, url, headers, timeout=timeout)
+
+
+def probe_url(url: str, timeout: float = 30) -> Tuple[int, bool]:
+    """Return (content length or 0, whether byte ranges are supported)"""
+    try:
+        with _open(url, method='HEAD', timeout=timeout) as response:
+            total = int(response.headers.get('Content-Length') or 0)
+            ranges = response.headers.get('Accept-Ranges', '').lower() == 'bytes'
+            return total, ranges
+    except (HTTPException, OSError, ValueError):
+        return 0, False
+
+
+def verify_checksum(path: Path, checksum: str) -> bool:
+    """Verify a file against "algorithm:hexdigest" (e.g. "sha256:ab12...")"""
+    algorithm, _, expected = checksum.partition(':')
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest().lower() == expected.strip().lower()
+
+
+class _Progress:
+    """Thread-safe byte counter forwarding to a progress callback"""
+
+    def __init__(self, total: int, done: int, callback: Optional[ProgressCallback]):
+        self.total = total
+        self.done = done
+        self.callback = callback
+        self.lock = threading.Lock()
+        if callback:
+            callback(done, total)
+
+    def add(self, count: int) -> None:
+        with self.lock:
+            self.done += count
+            if self.callback:
+                self.callback(self.done, self.total)
+
+
+def _stream_download(url: str, dest: Path, total: int, progress_callback: Optional[ProgressCallback],
+                     retries: int, timeout: float) -> None:
+    """Single-connection download that resumes from the partial file on every attempt"""
+    attempt = 0
+    while True:
+        offset = dest.stat().st_size if dest.exists() else 0
+        if total and offset == total:
+            return
+        if total and offset > total:
+            dest.unlink()
+            offset = 0
+
+        try:
+            response = _open(url, start=offset, timeout=timeout)
+        except HTTPError as e:
+            if e.code == 416 and offset:
+                # The partial file is not a prefix we can resume from
+                dest.unlink()
+                continue
+            raise DownloadError(f"HTTP {e.code} downloading {url}") from e
+        except RETRYABLE_ERRORS as e:
+            attempt += 1
+            if attempt > retries:
+                raise DownloadError(f"Download failed after {retries} retries: {e}") from e
+            time.sleep(min(2 ** attempt * 0.1, 5))
+            continue
+
+        with response:
+            if offset and response.status != 206:
+                offset = 0  # Server ignored the Range header; start over
+            if not total:
+                length = int(response.headers.get('Content-Length') or 0)
+                total = offset + length if length else 0
+
+            progress = _Progress(total, offset, progress_callback)
+            buffer = AdaptiveBuffer()
+            try:
+                with open(dest, 'ab' if offset else 'wb') as f:
+                    while True:
+                        chunk = buffer.read(response)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        progress.add(len(chunk))
+            except RETRYABLE_ERRORS as e:
+                attempt += 1
+                if attempt > retries:
+                    raise DownloadError(f"Download failed after {retries} retries: {e}") from e
+                time.sleep(min(2 ** attempt * 0.1, 5))
+                continue
+
+        size = dest.stat().st_size
+        if total and size < total:
+            # Connection closed early without an error; resume
+            attempt += 1
+            if attempt > retries:
+                raise DownloadError(f"Download incomplete: {size} of {total} bytes")
+            continue
+        return
+
+
+class _SegmentState:
+    """Per-segment progress persisted next to the download so it can resume"""
+
+    def __init__(self, path: Path, total: int, segments: int, resume: bool):
+        self.path = path
+        self.lock = threading.Lock()
+        self.total = total
+        self.segments: List[List[int]] = []
+
+        if resume and path.exists():
+            try:
+                state = json.loads(path.read_text())
+                if state.get('total') == total:
+                    self.segments = state['segments']
+            except (OSError, ValueError, KeyError):
+                pass
+
+        if not self.segments:
+            size = -(-total // segments)  # Ceiling division
+            self.segments = [[start, min(start + size, total) - 1, 0]
+                             for start in range(0, total, size)]
+
+    @property
+    def done(self) -> int:
+        return sum(done for _, _, done in self.segments)
+
+    def save(self) -> None:
+        with self.lock:
+            self.path.write_text(json.dumps({'total': self.total, 'segments': self.segments}))
+
+
+def _segmented_download(url: str, dest: Path, total: int, segments: int,
+                        progress_callback: Optional[ProgressCallback], retries: int, timeout: float) -> None:
+    """Download byte ranges over several connections into a preallocated file"""
+    resume = dest.exists() and dest.stat().st_size == total
+    state = _SegmentState(dest.with_name(dest.name + '.parts'), total, segments, resume)
+    progress = _Progress(total, state.done, progress_callback)
+
+    if not resume:
+        with open(dest, 'wb') as f:
+            f.truncate(total)
+
+    # Written before any data so that an interrupted run is never mistaken
+    # for a complete file; counts only ever lag behind the bytes on disk
+    state.save()
+
+    def fetch(segment: List[int]) -> None:
+        start, end, _ = segment
+        attempt = 0
+        while segment[2] < end - start + 1:
+            try:
+                with _open(url, start=start + segment[2], end=end, timeout=timeout) as response:
+                    if response.status != 206:
+                        raise DownloadError("Server stopped honouring range requests")
+                    buffer = AdaptiveBuffer()
+                    last_save = time.monotonic()
+                    # Unbuffered, so saved progress never counts bytes still in memory
+                    with open(dest, 'r+b', buffering=0) as f:
+                        f.seek(start + segment[2])
+                        while segment[2] < end - start + 1:
+                            chunk = buffer.read(response)
+                            if not chunk:
+                                break
+                            view = memoryview(chunk)[:end - start + 1 - segment[2]]
+                            chunk_size = len(view)
+                            while view:
+                                view = view[f.write(view):]
+                            segment[2] += chunk_size
+                            progress.add(chunk_size)
+                            if time.monotonic() - last_save > 1.0:
+                                state.save()
+                                last_save = time.monotonic()
+                if segment[2] < end - start + 1:
+                    raise ConnectionError("Connection closed early")
+            except RETRYABLE_ERRORS as e:
+                state.save()
+                attempt += 1
+                if attempt > retries:
+                    raise DownloadError(f"Segment {start}-{end} failed after {retries} retries: {e}") from e
+                time.sleep(min(2 ** attempt * 0.1, 5))
+
+    try:
+        with ThreadPoolExecutor(max_workers=segments) as executor:
+            for future in [executor.submit(fetch, segment) for segment in state.segments]:
+                future.result()
+    except BaseException:
+        state.save()
+        raise
+
+    state.path.unlink(missing_ok=True)
+
+
+def download_file(url: str, dest: Path, segments: int = 1, checksum: Optional[str] = None,
+                  progress_callback: Optional[ProgressCallback] = None,
+                  retries: int = 5, timeout: float = 30) -> Path:
+    """
+    Download url to dest, resuming any partial file left by an earlier attempt.
+
+    Args:
+        url: URL to download
+        dest: Destination file; a partial file here is resumed with a Range request
+        segments: Number of parallel connections when the server supports ranges
+        checksum: Optional "algorithm:hexdigest" to verify the finished file against
+        progress_callback: Called with (downloaded bytes, total bytes or 0)
+        retries: Reconnect attempts per connection before giving up
+        timeout: Socket timeout in seconds
+
+    Raises:
+        DownloadError: if the download fails or the checksum does not match
+    """
+    dest = Path(dest)
+    total, ranges = probe_url(url, timeout=timeout)
+    state_file = dest.with_name(dest.name + '.parts')
+
+    # A partial file from a single-connection attempt is resumed the same way
+    stream_partial = dest.exists() and not state_file.exists() and 0 < dest.stat().st_size < total
+
+    if ranges and total and (state_file.exists() or (segments > 1 and not stream_partial)):
+        segments = max(1, min(segments, total // MIN_SEGMENT_SIZE or 1))
+        _segmented_download(url, dest, total, segments, progress_callback, retries, timeout)
+    else:
+        if state_file.exists():
+            # Can't continue a segmented download without ranges
+            state_file.unlink()
+            dest.unlink(missing_ok=True)
+        _stream_download(url, dest, total, progress_callback, retries, timeout)
+
+    if checksum and not verify_checksum(dest, checksum):
+        dest.unlink()
+        raise DownloadError(f"Checksum mismatch for {url}")
+
+    return dest
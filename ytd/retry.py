@@ -0,0 +1,293 @@
+"""Retry failed videos with backoff, jitter and per-host cool-downs"""
+
+import heapq
+import itertools
+import logging
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+# (class, pattern, retriable, host cool-down) in match order; the first match wins
+ERROR_CLASSES = (
+    ('rate_limited', r'HTTP Error 429|Too Many Requests', True, True),
+    ('throttled', r"throttl|confirm you.re not a bot|rate.?limit", True, True),
+    ('unavailable', r'Video unavailable|Private video|has been removed|copyright|'
+                    r'not available in your country|members.only|Join this channel|'
+                    r'Sign in to confirm your age|premiere|is not a valid URL|Unsupported URL', False, False),
+    ('forbidden', r'HTTP Error 403|Forbidden', True, False),
+    ('network', r'Connection reset|Connection refused|Connection aborted|timed out|'
+                r'Temporary failure in name resolution|Remote end closed|IncompleteRead|'
+                r'Network is unreachable|EOF occurred|\bSSL\b|HTTP Error 5\d\d', True, False),
+    ('extractor', r'Unable to extract|Unable to download (?:webpage|JSON|API)|\[\w+\]', True, False),
+)
+_PATTERNS = [(name, re.compile(pattern, re.IGNORECASE), retriable, cooldown)
+             for name, pattern, retriable, cooldown in ERROR_CLASSES]
+
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 10.0  # Seconds before the first retry; doubles each attempt
+DEFAULT_MAX_DELAY = 600.0
+DEFAULT_COOLDOWN = 60.0  # Seconds a host is left alone after rate limiting; doubles per strike
+# Retrying these more often rarely helps (expired signatures, broken extractor)
+CLASS_MAX_RETRIES = {'forbidden': 2, 'extractor': 1}
+
+
+def classify_error(message: str) -> str:
+    """Failure class of an error message ('other' if nothing matches)"""
+    for name, pattern, _, _ in _PATTERNS:
+        if pattern.search(message):
+            return name
+    return 'other'
+
+
+def is_retriable(error_class: str) -> bool:
+    return any(name == error_class and retriable for name, _, retriable, _ in _PATTERNS)
+
+
+def causes_cooldown(error_class: str) -> bool:
+    return any(name == error_class and cooldown for name, _, _, cooldown in _PATTERNS)
+
+
+def host_of(item: Any) -> str:
+    """Host an item (URL or info dict) will be fetched from"""
+    url = item if isinstance(item, str) else (item.get('webpage_url') or item.get('url') or '')
+    return urlparse(url).hostname or ''
+
+
+def with_jitter(delay: float) -> float:
+    """delay scaled by a random factor in [0.5, 1.5), so retries don't synchronise"""
+    return delay * (0.5 + random.random())
+
+
+class RetryPolicy:
+    """How often and how long to wait before retrying each class of failure"""
+
+    def __init__(self, retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF,
+                 max_delay: float = DEFAULT_MAX_DELAY):
+        self.retries = retries
+        self.backoff = backoff
+        self.max_delay = max_delay
+
+    def should_retry(self, error_class: str, attempt: int) -> bool:
+        """Whether to try again after attempt (1-based) failed with error_class"""
+        if not is_retriable(error_class):
+            return False
+        return attempt <= min(self.retries, CLASS_MAX_RETRIES.get(error_class, self.retries))
+
+    def delay(self, attempt: int) -> float:
+        """Exponential backoff with jitter before retry number attempt"""
+        return with_jitter(min(self.max_delay, self.backoff * 2 ** (attempt - 1)))
+
+
+class HostCooldowns:
+    """Hosts that rate limited us, and until when to leave them alone"""
+
+    def __init__(self, cooldown: float = DEFAULT_COOLDOWN, max_cooldown: float = DEFAULT_MAX_DELAY):
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self._until: Dict[str, float] = {}
+        self._strikes: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def penalize(self, host: str) -> float:
+        """Start (or extend) a cool-down for host; returns its length"""
+        with self.lock:
+            strikes = self._strikes[host] = self._strikes.get(host, 0) + 1
+            length = with_jitter(min(self.max_cooldown, self.cooldown * 2 ** (strikes - 1)))
+            self._until[host] = max(self._until.get(host, 0.0), time.monotonic() + length)
+        return length
+
+    def succeeded(self, host: str) -> None:
+        with self.lock:
+            self._strikes.pop(host, None)
+
+    def remaining(self, host: str) -> float:
+        with self.lock:
+            return max(0.0, self._until.get(host, 0.0) - time.monotonic())
+
+    def wait(self, host: str, sleep: Callable[[float], None] = time.sleep) -> float:
+        """Sleep out host's cool-down, returning how long that was"""
+        remaining = self.remaining(host)
+        if remaining > 0:
+            sleep(remaining)
+        return remaining
+
+
+class ErrorCapture:
+    """
+    Logger for yt-dlp that also remembers the errors it reports.
+
+    With ignoreerrors, yt-dlp reports a failed video through logger.error
+    and moves on; this is where those failures are picked up. Only errors
+    from the thread that downloads are captured, not from postprocessing
+    workers.
+    """
+
+    def __init__(self, logger: logging.Logger):
+        self.logger = logger
+        self.errors: List[str] = []
+        self._thread = threading.get_ident()
+
+    def debug(self, msg: str) -> None:
+        self.logger.debug(msg)
+
+    def info(self, msg: str) -> None:
+        self.logger.info(msg)
+
+    def warning(self, msg: str) -> None:
+        self.logger.warning(msg)
+
+    def error(self, msg: str) -> None:
+        if threading.get_ident() == self._thread:
+            self.errors.append(msg)
+        self.logger.error(msg)
+
+    def take(self) -> List[str]:
+        """Errors since the last call"""
+        errors, self.errors = self.errors, []
+        return errors
+
+
+class FailedItem:
+    """A video to retry: what it is, where it came from and why it failed"""
+
+    def __init__(self, item: Any, errors: List[str], extra_info: Optional[Dict] = None):
+        self.item = item
+        self.extra_info = extra_info or {}
+        self.attempts = 1
+        self.errors = errors
+        self.error_class = classify_error(errors[-1]) if errors else 'other'
+        self.host = host_of(item)
+
+    @property
+    def label(self) -> str:
+        if isinstance(self.item, str):
+            return self.item
+        return self.item.get('title') or self.item.get('id') or self.item.get('url') or '?'
+
+
+def retry_entry(entry: Dict) -> Dict:
+    """
+    Playlist entry to retry with: a fresh extraction of the video page, as
+    format URLs in an already extracted entry may have expired.
+    """
+    if entry.get('_type') == 'url' or not entry.get('webpage_url'):
+        return entry
+    return {'_type': 'url', 'url': entry['webpage_url'], 'ie_key': entry.get('extractor_key'),
+            'id': entry.get('id'), 'title': entry.get('title')}
+
+
+class FailureTracker:
+    """
+    Attributes captured errors to the playlist entry being processed.
+
+    yt-dlp pulls entries lazily and finishes each before pulling the next,
+    so errors reported between two pulls belong to the earlier entry.
+    Before handing out an entry, any cool-down of its host is waited out.
+    """
+
+    def __init__(self, capture: ErrorCapture, cooldowns: HostCooldowns,
+                 logger: Optional[logging.Logger] = None, sleep: Callable[[float], None] = time.sleep):
+        self.capture = capture
+        self.cooldowns = cooldowns
+        self.logger = logger or logging.getLogger(__name__)
+        self.sleep = sleep
+        self.failed: List[FailedItem] = []
+
+    def _finish(self, entry: Dict, extra_info: Dict) -> None:
+        errors = self.capture.take()
+        host = host_of(entry)
+        if not errors:
+            self.cooldowns.succeeded(host)
+            return
+        failure = FailedItem(retry_entry(entry), errors, extra_info)
+        self.failed.append(failure)
+        if causes_cooldown(failure.error_class):
+            length = self.cooldowns.penalize(host)
+            self.logger.warning(f"{host} is {failure.error_class.replace('_', ' ')}; pausing it for {length:.0f}s")
+
+    def track(self, entries: Iterable, playlist: Dict) -> Iterator:
+        """Pass entries through, recording which ones failed"""
+        context = {key: playlist.get(source) for key, source in (
+            ('playlist', 'title'), ('playlist_id', 'id'), ('playlist_title', 'title'),
+            ('playlist_uploader', 'uploader'), ('playlist_uploader_id', 'uploader_id'),
+            ('playlist_webpage_url', 'webpage_url'))}
+        self.capture.take()
+        previous = None
+        for index, entry in enumerate(entries, 1):
+            if previous:
+                self._finish(*previous)
+            if entry:
+                waited = self.cooldowns.wait(host_of(entry), self.sleep)
+                if waited:
+                    self.logger.info(f"Resumed after {waited:.0f}s cool-down")
+            previous = (entry, {**context, 'playlist_index': index}) if entry else None
+            yield entry
+        if previous:
+            self._finish(*previous)
+
+
+class RetryScheduler:
+    """
+    Re-runs failed items until they succeed or their retries run out.
+
+    Items wait out an exponential backoff (with jitter) and their host's
+    cool-down; the item that becomes ready first runs first, so one
+    rate-limited host doesn't hold up retries against others.
+    """
+
+    def __init__(self, policy: RetryPolicy, cooldowns: HostCooldowns,
+                 logger: Optional[logging.Logger] = None, sleep: Callable[[float], None] = time.sleep):
+        self.policy = policy
+        self.cooldowns = cooldowns
+        self.logger = logger or logging.getLogger(__name__)
+        self.sleep = sleep
+
+    def run(self, failures: Iterable[FailedItem],
+            process: Callable[[FailedItem], List[str]]) -> Tuple[List[FailedItem], List[FailedItem]]:
+        """
+        Retry failures with process, which returns the errors of one attempt.
+
+        Returns:
+            (recovered items, items given up on)
+        """
+        recovered, given_up = [], []
+        queue: List[Tuple[float, int, FailedItem]] = []
+        counter = itertools.count()
+
+        def schedule(failure: FailedItem) -> None:
+            if not self.policy.should_retry(failure.error_class, failure.attempts):
+                given_up.append(failure)
+                return
+            delay = self.policy.delay(failure.attempts)
+            heapq.heappush(queue, (time.monotonic() + delay, next(counter), failure))
+            self.logger.info(f"Retrying {failure.label} in {delay:.0f}s "
+                             f"({failure.error_class.replace('_', ' ')}, attempt {failure.attempts + 1})")
+
+        for failure in failures:
+            schedule(failure)
+
+        while queue:
+            ready_at, _, failure = heapq.heappop(queue)
+            # Cool-downs may have started after the item was queued
+            wait = max(ready_at, time.monotonic() + self.cooldowns.remaining(failure.host)) - time.monotonic()
+            if wait > 0:
+                self.sleep(wait)
+
+            failure.attempts += 1
+            errors = process(failure)
+            if not errors:
+                self.cooldowns.succeeded(failure.host)
+                recovered.append(failure)
+                self.logger.info(f"Recovered {failure.label} on attempt {failure.attempts}")
+                continue
+
+            failure.errors = errors
+            failure.error_class = classify_error(errors[-1])
+            if causes_cooldown(failure.error_class):
+                self.cooldowns.penalize(failure.host)
+            schedule(failure)
+
+        return recovered, given_up
@@ -0,0 +1,182 @@
+"""Content-addressed media store with hardlinked (or symlinked) views"""
+
+import hashlib
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from yt_dlp.postprocessor.common import PostProcessor
+from yt_dlp.utils import replace_extension
+
+HASH_ALGORITHM = 'sha256'
+FROM_STORE_KEY = '__ytd_from_store'  # Set on info dicts whose file was linked from the store
+SHA256_KEY = '__ytd_sha256'  # Content hash of the output file, once known
+
+
+def _safe(part: str) -> str:
+    return ''.join(c if c.isalnum() or c in '-_.' else '_' for c in str(part))
+
+
+class MediaStore:
+    """
+    Downloads kept once under objects/<hash>, whatever they are called.
+
+    refs/<extractor>/<video id>/<format id>[.<variant>] names the object a
+    download produced, so the same video/format requested again (under a
+    new title, from another playlist) is linked instead of downloaded.
+    Identical bytes reached through different refs share one object.
+
+    Output files are views: hardlinks to the object when the store is on the
+    same filesystem, otherwise symlinks. Postprocessors replace files rather
+    than writing into them, so a view never modifies the shared object.
+    """
+
+    def __init__(self, root: Path, link_mode: str = 'hardlink', logger: Optional[logging.Logger] = None):
+        self.root = Path(root).expanduser()
+        self.objects = self.root / 'objects'
+        self.refs = self.root / 'refs'
+        self.link_mode = link_mode
+        self.logger = logger or logging.getLogger(__name__)
+
+    def ref_path(self, extractor: str, video_id: str, format_id: str, variant: str = '') -> Path:
+        name = _safe(format_id) + (f'.{_safe(variant)}' if variant else '')
+        return self.refs / _safe(extractor.lower()) / _safe(video_id) / name
+
+    def object_path(self, digest: str, ext: str) -> Path:
+        return self.objects / digest[:2] / f'{digest}.{ext}'
+
+    def lookup(self, extractor: str, video_id: str, format_id: str, variant: str = '') -> Optional[Path]:
+        """Stored object for a video/format, if there is one"""
+        ref = self.ref_path(extractor, video_id, format_id, variant)
+        try:
+            digest, ext = ref.read_text().split()[:2]
+        except (OSError, ValueError):
+            return None
+        path = self.object_path(digest, ext)
+        return path if path.exists() else None
+
+    def link(self, source: Path, view: Path) -> str:
+        """Create view pointing at source; returns how ('hardlink' or 'symlink')"""
+        view.parent.mkdir(parents=True, exist_ok=True)
+        tmp = view.with_name(f'.{view.name}.link')
+        tmp.unlink(missing_ok=True)
+        mode = self.link_mode
+        if mode == 'hardlink':
+            try:
+                os.link(source, tmp)
+            except OSError:
+                mode = 'symlink'  # Different filesystem, or links not supported
+        if mode == 'symlink':
+            os.symlink(os.path.abspath(source), tmp)
+        os.replace(tmp, view)
+        return mode
+
+    def ingest(self, path: Path, extractor: str, video_id: str, format_id: str,
+               variant: str = '') -> Tuple[Path, bool]:
+        """
+        Move a finished download into the store and leave a view in its place.
+
+        Returns:
+            (object path, whether identical content was already stored)
+        """
+        path = Path(path)
+        digest = hashlib.new(HASH_ALGORITHM)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        digest = digest.hexdigest()
+
+        ext = path.suffix.lstrip('.') or 'bin'
+        obj = self.object_path(digest, ext)
+        duplicate = obj.exists()
+        if not duplicate:
+            obj.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(path, obj)
+            except OSError:
+                shutil.move(str(path), str(obj))
+        # Points the view at the object (frees the duplicate's bytes if there was one)
+        if not (path.exists() and os.path.samefile(path, obj)):
+            self.link(obj, path)
+
+        ref = self.ref_path(extractor, video_id, format_id, variant)
+        ref.parent.mkdir(parents=True, exist_ok=True)
+        tmp = ref.with_name(ref.name + '.tmp')
+        tmp.write_text(f'{digest} {ext} {obj.stat().st_size}\n')
+        os.replace(tmp, ref)
+        return obj, duplicate
+
+    def attach(self, ydl, variant: str = '') -> None:
+        """Look downloads up before they start and store them once finished"""
+        ydl.add_post_processor(_StoreLookupPP(self, variant, ydl), when='before_dl')
+        ydl.add_post_processor(_StoreIngestPP(self, variant, ydl), when='after_move')
+
+
+def _identity(info: Dict) -> Optional[Tuple[str, str, str]]:
+    extractor = info.get('extractor_key') or info.get('extractor')
+    if not (extractor and info.get('id') and info.get('format_id')):
+        return None
+    return extractor, info['id'], info['format_id']
+
+
+class _StoreLookupPP(PostProcessor):
+    """Link a stored copy to where yt-dlp will look for an existing file"""
+
+    def __init__(self, store: MediaStore, variant: str, downloader=None):
+        super().__init__(downloader)
+        self.store = store
+        self.variant = variant
+
+    @classmethod
+    def pp_key(cls):
+        return 'StoreLookup'
+
+    def run(self, info):
+        identity = _identity(info)
+        if not identity or self.get_param('skip_download'):
+            return [], info
+        obj = self.store.lookup(*identity, self.variant)
+        if not obj:
+            return [], info
+
+        # yt-dlp skips the download when the (final_ext) file already exists
+        ext = info.get('ext')
+        final_ext = self.get_param('final_ext') or ext
+        if obj.suffix.lstrip('.') != final_ext:
+            return [], info  # Stored under another container; download normally
+        view = Path(replace_extension(self._downloader.prepare_filename(info), final_ext, ext))
+        mode = self.store.link(obj, view)
+        info[FROM_STORE_KEY] = True
+        info[SHA256_KEY] = obj.stem
+        self.to_screen(f'Already in the store, {mode}ed to "{view}"')
+        return [], info
+
+
+class _StoreIngestPP(PostProcessor):
+    """Move a finished, postprocessed download into the store"""
+
+    def __init__(self, store: MediaStore, variant: str, downloader=None):
+        super().__init__(downloader)
+        self.store = store
+        self.variant = variant
+
+    @classmethod
+    def pp_key(cls):
+        return 'StoreIngest'
+
+    def run(self, info):
+        identity = _identity(info)
+        path = info.get('filepath')
+        if info.get(FROM_STORE_KEY) or not identity or not path or not os.path.isfile(path):
+            return [], info
+        try:
+            obj, duplicate = self.store.ingest(path, *identity, self.variant)
+        except OSError as e:
+            self.report_warning(f'Could not add "{path}" to the store: {e}')
+            return [], info
+        info[SHA256_KEY] = obj.stem
+        if duplicate:
+            self.to_screen(f'Identical content already stored; "{path}" now links to {obj.name}')
+        return [], info
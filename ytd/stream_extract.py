@@ -0,0 +1,233 @@
+"""Extract selected members from a tar or zip archive while it is being downloaded"""
+
+import hashlib
+import struct
+import tarfile
+import time
+import zlib
+from http.client import HTTPException
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+CHUNK_SIZE = 256 * 1024
+
+ZIP_LOCAL_HEADER = b'PK\x03\x04'
+ZIP_DATA_DESCRIPTOR = b'PK\x07\x08'
+ZIP64_EXTRA_ID = 0x0001
+
+
+class StreamReader:
+    """
+    Read-only file-like wrapper around a response body.
+
+    Counts and hashes every byte read so the archive can be verified after
+    extraction, and supports pushing bytes back for the zip parser. With
+    reopen, a connection that breaks off (or a body that ends short of
+    size) is continued from the next byte: reopen(offset) returns a new
+    body starting there, tried up to retries times, so nothing is kept on
+    disk to resume from.
+    """
+
+    def __init__(self, raw, algorithm: Optional[str] = None,
+                 progress_callback: Optional[Callable[[int], None]] = None,
+                 reopen: Optional[Callable[[int], Any]] = None, retries: int = 5, size: Optional[int] = None):
+        self.raw = raw
+        self.digest = hashlib.new(algorithm) if algorithm else None
+        self.progress_callback = progress_callback
+        self.reopen = reopen
+        self.retries = retries
+        self.size = size
+        self.pending = b''
+        self.bytes_read = 0
+
+    def _read_resuming(self, size: int) -> bytes:
+        attempt = 0
+        while True:
+            try:
+                if self.raw is None:
+                    self.raw = self.reopen(self.bytes_read)
+                data = self.raw.read(size)
+                if data or not size or not self.size or self.bytes_read >= self.size:
+                    return data
+                raise EOFError(f"Stream ended after {self.bytes_read} of {self.size} bytes")
+            except (HTTPException, OSError, EOFError):
+                attempt += 1
+                if not self.reopen or attempt > self.retries:
+                    raise
+                self.raw = None
+                time.sleep(min(2 ** attempt * 0.1, 5))
+
+    def _read_raw(self, size: int) -> bytes:
+        data = self._read_resuming(size)
+        if data:
+            self.bytes_read += len(data)
+            if self.digest:
+                self.digest.update(data)
+            if self.progress_callback:
+                self.progress_callback(self.bytes_read)
+        return data
+
+    def read(self, size: int = -1) -> bytes:
+        if self.pending:
+            if 0 <= size <= len(self.pending):
+                data, self.pending = self.pending[:size], self.pending[size:]
+                return data
+            # Top up from the stream so format sniffing sees a full block
+            data, self.pending = self.pending, b''
+            return data + self._read_raw(size if size < 0 else size - len(data))
+        return self._read_raw(size)
+
+    def read_exact(self, size: int) -> bytes:
+        """Read exactly size bytes, failing on a truncated stream"""
+        parts = []
+        while size > 0:
+            data = self.read(min(size, CHUNK_SIZE))
+            if not data:
+                raise EOFError("Archive stream ended unexpectedly")
+            parts.append(data)
+            size -= len(data)
+        return b''.join(parts)
+
+    def unread(self, data: bytes) -> None:
+        self.pending = data + self.pending
+
+    def drain(self) -> None:
+        """Consume the rest of the stream (so the checksum covers all of it)"""
+        while self.read(CHUNK_SIZE):
+            pass
+
+    def hexdigest(self) -> Optional[str]:
+        return self.digest.hexdigest() if self.digest else None
+
+
+def _wanted_name(member_name: str, wanted: Dict[str, Path]) -> Optional[str]:
+    """Return the wanted basename matched by an archive member path"""
+    name = member_name.rstrip('/').rsplit('/', 1)[-1]
+    return name if name in wanted else None
+
+
+def _extract_tar_stream(reader: StreamReader, wanted: Dict[str, Path], stop_early: bool) -> Dict[str, Path]:
+    """Extract wanted members from a sequential (r|*) tar stream"""
+    extracted = {}
+    with tarfile.open(fileobj=reader, mode='r|*') as tar:
+        for member in tar:
+            name = _wanted_name(member.name, wanted)
+            if not name or not member.isfile() or name in extracted:
+                continue
+
+            source = tar.extractfile(member)
+            with open(wanted[name], 'wb') as f:
+                for block in iter(lambda: source.read(CHUNK_SIZE), b''):
+                    f.write(block)
+            extracted[name] = wanted[name]
+
+            if stop_early and len(extracted) == len(wanted):
+                break
+    return extracted
+
+
+def _zip64_sizes(extra: bytes) -> Optional[tuple]:
+    """Return (uncompressed, compressed) sizes from a zip64 extra field, if present"""
+    pos = 0
+    while pos + 4 <= len(extra):
+        header_id, size = struct.unpack('<HH', extra[pos:pos + 4])
+        if header_id == ZIP64_EXTRA_ID and size >= 16:
+            return struct.unpack('<QQ', extra[pos + 4:pos + 20])
+        pos += 4 + size
+    return None
+
+
+def _copy_zip_entry(reader: StreamReader, out, method: int, compressed_size: Optional[int]) -> None:
+    """
+    Copy (and inflate) one entry's data to out, or discard it if out is None.
+
+    With a known compressed size exactly that many bytes are consumed;
+    otherwise the deflate stream's own end marker ends the entry.
+    """
+    inflater = zlib.decompressobj(-zlib.MAX_WBITS) if method == 8 else None
+    remaining = compressed_size
+
+    while remaining is None or remaining > 0:
+        data = reader.read(CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining))
+        if not data:
+            raise EOFError("Archive stream ended inside a zip entry")
+        if remaining is not None:
+            remaining -= len(data)
+
+        if inflater:
+            output = inflater.decompress(data)
+            if inflater.eof:
+                if remaining is None:
+                    reader.unread(inflater.unused_data)
+                if out:
+                    out.write(output)
+                return
+        else:
+            output = data
+        if out:
+            out.write(output)
+
+
+def _extract_zip_stream(reader: StreamReader, wanted: Dict[str, Path], stop_early: bool) -> Dict[str, Path]:
+    """Extract wanted members by walking zip local file headers in order"""
+    extracted = {}
+    while True:
+        signature = reader.read(4)
+        if len(signature) < 4:
+            signature += reader.read_exact(4 - len(signature)) if signature else b''
+        if signature != ZIP_LOCAL_HEADER:
+            # Central directory (or end of stream): no more entries
+            reader.unread(signature)
+            break
+
+        header = reader.read_exact(26)
+        (_, flags, method, _, _, _, compressed_size, size,
+         name_length, extra_length) = struct.unpack('<HHHHHIIIHH', header)
+        member_name = reader.read_exact(name_length).decode('utf-8', errors='replace')
+        extra = reader.read_exact(extra_length)
+
+        zip64 = _zip64_sizes(extra)
+        if zip64 and compressed_size == 0xFFFFFFFF:
+            size, compressed_size = zip64
+
+        has_descriptor = bool(flags & 0x08)
+        if method not in (0, 8) or (has_descriptor and method != 8):
+            raise ValueError(f"Cannot stream zip entry {member_name} (method {method})")
+
+        name = _wanted_name(member_name, wanted)
+        if name and not member_name.endswith('/') and name not in extracted:
+            with open(wanted[name], 'wb') as f:
+                _copy_zip_entry(reader, f, method, None if has_descriptor else compressed_size)
+            extracted[name] = wanted[name]
+        else:
+            _copy_zip_entry(reader, None, method, None if has_descriptor else compressed_size)
+
+        if has_descriptor:
+            # Optional signature, then CRC and sizes (64-bit for zip64 entries)
+            first = reader.read_exact(4)
+            if first == ZIP_DATA_DESCRIPTOR:
+                reader.read_exact(4)
+            reader.read_exact(16 if zip64 else 8)
+
+        if stop_early and len(extracted) == len(wanted):
+            break
+    return extracted
+
+
+def extract_members(reader: StreamReader, wanted: Dict[str, Path], stop_early: bool = False) -> Dict[str, Path]:
+    """
+    Extract members whose basename is a key of wanted to the mapped paths.
+
+    The archive type (zip, or tar with any compression) is detected from
+    the stream itself. With stop_early the rest of the archive is not read
+    once every wanted member has been found.
+
+    Returns:
+        Mapping of the basenames that were found to the files written
+    """
+    magic = reader.read(4)
+    reader.unread(magic)
+
+    if magic == ZIP_LOCAL_HEADER:
+        return _extract_zip_stream(reader, wanted, stop_early)
+    return _extract_tar_stream(reader, wanted, stop_early)
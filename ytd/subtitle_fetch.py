@@ -0,0 +1,190 @@
+"""Fetch subtitles after the media, spaced out per host to stay under rate limits"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from yt_dlp.postprocessor.common import PostProcessor
+from yt_dlp.utils import subtitles_filename
+
+from .retry import FailedItem, HostCooldowns, RetryPolicy, RetryScheduler, causes_cooldown, host_of
+
+DEFAULT_SUBTITLE_INTERVAL = 2.0  # Seconds between subtitle requests to one host, once the burst is spent
+DEFAULT_SUBTITLE_BURST = 3
+DEFERRED_SUBTITLES_KEY = '__ytd_deferred_subtitles'  # requested_subtitles held back until after the media
+
+
+class MissingSubtitlesError(OSError):
+    """
+    Raised when a video's subtitles could not be fetched even after retrying.
+
+    Not a PostProcessingError, which yt-dlp swallows with ignoreerrors: this
+    one fails the video, so it isn't recorded in the download archive.
+    """
+
+
+class TokenBucket:
+    """Lets burst requests through at once, then one per interval"""
+
+    def __init__(self, interval: float = DEFAULT_SUBTITLE_INTERVAL, burst: int = DEFAULT_SUBTITLE_BURST,
+                 clock: Callable[[], float] = time.monotonic):
+        self.interval = interval
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.tokens = float(self.burst)
+        self.updated = clock()
+
+    def take(self) -> float:
+        """Reserve a token, returning how long to wait before using it"""
+        now = self.clock()
+        if self.interval > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) / self.interval)
+        else:
+            self.tokens = self.burst
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens * self.interval)
+
+
+class HostTokenBuckets:
+    """A TokenBucket per host"""
+
+    def __init__(self, interval: float = DEFAULT_SUBTITLE_INTERVAL, burst: int = DEFAULT_SUBTITLE_BURST):
+        self.interval = interval
+        self.burst = burst
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, host: str, sleep: Callable[[float], None] = time.sleep) -> float:
+        """Block until a request to host may start, returning the time waited"""
+        with self.lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = self._buckets[host] = TokenBucket(self.interval, self.burst)
+            wait = bucket.take()
+        if wait > 0:
+            sleep(wait)
+        return wait
+
+
+class SubtitleFetcher:
+    """
+    Downloads each video's subtitles once its media is done.
+
+    yt-dlp fetches subtitles right before each video, so a playlist
+    interleaves subtitle and media requests and quickly draws 429s from
+    YouTube's caption endpoint. Attached to a YoutubeDL, the fetcher holds
+    back each video's requested subtitles (from the one extraction that
+    also picked its formats) and writes them next to the finished file,
+    before the video is recorded in the download archive. Requests are
+    spaced by a token bucket per host; rate-limited ones cool the host
+    down and are retried.
+    """
+
+    def __init__(self, interval: float = DEFAULT_SUBTITLE_INTERVAL, burst: int = DEFAULT_SUBTITLE_BURST,
+                 policy: Optional[RetryPolicy] = None, cooldowns: Optional[HostCooldowns] = None,
+                 logger: Optional[logging.Logger] = None, sleep: Callable[[float], None] = time.sleep):
+        self.buckets = HostTokenBuckets(interval, burst)
+        self.policy = policy or RetryPolicy()
+        self.cooldowns = cooldowns or HostCooldowns()
+        self.logger = logger or logging.getLogger(__name__)
+        self.sleep = sleep
+
+    def attach(self, ydl) -> None:
+        ydl.add_post_processor(_DeferSubtitlesPP(ydl), when='video')
+        ydl.add_post_processor(_FetchSubtitlesPP(self, ydl), when='after_move')
+
+    def _fetch(self, ydl, job: Dict) -> None:
+        sub = job['sub']
+        if sub.get('data') is not None:
+            with open(job['path'], 'w', encoding='utf-8', newline='') as f:
+                f.write(sub['data'])
+            return
+        host = host_of(sub['url'])
+        self.cooldowns.wait(host, self.sleep)
+        self.buckets.acquire(host, self.sleep)
+        sub = {**sub, 'http_headers': sub.get('http_headers') or job['http_headers']}
+        if not ydl.dl(job['path'], sub, subtitle=True):
+            raise OSError(f"Unable to download {job['lang']} subtitles")
+
+    def _attempt(self, ydl, job: Dict) -> List[str]:
+        """Errors of one fetch of job (none if it succeeded)"""
+        try:
+            self._fetch(ydl, job)
+        except Exception as e:
+            return [str(e)]
+        return []
+
+    def fetch(self, ydl, filepath: str, info: Dict, subtitles: Dict[str, Dict]) -> Dict[str, Dict]:
+        """
+        Fetch the subtitles of the finished file at filepath with ydl.
+
+        Returns:
+            The subtitles written, by language, each with its filepath
+
+        Raises:
+            MissingSubtitlesError: if some could not be fetched even after
+                retrying, so the video isn't archived without them
+        """
+        written: Dict[str, Dict] = {}
+        failures = []
+        for lang, sub in subtitles.items():
+            path = subtitles_filename(filepath, lang, sub['ext'])
+            job = {'url': sub.get('url'), 'title': f"{info.get('title') or info.get('id')} [{lang}]",
+                   'lang': lang, 'sub': sub, 'path': path, 'http_headers': info.get('http_headers')}
+            errors = [] if os.path.exists(path) else self._attempt(ydl, job)
+            if not errors:
+                written[lang] = {**sub, 'filepath': path}
+                continue
+            failure = FailedItem(job, errors)
+            if causes_cooldown(failure.error_class):
+                length = self.cooldowns.penalize(failure.host)
+                self.logger.warning(f"{failure.host} is rate limiting subtitles; pausing it for {length:.0f}s")
+            failures.append(failure)
+
+        if failures:
+            recovered, given_up = RetryScheduler(self.policy, self.cooldowns, self.logger, self.sleep).run(
+                failures, lambda failure: self._attempt(ydl, failure.item))
+            for failure in recovered:
+                written[failure.item['lang']] = {**failure.item['sub'], 'filepath': failure.item['path']}
+            if given_up:
+                for failure in given_up:
+                    self.logger.error(f"Could not fetch subtitles for {failure.label}: {failure.errors[-1]}")
+                raise MissingSubtitlesError(
+                    f"Missing {', '.join(failure.item['lang'] for failure in given_up)} subtitles for "
+                    f"{info.get('title') or info.get('id')}; not archived, so the next run fetches them")
+        return written
+
+
+class _DeferSubtitlesPP(PostProcessor):
+    """Hold requested subtitles back so yt-dlp doesn't fetch them before the media"""
+
+    @classmethod
+    def pp_key(cls):
+        return 'DeferSubtitles'
+
+    def run(self, info):
+        subtitles = info.pop('requested_subtitles', None)
+        if subtitles:
+            info[DEFERRED_SUBTITLES_KEY] = subtitles
+        return [], info
+
+
+class _FetchSubtitlesPP(PostProcessor):
+    """Fetch the held back subtitles next to the finished file (and report them as written)"""
+
+    def __init__(self, fetcher: SubtitleFetcher, downloader=None):
+        super().__init__(downloader)
+        self.fetcher = fetcher
+
+    @classmethod
+    def pp_key(cls):
+        return 'FetchSubtitles'
+
+    def run(self, info):
+        subtitles = info.get(DEFERRED_SUBTITLES_KEY)
+        if subtitles and info.get('filepath'):
+            info['requested_subtitles'] = self.fetcher.fetch(self._downloader, info['filepath'], info, subtitles)
+        return [], info
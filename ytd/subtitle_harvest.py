@@ -0,0 +1,284 @@
+"""Bulk subtitle harvesting: caption tracks for many videos, without the media pipeline"""
+
+import logging
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+import yt_dlp
+from yt_dlp.utils import determine_ext, sanitize_url, subtitles_filename
+
+from .convert_subtitles import parse_subtitles, track_to_srt
+from .http_pool import HTTPPool
+from .prefetch import DEFAULT_HOST_INTERVAL, InfoCache, MetadataPrefetcher
+from .retry import FailedItem, HostCooldowns, RetryPolicy, RetryScheduler, causes_cooldown, host_of
+from .subtitle_fetch import DEFAULT_SUBTITLE_BURST, HostTokenBuckets
+
+DEFAULT_HARVEST_JOBS = 8
+DEFAULT_HARVEST_INTERVAL = 0.5  # Seconds between caption requests to one host, once the burst is spent
+
+VIDEO_ID_RE = re.compile(r'^[\w-]{11}$')
+
+
+def to_url(item: str) -> str:
+    """URL for a harvest input: URLs pass through, bare YouTube ids become watch URLs"""
+    item = item.strip()
+    if VIDEO_ID_RE.match(item):
+        return f'https://www.youtube.com/watch?v={item}'
+    return item
+
+
+def archive_id(entry: Dict) -> Optional[str]:
+    """yt-dlp style archive line for an entry ("extractor id"), if it can be told"""
+    extractor = entry.get('ie_key') or entry.get('extractor_key')
+    if not (extractor and entry.get('id')):
+        return None
+    return f"{extractor.lower()} {entry['id']}"
+
+
+class SubtitleHarvester:
+    """
+    Fetches caption tracks for lists and playlists of videos in bulk.
+
+    Only metadata is extracted (concurrently, via MetadataPrefetcher and
+    its InfoCache), tracks are picked with yt-dlp's own language and format
+    selection, and fetched on a pool of workers over pooled keep-alive
+    connections, spaced by a token bucket per host. VTT is converted to SRT
+    in memory, so only the requested format is written. Videos listed in
+    the archive are skipped before extraction, and rate-limited tracks are
+    retried after the host cools down.
+    """
+
+    def __init__(self, output_dir: Path, langs: Iterable[str] = ('en',), convert: Optional[str] = None,
+                 jobs: int = DEFAULT_HARVEST_JOBS, interval: float = DEFAULT_HARVEST_INTERVAL,
+                 burst: int = DEFAULT_SUBTITLE_BURST, archive: Optional[Path] = None,
+                 params: Optional[Dict] = None, cache: Optional[InfoCache] = None,
+                 policy: Optional[RetryPolicy] = None, logger: Optional[logging.Logger] = None,
+                 ydl_factory: Callable[[Dict], yt_dlp.YoutubeDL] = yt_dlp.YoutubeDL,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.output_dir = Path(output_dir)
+        self.convert = convert if convert in ('srt', 'vtt') else None
+        self.jobs = max(1, jobs)
+        self.logger = logger or logging.getLogger(__name__)
+        self.sleep = sleep
+        self.params = {
+            'quiet': True,
+            'no_warnings': True,
+            'logger': self.logger,
+            'outtmpl': str(self.output_dir / '%(title)s.%(ext)s'),
+            'writesubtitles': True,
+            'writeautomaticsub': True,
+            'subtitleslangs': list(langs),
+            'subtitlesformat': 'vtt/srt/best',
+            **(params or {}),
+        }
+        self.ydl_factory = ydl_factory
+        self.cache = cache if cache is not None else InfoCache()
+        self.buckets = HostTokenBuckets(interval, burst)
+        self.cooldowns = HostCooldowns()
+        self.policy = policy or RetryPolicy()
+        # One kept-alive connection per worker and caption host
+        self.client = HTTPPool(pool_size=self.jobs,
+                               headers={'User-Agent': yt_dlp.utils.networking.random_user_agent()})
+        self.archive = Path(archive) if archive else None
+        self._archived: Set[str] = set()
+        self._archive_lock = threading.Lock()
+        if self.archive and self.archive.exists():
+            self._archived = {line.strip() for line in self.archive.read_text().splitlines() if line.strip()}
+        self.stats = {'videos': 0, 'tracks': 0, 'skipped': 0, 'without_subtitles': 0, 'failed': 0}
+        self._stats_lock = threading.Lock()
+        self.failed: List[FailedItem] = []
+
+    def _count(self, key: str, n: int = 1) -> None:
+        with self._stats_lock:
+            self.stats[key] += n
+
+    def _entries(self, ydl: yt_dlp.YoutubeDL, urls: Iterable[str]) -> Iterator[Dict]:
+        """
+        Flat entries for the inputs, playlists expanded without extracting their videos.
+
+        Video ids and URLs become url results without any request, so they
+        are checked against the archive and extracted on the prefetch
+        workers like playlist entries.
+        """
+        for url in urls:
+            url = to_url(url)
+            entry = _video_url_result(ydl, url)
+            if entry:
+                yield entry
+                continue
+            try:
+                result = ydl.extract_info(url, download=False, process=False)
+            except Exception as e:
+                self.logger.error(f"Could not extract {url}: {e}")
+                self._count('failed')
+                continue
+            yield from _flatten(result)
+
+    def _skip(self, entry: Dict) -> bool:
+        if self._is_archived(entry):
+            self._count('skipped')
+            return True
+        return False
+
+    def _is_archived(self, entry: Dict) -> bool:
+        key = archive_id(entry)
+        with self._archive_lock:
+            return key is not None and key in self._archived
+
+    def _record(self, info: Dict) -> None:
+        key = archive_id(info)
+        if not self.archive or key is None:
+            return
+        with self._archive_lock:
+            if key in self._archived:
+                return
+            self._archived.add(key)
+            with open(self.archive, 'a', encoding='utf-8') as f:
+                f.write(key + '\n')
+
+    def _tracks(self, ydl: yt_dlp.YoutubeDL, info: Dict) -> Dict[str, Dict]:
+        """Requested caption tracks of info, chosen the way yt-dlp would"""
+        for kind in ('subtitles', 'automatic_captions'):
+            for formats in (info.get(kind) or {}).values():
+                for fmt in formats:
+                    if fmt.get('url'):
+                        fmt['url'] = sanitize_url(fmt['url'])
+                    if fmt.get('ext') is None:
+                        fmt['ext'] = determine_ext(fmt['url']).lower()
+        return ydl.process_subtitles(info['id'], info.get('subtitles'), info.get('automatic_captions')) or {}
+
+    def _write(self, job: Dict) -> None:
+        """Fetch one track and write it (converted if asked)"""
+        sub = job['sub']
+        if sub.get('data') is not None:
+            content = sub['data']
+        else:
+            host = host_of(sub['url'])
+            self.cooldowns.wait(host, self.sleep)
+            self.buckets.acquire(host, self.sleep)
+            content = self.client.get(sub['url'], sub.get('http_headers')).decode('utf-8', 'replace')
+            self.cooldowns.succeeded(host)
+        if self.convert == 'srt' and sub['ext'] == 'vtt':
+            content = track_to_srt(parse_subtitles(content))
+        tmp = job['path'] + '.part'
+        with open(tmp, 'w', encoding='utf-8', newline='') as f:
+            f.write(content)
+        os.replace(tmp, job['path'])
+
+    def _attempt(self, job: Dict) -> List[str]:
+        try:
+            self._write(job)
+        except Exception as e:
+            return [str(e)]
+        return []
+
+    def _fetch_video(self, ydl: yt_dlp.YoutubeDL, info: Dict) -> None:
+        """Fetch all requested tracks of one extracted video (on a worker)"""
+        # Each video is fetched once; keeping every info dict would grow without bound
+        self.cache.discard(info)
+        tracks = self._tracks(ydl, info)
+        if not tracks:
+            self._count('without_subtitles')
+            self._record(info)
+            return
+        base = ydl.prepare_filename({**info, 'ext': 'vtt'})
+        ok = True
+        for lang, sub in tracks.items():
+            ext = 'srt' if self.convert == 'srt' and sub['ext'] == 'vtt' else sub['ext']
+            job = {'url': sub.get('url'), 'title': f"{info.get('title') or info['id']} [{lang}]",
+                   'sub': sub, 'path': subtitles_filename(base, lang, ext, 'vtt'), 'info': info}
+            if os.path.exists(job['path']):
+                continue
+            errors = self._attempt(job)
+            if not errors:
+                self._count('tracks')
+                continue
+            ok = False
+            failure = FailedItem(job, errors)
+            if causes_cooldown(failure.error_class):
+                length = self.cooldowns.penalize(failure.host)
+                self.logger.warning(f"{failure.host} is rate limiting captions; pausing it for {length:.0f}s")
+            with self._stats_lock:
+                self.failed.append(failure)
+        if ok:
+            self._record(info)
+
+    def harvest(self, urls: Iterable[str]) -> Dict[str, int]:
+        """
+        Fetch the requested subtitles of every video in urls (videos, ids or playlists).
+
+        Returns:
+            Counts of videos, tracks written, videos skipped (archive), videos
+            without the requested subtitles and failures
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        ydl = self.ydl_factory(dict(self.params))
+        prefetcher = MetadataPrefetcher(self.params, jobs=self.jobs, host_interval=DEFAULT_HOST_INTERVAL,
+                                        cache=self.cache, ydl_factory=self.ydl_factory)
+        pool = ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix='ytd-harvest')
+        # Bounds the videos waiting for a worker, so extraction doesn't run far ahead of fetching
+        slots = threading.BoundedSemaphore(self.jobs * 4)
+        futures: List[Future] = []
+        try:
+            with ydl:
+                entries = (entry for entry in self._entries(ydl, urls) if not self._skip(entry))
+                for info in prefetcher.iter_resolved(entries):
+                    if info.get('_type', 'video') != 'video':
+                        self.logger.error(f"Could not extract {info.get('url')}")
+                        self._count('failed')
+                        continue
+                    self._count('videos')
+                    slots.acquire()
+                    future = pool.submit(self._fetch_video, ydl, info)
+                    future.add_done_callback(lambda _: slots.release())
+                    futures.append(future)
+                for future in futures:
+                    future.result()
+                self._retry_failed()
+        finally:
+            pool.shutdown(wait=True)
+            prefetcher.close()
+            self.client.close()
+        return dict(self.stats)
+
+    def _retry_failed(self) -> None:
+        if not self.failed:
+            return
+        recovered, given_up = RetryScheduler(self.policy, self.cooldowns, self.logger, self.sleep).run(
+            self.failed, lambda failure: self._attempt(failure.item))
+        self._count('tracks', len(recovered))
+        self._count('failed', len(given_up))
+        incomplete = {id(failure.item['info']) for failure in given_up}
+        for failure in recovered:
+            if id(failure.item['info']) not in incomplete:
+                self._record(failure.item['info'])
+        for failure in given_up:
+            self.logger.error(f"Could not fetch subtitles for {failure.label}: {failure.errors[-1]}")
+
+
+def _video_url_result(ydl: yt_dlp.YoutubeDL, url: str) -> Optional[Dict]:
+    """url result for a URL its extractor says is a single video, as a playlist entry would be"""
+    for ie_key, ie in ydl._ies.items():
+        if not ie.suitable(url):
+            continue
+        video_id = ie.get_temp_id(url)
+        if getattr(ie, '_RETURN_TYPE', None) != 'video' or not video_id:
+            return None
+        return {'_type': 'url', 'url': url, 'ie_key': ie_key, 'id': video_id}
+    return None
+
+
+def _flatten(result: Optional[Dict]) -> Iterator[Dict]:
+    """Entries of (nested) playlists; anything else as it is"""
+    if not result:
+        return
+    if result.get('_type') in ('playlist', 'multi_video'):
+        for entry in result.get('entries') or []:
+            yield from _flatten(entry)
+    else:
+        yield result
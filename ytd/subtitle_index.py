@@ -0,0 +1,198 @@
+"""Full-text search index over downloaded subtitle files"""
+
+import itertools
+import os
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .convert_subtitles import iter_file_cues
+
+DEFAULT_INDEX_NAME = '.ytd-index.sqlite'
+SUBTITLE_EXTENSIONS = {'.vtt', '.srt'}
+
+# yt-dlp's default template ends with " [VIDEO_ID]"
+VIDEO_ID_RE = re.compile(r'\[([A-Za-z0-9_-]{11})\]')
+LANG_TAG_RE = re.compile(r'^[a-z]{2,3}(?:-[A-Za-z0-9]+)*$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    video_id TEXT,
+    lang TEXT,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    first_cue INTEGER,
+    last_cue INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_video_id ON files(video_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS cues USING fts5(
+    text,
+    file_id UNINDEXED,
+    start_ms UNINDEXED,
+    end_ms UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+
+def describe_subtitle_file(path: Path) -> Tuple[str, Optional[str]]:
+    """
+    Derive (video_id, language) from a subtitle filename.
+
+    "Title [dQw4w9WgXcQ].en.vtt" -> ("dQw4w9WgXcQ", "en"). Without an id in
+    the name, the title part of the filename is used instead.
+    """
+    stem = path.stem
+    lang = None
+    base, _, tag = stem.rpartition('.')
+    if base and LANG_TAG_RE.match(tag):
+        stem, lang = base, tag
+
+    match = VIDEO_ID_RE.search(stem)
+    return (match.group(1) if match else stem), lang
+
+
+class SubtitleIndex:
+    """Incremental SQLite FTS5 index of subtitle cues"""
+
+    def __init__(self, db_path: Path):
+        self.db_path = Path(db_path)
+        self.conn = sqlite3.connect(str(self.db_path))
+        try:
+            self.conn.executescript(SCHEMA)
+        except sqlite3.OperationalError as e:
+            self.conn.close()
+            raise RuntimeError(f"SQLite FTS5 is not available: {e}")
+
+    def close(self) -> None:
+        """Close the database connection"""
+        self.conn.close()
+
+    def __enter__(self) -> 'SubtitleIndex':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def _iter_subtitle_files(self, directory: Path) -> Iterator[Path]:
+        """Walk directory for subtitle files, skipping hidden directories"""
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+            for name in files:
+                if os.path.splitext(name)[1].lower() in SUBTITLE_EXTENSIONS:
+                    yield Path(root) / name
+
+    def _delete_cues(self, file_id: int) -> None:
+        """
+        Remove the cues of one file.
+
+        file_id is an UNINDEXED FTS5 column, so filtering on it scans every
+        cue; each file's cues occupy a contiguous rowid range instead.
+        """
+        first, last = self.conn.execute(
+            "SELECT first_cue, last_cue FROM files WHERE id = ?", (file_id,)).fetchone()
+        self.conn.execute("DELETE FROM cues WHERE rowid BETWEEN ? AND ?", (first, last))
+
+    def _index_file(self, path: Path, stat: os.stat_result, file_id: Optional[int]) -> None:
+        """(Re)index the cues of one file"""
+        video_id, lang = describe_subtitle_file(path)
+
+        if file_id is not None:
+            self._delete_cues(file_id)
+            self.conn.execute(
+                "UPDATE files SET video_id = ?, lang = ?, size = ?, mtime_ns = ? WHERE id = ?",
+                (video_id, lang, stat.st_size, stat.st_mtime_ns, file_id))
+        else:
+            cursor = self.conn.execute(
+                "INSERT INTO files (path, video_id, lang, size, mtime_ns) VALUES (?, ?, ?, ?, ?)",
+                (str(path), video_id, lang, stat.st_size, stat.st_mtime_ns))
+            file_id = cursor.lastrowid
+
+        last = self.conn.execute("SELECT rowid FROM cues ORDER BY rowid DESC LIMIT 1").fetchone()
+        first = last[0] + 1 if last else 1
+        rowids = itertools.count(first)
+        self.conn.executemany(
+            "INSERT INTO cues (rowid, text, file_id, start_ms, end_ms) VALUES (?, ?, ?, ?, ?)",
+            ((next(rowids), text, file_id, start, end) for start, end, text in iter_file_cues(path)))
+        # A file without cues gets an empty range (last_cue < first_cue)
+        self.conn.execute("UPDATE files SET first_cue = ?, last_cue = ? WHERE id = ?",
+                          (first, next(rowids) - 1, file_id))
+
+    def update(self, directory: Path) -> Dict[str, int]:
+        """
+        Bring the index up to date with the subtitle files under directory.
+
+        Files are only re-read when their size or mtime changed, and
+        entries for files that disappeared are removed.
+        """
+        directory = Path(directory).resolve()
+        stats = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+
+        known = {}
+        prefix = str(directory) + os.sep
+        for file_id, path, size, mtime_ns in self.conn.execute(
+                "SELECT id, path, size, mtime_ns FROM files"):
+            if path.startswith(prefix):
+                known[path] = (file_id, size, mtime_ns)
+
+        with self.conn:
+            for path in self._iter_subtitle_files(directory):
+                stat = path.stat()
+                entry = known.pop(str(path), None)
+                if entry and entry[1:] == (stat.st_size, stat.st_mtime_ns):
+                    stats['unchanged'] += 1
+                    continue
+
+                self._index_file(path, stat, entry[0] if entry else None)
+                stats['updated' if entry else 'added'] += 1
+
+            for file_id, _, _ in known.values():
+                self._delete_cues(file_id)
+                self.conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+                stats['removed'] += 1
+
+        return stats
+
+    def search(self, query: str, limit: int = 20) -> List[Dict[str, Any]]:
+        """
+        Search cue text, best matches first.
+
+        The query uses FTS5 syntax ("exact phrase", word1 OR word2, pref*);
+        if it doesn't parse, it is searched as a literal phrase instead.
+        """
+        sql = """
+            SELECT files.path, files.video_id, files.lang, cues.start_ms, cues.end_ms, cues.text
+            FROM cues JOIN files ON files.id = cues.file_id
+            WHERE cues MATCH ?
+            ORDER BY cues.rank
+            LIMIT ?
+        """
+        try:
+            rows = self.conn.execute(sql, (query, limit)).fetchall()
+        except sqlite3.OperationalError:
+            phrase = '"' + query.replace('"', '""') + '"'
+            rows = self.conn.execute(sql, (phrase, limit)).fetchall()
+
+        return [{
+            'path': path,
+            'video_id': video_id,
+            'lang': lang,
+            'start_ms': start_ms,
+            'end_ms': end_ms,
+            'text': text,
+        } for path, video_id, lang, start_ms, end_ms, text in rows]
+
+
+def build_index(directory: Path, db_path: Optional[Path] = None) -> Tuple[Dict[str, int], float]:
+    """Update the index for directory, returning (stats, elapsed seconds)"""
+    directory = Path(directory)
+    db_path = db_path or directory / DEFAULT_INDEX_NAME
+
+    started = time.perf_counter()
+    with SubtitleIndex(db_path) as index:
+        stats = index.update(directory)
+    return stats, time.perf_counter() - started
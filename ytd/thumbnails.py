@@ -0,0 +1,204 @@
+"""Fetch, convert and resize cover art concurrently, ahead of the embed step"""
+
+import io
+import logging
+import os
+import shutil
+import subprocess
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, Optional
+
+from yt_dlp.postprocessor.common import PostProcessor
+from yt_dlp.utils import replace_extension
+
+from .ffmpeg_helper import get_ffmpeg_command
+from .http_pool import HTTPPool
+from .store import FROM_STORE_KEY
+
+try:
+    from PIL import Image
+except ImportError:  # Optional; ffmpeg converts instead
+    Image = None
+
+DEFAULT_THUMBNAIL_CACHE_NAME = '.ytd-thumbnails'
+DEFAULT_THUMBNAIL_JOBS = 4
+DEFAULT_THUMBNAIL_SIZE = 1280  # Longest side of embedded cover art, in pixels
+DEFAULT_AHEAD = 8  # Playlist entries whose thumbnails are fetched ahead of the download
+JPEG_QUALITY = 90
+
+
+def _safe(part: str) -> str:
+    return ''.join(c if c.isalnum() or c in '-_.' else '_' for c in str(part))
+
+
+def best_thumbnail(info: Dict) -> Optional[str]:
+    """URL of the largest (or most preferred) thumbnail of info"""
+    thumbnails = [t for t in info.get('thumbnails') or [] if t.get('url')]
+    if thumbnails:
+        best = max(enumerate(thumbnails), key=lambda item: (
+            item[1].get('preference') or 0, (item[1].get('width') or 0) * (item[1].get('height') or 0), item[0]))
+        return best[1]['url']
+    return info.get('thumbnail')
+
+
+def convert_image(data: bytes, dest: Path, max_size: int = DEFAULT_THUMBNAIL_SIZE) -> None:
+    """
+    Write image data as a JPEG no larger than max_size on its longest side.
+
+    Decoded in-process with Pillow when it is installed, otherwise by an
+    ffmpeg process reading from a pipe. 0 keeps the original size.
+    """
+    dest = Path(dest)
+    tmp = dest.with_name(dest.name + '.part')
+    if Image is not None:
+        with Image.open(io.BytesIO(data)) as image:
+            image = image.convert('RGB')
+            if max_size:
+                image.thumbnail((max_size, max_size))
+            image.save(tmp, 'JPEG', quality=JPEG_QUALITY)
+    else:
+        scale = []
+        if max_size:
+            scale = ['-vf', f"scale='min({max_size},iw)':'min({max_size},ih)':force_original_aspect_ratio=decrease"]
+        cmd = [get_ffmpeg_command(), '-y', '-loglevel', 'error', '-i', 'pipe:0', *scale,
+               '-frames:v', '1', '-q:v', '2', '-f', 'image2', '-c:v', 'mjpeg', str(tmp)]
+        result = subprocess.run(cmd, input=data, capture_output=True)
+        if result.returncode != 0:
+            tmp.unlink(missing_ok=True)
+            raise OSError(f"ffmpeg could not convert the thumbnail: {result.stderr.decode(errors='replace').strip()}")
+    os.replace(tmp, dest)
+
+
+class ThumbnailPipeline:
+    """
+    Cover art for a run's downloads, prepared on a bounded worker pool.
+
+    yt-dlp fetches each thumbnail right before its video and converts it
+    with an ffmpeg process on the download thread. Here thumbnails are
+    fetched over pooled connections and converted and resized (see
+    convert_image) by jobs workers while the media downloads, and kept in
+    cache_dir by video id so later runs and other playlists reuse them.
+    The embed step only waits for an image that is usually ready already.
+    """
+
+    def __init__(self, cache_dir: Path, jobs: int = DEFAULT_THUMBNAIL_JOBS,
+                 max_size: int = DEFAULT_THUMBNAIL_SIZE, logger: Optional[logging.Logger] = None):
+        self.cache_dir = Path(cache_dir)
+        self.jobs = max(1, jobs)
+        self.max_size = max_size
+        self.logger = logger or logging.getLogger(__name__)
+        self.http = HTTPPool(pool_size=self.jobs)
+        self._executor = ThreadPoolExecutor(max_workers=self.jobs, thread_name_prefix='ytd-thumbnail')
+        self._futures: Dict[str, Future] = {}
+        self.lock = threading.Lock()
+
+    def path_for(self, info: Dict) -> Path:
+        """Cached cover art of a video, at this pipeline's size"""
+        extractor = info.get('extractor_key') or info.get('ie_key') or info.get('extractor') or 'generic'
+        size = self.max_size or 'full'
+        return self.cache_dir / f"{_safe(extractor).lower()}_{_safe(info['id'])}_{size}.jpg"
+
+    def _prepare(self, url: str, path: Path) -> Optional[Path]:
+        try:
+            data = self.http.get(url)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            convert_image(data, path, self.max_size)
+        except Exception as e:
+            self.logger.warning(f"Could not prepare thumbnail {url}: {e}")
+            return None
+        return path
+
+    def submit(self, info: Dict) -> Optional[Future]:
+        """Start preparing the thumbnail of info (once per video)"""
+        url = best_thumbnail(info)
+        if not (url and info.get('id')):
+            return None
+        path = self.path_for(info)
+        with self.lock:
+            future = self._futures.get(str(path))
+            if future is None:
+                if path.exists():
+                    future = Future()
+                    future.set_result(path)
+                else:
+                    future = self._executor.submit(self._prepare, url, path)
+                self._futures[str(path)] = future
+        return future
+
+    def result(self, info: Dict) -> Optional[Path]:
+        """Prepared thumbnail of info, waiting for it if needed"""
+        future = self.submit(info)
+        return future.result() if future else None
+
+    def submit_ahead(self, entries: Iterable, ahead: int = DEFAULT_AHEAD) -> Iterator:
+        """
+        Pass entries through, preparing thumbnails up to ahead entries early.
+
+        Only entries that are already extracted are submitted; flat playlist
+        entries carry small previews rather than the video's cover art.
+        """
+        pending = deque()
+        for entry in entries:
+            if entry and entry.get('_type', 'video') == 'video':
+                self.submit(entry)
+            pending.append(entry)
+            if len(pending) > ahead:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+
+    def attach(self, ydl) -> None:
+        """Prepare each video's thumbnail while it downloads; attach before the embed postprocessor"""
+        ydl.add_post_processor(_ThumbnailSubmitPP(self, ydl), when='video')
+        ydl.add_post_processor(_ThumbnailReadyPP(self, ydl), when='post_process')
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.http.close()
+
+
+class _ThumbnailSubmitPP(PostProcessor):
+    def __init__(self, pipeline: ThumbnailPipeline, downloader=None):
+        super().__init__(downloader)
+        self.pipeline = pipeline
+
+    @classmethod
+    def pp_key(cls):
+        return 'ThumbnailSubmit'
+
+    def run(self, info):
+        self.pipeline.submit(info)
+        return [], info
+
+
+class _ThumbnailReadyPP(PostProcessor):
+    """Put the prepared cover art next to the media, where the embed step looks"""
+
+    def __init__(self, pipeline: ThumbnailPipeline, downloader=None):
+        super().__init__(downloader)
+        self.pipeline = pipeline
+
+    @classmethod
+    def pp_key(cls):
+        return 'ThumbnailReady'
+
+    def run(self, info):
+        if info.get(FROM_STORE_KEY) or not info.get('filepath'):
+            return [], info
+        cached = self.pipeline.result(info)
+        if not cached:
+            return [], info
+        # A copy, as the embed step deletes the thumbnail it used
+        dest = replace_extension(info['filepath'], 'jpg')
+        if dest == info['filepath']:
+            return [], info
+        try:
+            os.link(cached, dest + '.part')
+        except OSError:
+            shutil.copyfile(cached, dest + '.part')
+        os.replace(dest + '.part', dest)
+        info['thumbnails'] = [*(info.get('thumbnails') or []), {'id': 'ytd', 'url': str(cached), 'filepath': dest}]
+        return [], info
@@ -0,0 +1,142 @@
+"""Subtitle timestamp arithmetic on integer milliseconds"""
+
+import re
+from array import array
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Accepts both VTT (00:01:02.500, 01:02.500) and SRT (00:01:02,500) forms
+TIMESTAMP_RE = re.compile(r'^(?:(\d+):)?(\d{1,2}):(\d{2})[.,](\d{1,3})$')
+
+
+def parse_timestamp(value: str) -> int:
+    """Parse a VTT/SRT timestamp (HH:MM:SS.mmm or MM:SS.mmm) to milliseconds"""
+    match = TIMESTAMP_RE.match(value.strip())
+    if not match:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+
+    hours, minutes, seconds, fraction = match.groups()
+    if int(minutes) > 59 or int(seconds) > 59:
+        raise ValueError(f"Invalid timestamp: {value!r}")
+
+    # Pad the fraction so that "1.5" means 500ms rather than 5ms
+    millis = int(fraction.ljust(3, '0'))
+    return ((int(hours or 0) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + millis
+
+
+def format_timestamp(ms: int, separator: str = ',') -> str:
+    """Format milliseconds as HH:MM:SS,mmm (use separator='.' for VTT)"""
+    ms = max(0, int(ms))
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{ms:03d}"
+
+
+def parse_timing_line(line: str) -> Optional[Tuple[int, int]]:
+    """
+    Parse a cue timing line into (start_ms, end_ms).
+
+    Cue settings after the end timestamp (align:start position:0% ...)
+    are ignored. Returns None if the line is not a valid timing line.
+    """
+    if '-->' not in line:
+        return None
+
+    start, _, rest = line.partition('-->')
+    rest = rest.split()
+    if not rest:
+        return None
+
+    try:
+        return parse_timestamp(start), parse_timestamp(rest[0])
+    except ValueError:
+        return None
+
+
+class SubtitleTrack:
+    """
+    A subtitle track stored as parallel columns.
+
+    Start and end times live in integer arrays so that bulk operations
+    (shift, rescale, clamp, cut) run over whole columns instead of
+    re-parsing timestamp strings cue by cue.
+    """
+
+    def __init__(self, cues: Iterable[Tuple[int, int, str]] = ()):
+        self.starts = array('q')
+        self.ends = array('q')
+        self.texts: List[str] = []
+        for start, end, text in cues:
+            self.append(start, end, text)
+
+    def append(self, start: int, end: int, text: str) -> None:
+        """Append a cue to the end of the track"""
+        self.starts.append(start)
+        self.ends.append(end)
+        self.texts.append(text)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __iter__(self) -> Iterator[Tuple[int, int, str]]:
+        return zip(self.starts, self.ends, self.texts)
+
+    def _replace(self, keep: List[int]) -> None:
+        """Keep only the cues at the given indexes"""
+        self.starts = array('q', (self.starts[i] for i in keep))
+        self.ends = array('q', (self.ends[i] for i in keep))
+        self.texts = [self.texts[i] for i in keep]
+
+    def shift(self, offset_ms: int) -> 'SubtitleTrack':
+        """Shift every cue by offset_ms, dropping cues pushed before zero"""
+        self.starts = array('q', (s + offset_ms for s in self.starts))
+        self.ends = array('q', (e + offset_ms for e in self.ends))
+
+        if offset_ms < 0:
+            keep = [i for i, end in enumerate(self.ends) if end > 0]
+            if len(keep) != len(self):
+                self._replace(keep)
+            self.starts = array('q', (max(0, s) for s in self.starts))
+        return self
+
+    def rescale(self, from_fps: float, to_fps: float) -> 'SubtitleTrack':
+        """Rescale timings for a framerate change (e.g. 25 -> 23.976)"""
+        if from_fps <= 0 or to_fps <= 0:
+            raise ValueError("Framerates must be positive")
+
+        ratio = from_fps / to_fps
+        self.starts = array('q', (round(s * ratio) for s in self.starts))
+        self.ends = array('q', (round(e * ratio) for e in self.ends))
+        return self
+
+    def clamp_overlaps(self, min_gap_ms: int = 0) -> 'SubtitleTrack':
+        """Sort cues and trim each end so it stops before the next cue starts"""
+        order = sorted(range(len(self)), key=self.starts.__getitem__)
+        if order != list(range(len(self))):
+            self._replace(order)
+
+        for i in range(len(self) - 1):
+            limit = self.starts[i + 1] - min_gap_ms
+            if self.ends[i] > limit:
+                self.ends[i] = max(self.starts[i], limit)
+        return self
+
+    def cut(self, start_ms: int, end_ms: int, rebase: bool = True) -> 'SubtitleTrack':
+        """
+        Keep only cues overlapping [start_ms, end_ms), trimmed to the range.
+
+        With rebase=True the result is shifted so that start_ms becomes zero,
+        which is what you want when cutting subtitles for a clip.
+        """
+        if end_ms <= start_ms:
+            raise ValueError("Cut range end must be after its start")
+
+        keep = [i for i in range(len(self))
+                if self.ends[i] > start_ms and self.starts[i] < end_ms]
+        self._replace(keep)
+        self.starts = array('q', (max(s, start_ms) for s in self.starts))
+        self.ends = array('q', (min(e, end_ms) for e in self.ends))
+
+        if rebase and start_ms:
+            self.shift(-start_ms)
+        return self
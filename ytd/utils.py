@@ -1,10 +1,12 @@
 """Utility functions for YouTube Downloader"""
 
+import bisect
 import logging
+import math
 import re
 import yaml
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 from argparse import Namespace
 
 
@@ -100,6 +102,15 @@ def sanitize_filename(filename: str) -> str:
     return filename.strip()
 
 
+def parse_size(size: str) -> int:
+    """Parse a size such as "500M" or "1.5G" to bytes"""
+    size = size.strip().upper().rstrip('B')
+    multipliers = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3, 'T': 1024 ** 4}
+    if size and size[-1] in multipliers:
+        return int(float(size[:-1]) * multipliers[size[-1]])
+    return int(float(size))
+
+
 def format_bytes(bytes: int) -> str:
     """Format bytes to human readable string"""
     for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
@@ -124,20 +135,136 @@ def format_duration(seconds: int) -> str:
         return f"{hours}h {minutes}m {seconds}s"
 
 
-def parse_playlist_items(items_spec: str) -> list:
-    """Parse playlist items specification (e.g., "1-3,7,10-13")"""
-    items = []
-    parts = items_spec.split(',')
-    
-    for part in parts:
-        part = part.strip()
-        if '-' in part:
-            start, end = part.split('-')
-            items.extend(range(int(start), int(end) + 1))
-        else:
-            items.append(int(part))
-    
-    return sorted(set(items))
+class PlaylistItems:
+    """
+    Set of 1-based playlist indexes kept as merged, sorted ranges.
+
+    Ranges are never expanded, so "1-100000" costs the same as "1-3", and
+    membership is a binary search. Open ranges ("50-", "50:") run to the
+    end of the playlist; negative indexes count from the end ("-1" is the
+    last entry, "-10:" the last ten) and are only known once the playlist
+    length is (see resolve).
+    """
+
+    SEGMENT_RE = re.compile(r'''(?x)
+        (?P<single>[+-]?\d+)$
+        | (?P<first>\d+)-(?P<last>\d+)?$
+        | (?P<start>[+-]?\d+)?:(?P<end>[+-]?\d+|inf)?$''')
+
+    def __init__(self, ranges=(), relative=()):
+        """
+        Args:
+            ranges: Inclusive (start, end) positive index ranges; end None is open
+            relative: Inclusive (start, end) ranges with a negative bound
+        """
+        merged = []
+        for start, end in sorted(ranges, key=lambda r: r[0]):
+            end = math.inf if end is None else end
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        self._starts = [start for start, _ in merged]
+        self._ends = [end for _, end in merged]
+        self.relative = tuple(relative)
+
+    @classmethod
+    def parse(cls, spec: str) -> 'PlaylistItems':
+        """
+        Parse "1-3,7,10-13", "50-", "-5:", "3:-2" and similar.
+
+        Raises:
+            ValueError: for malformed, zero or empty segments
+        """
+        ranges, relative = [], []
+        for segment in spec.split(','):
+            segment = segment.strip()
+            match = cls.SEGMENT_RE.match(segment)
+            if not segment or not match:
+                raise ValueError(f"Invalid playlist item {segment!r} (use e.g. 1-3,7,10-)")
+            if match.group('single'):
+                start = end = int(match.group('single'))
+            elif match.group('first'):
+                start = int(match.group('first'))
+                end = int(match.group('last')) if match.group('last') else None
+            else:
+                start = int(match.group('start') or 1)
+                end = match.group('end')
+                end = None if end in (None, 'inf') else int(end)
+
+            if start == 0 or end == 0:
+                raise ValueError(f"Invalid playlist item {segment!r}: indexes start at 1")
+            if start < 0 or (end is not None and end < 0):
+                relative.append((start, -1 if end is None else end))
+            elif end is not None and end < start:
+                raise ValueError(f"Invalid playlist item {segment!r}: range is empty")
+            else:
+                ranges.append((start, end))
+        return cls(ranges, relative)
+
+    @property
+    def last(self) -> Optional[int]:
+        """Highest index wanted, or None if that depends on the playlist length"""
+        if self.relative or not self._ends or self._ends[-1] == math.inf:
+            return None
+        return self._ends[-1]
+
+    def __contains__(self, index: int) -> bool:
+        """Membership of a positive index (negative ranges need resolve first)"""
+        i = bisect.bisect_right(self._starts, index) - 1
+        return i >= 0 and index <= self._ends[i]
+
+    def resolve(self, count: int) -> 'PlaylistItems':
+        """The same items for a playlist of count entries, with only positive bounded ranges"""
+        def absolute(index):
+            return count + 1 + index if index < 0 else index
+
+        ranges = [(start, min(end, count)) for start, end in zip(self._starts, self._ends) if start <= count]
+        for start, end in self.relative:
+            start, end = max(absolute(start), 1), min(absolute(end), count)
+            if start <= end:
+                ranges.append((start, end))
+        return PlaylistItems(ranges)
+
+    def ranges(self) -> List[Tuple[int, Optional[int]]]:
+        """Merged positive ranges, end None when open"""
+        return [(start, None if end == math.inf else end) for start, end in zip(self._starts, self._ends)]
+
+    def __bool__(self) -> bool:
+        return bool(self._starts or self.relative)
+
+    def __iter__(self) -> Iterator[int]:
+        if self.last is None and (self.relative or self._ends):
+            raise ValueError("Open-ended or negative playlist items need resolve(count) first")
+        for start, end in zip(self._starts, self._ends):
+            yield from range(start, end + 1)
+
+    def __len__(self) -> int:
+        if self.last is None and (self.relative or self._ends):
+            raise ValueError("Open-ended or negative playlist items need resolve(count) first")
+        return sum(end - start + 1 for start, end in zip(self._starts, self._ends))
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, PlaylistItems) and str(self) == str(other)
+
+    def __str__(self) -> str:
+        """yt-dlp playlist_items syntax"""
+        def segment(start, end):
+            if end is None:
+                return f"{start}:"
+            return str(start) if start == end else f"{start}:{end}"
+
+        parts = [segment(start, end) for start, end in self.ranges()]
+        parts += [segment(start, None if end == -1 else end) for start, end in self.relative]
+        return ','.join(parts)
+
+    def __repr__(self) -> str:
+        return f"PlaylistItems({str(self)!r})"
+
+
+def parse_playlist_items(items_spec: str) -> PlaylistItems:
+    """Parse playlist items specification (e.g., "1-3,7,10-13", "50-", "-5:")"""
+    return PlaylistItems.parse(items_spec)
 
 
 def get_default_config_path() -> Path: